@@ -0,0 +1,96 @@
+"""
+Load benchmark for the task submission and retrieval endpoints.
+
+Fires requests at a running API with a fixed number of concurrent clients and
+reports latency percentiles. Run it once against the old build and once against
+the new one on the same stack to compare:
+
+    python benchmarks/api_latency.py --base-url http://localhost:8000 \
+        --requests 5000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_load(
+    name: str,
+    total: int,
+    concurrency: int,
+    call: Callable[[int], Awaitable[httpx.Response]],
+) -> list[float]:
+    """Issue `total` calls with at most `concurrency` in flight; return latencies in ms."""
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def client_loop() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await call(i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:<18} n={len(latencies):<6} errors={errors:<5} "
+        f"rps={len(latencies) / elapsed:>8.1f}  "
+        f"p50={percentile(latencies, 50):>7.2f}ms  "
+        f"p99={percentile(latencies, 99):>7.2f}ms  "
+        f"mean={statistics.fmean(latencies):>7.2f}ms"
+    )
+    return latencies
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        task_ids: list[str] = []
+
+        async def submit(i: int) -> httpx.Response:
+            response = await client.post("/run-task", json={"task_name": "sum", "a": i, "b": 1})
+            if response.status_code == 200:
+                task_ids.append(response.json()["task_uuid"])
+            return response
+
+        await run_load("POST /run-task", args.requests, args.concurrency, submit)
+
+        if not task_ids:
+            return
+
+        async def poll(i: int) -> httpx.Response:
+            return await client.get(
+                "/get-task-output", params={"taskuuid": task_ids[i % len(task_ids)]}
+            )
+
+        await run_load("GET /get-task-output", args.requests, args.concurrency, poll)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Microbenchmark of the /get-task-output cache-hit path, without a live stack.
+
+Compares the CPU cost per hit of the model round trip (decode the cached JSON,
+rebuild datetimes and UUIDs, construct and validate TaskOutputResponse, and
+re-encode it the way FastAPI does) with serving the pre-encoded body as-is:
+
+    PYTHONPATH=src python benchmarks/cache_hit_path.py --iterations 50000
+"""
+
+import argparse
+import json
+import timeit
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+from uuid import UUID, uuid4
+
+from fastapi.responses import Response
+
+from api.schemas.task import TaskOutputResponse
+from shared.cache import CachedTaskOutput, _entry_from_fields
+from shared.serialization import orjson
+
+
+def payload(output_chars: int) -> dict[str, Any]:
+    """A cached completed-task response with an output of roughly the given size."""
+    return {
+        "task_uuid": str(uuid4()),
+        "status": "completed",
+        "task_output": {"response": "x" * output_chars, "model": "claude-3-haiku-20240307"},
+        "error": None,
+        "created_at": "2025-01-01T12:00:00+00:00",
+        "completed_at": "2025-01-01T12:00:01+00:00",
+    }
+
+
+def model_round_trip(cached: str) -> Callable[[], bytes]:
+    """The hit path before pre-encoding: str from Redis to response bytes via the model."""
+
+    def run() -> bytes:
+        data = json.loads(cached)
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+        data["completed_at"] = datetime.fromisoformat(data["completed_at"])
+        data["task_uuid"] = UUID(data["task_uuid"])
+        response = TaskOutputResponse(**data)
+        # FastAPI validates the return value against response_model, then renders it
+        validated = TaskOutputResponse.model_validate(response.model_dump())
+        content = validated.model_dump(mode="json")
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode()
+
+    return run
+
+
+def pre_encoded(entry: CachedTaskOutput) -> Callable[[], bytes]:
+    """The hit path now: HMGET fields to a Response carrying the cached body."""
+    fields = [entry.body, entry.etag.encode(), entry.status.encode()]
+
+    def run() -> bytes:
+        cached = _entry_from_fields(fields)
+        assert cached is not None
+        response = Response(
+            content=cached.body,
+            media_type="application/json",
+            headers={"ETag": cached.etag},
+        )
+        return bytes(response.body)
+
+    return run
+
+
+def measure(name: str, call: Callable[[], bytes], iterations: int) -> float:
+    """Best of three runs; prints and returns microseconds per call."""
+    best = min(timeit.repeat(call, number=iterations, repeat=3)) / iterations * 1e6
+    print(f"{name:<34} {best:>8.2f}us/hit  {1e6 / best:>10.0f} hits/s")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"JSON encoder: {'orjson' if orjson is not None else 'stdlib json'}")
+    for label, output_chars in (("sum-sized", 16), ("llm-sized 4KB", 4096)):
+        cached = payload(output_chars)
+        before = measure(
+            f"{label}: model round trip",
+            model_round_trip(json.dumps(cached)),
+            args.iterations,
+        )
+        after = measure(
+            f"{label}: pre-encoded body",
+            pre_encoded(CachedTaskOutput.from_payload(cached)),
+            args.iterations,
+        )
+        print(f"{label}: {before / after:.1f}x faster\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Sums per second: one task per pair vs batched sums vs one vector_op.
+
+The compute section needs no stack. It times the arithmetic alone: compute_sum
+per pair (sum_task), compute_sum_batch over all pairs (sum_batch_task), and a
+vector_op add over the same pairs as base64 columns.
+
+With --base-url, it also submits the pairs to a running stack through
+/run-tasks, 1000 per call, and waits for every task to complete. Run that once
+with SUM_BATCHING=false and once with SUM_BATCHING=true on the worker and API
+to compare the paths end to end; the vector_op is timed in the same run:
+
+    PYTHONPATH=src python benchmarks/numeric_throughput.py --pairs 100000 \\
+        --base-url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import base64
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+import httpx
+import numpy as np
+
+from shared.compute import compute_sum, compute_sum_batch, compute_vector_op
+
+# Tasks per /run-tasks call and task UUIDs per /get-task-outputs call (the API's limits)
+SUBMIT_CHUNK = 1000
+LOOKUP_CHUNK = 500
+
+
+def measure(name: str, call: Callable[[], Any], ops: int) -> float:
+    """Best of three runs; prints and returns sums per second."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    rate = ops / best
+    print(f"{name:<40} {rate:>14,.0f} ops/s")
+    return rate
+
+
+def columns(pairs: list[tuple[float, float]]) -> tuple[str, str]:
+    """The pairs as two base64 columns of little-endian float64."""
+    a, b = np.array(pairs, dtype="<f8").T
+    return base64.b64encode(a.tobytes()).decode(), base64.b64encode(b.tobytes()).decode()
+
+
+async def wait_completed(client: httpx.AsyncClient, task_ids: list[str]) -> None:
+    """Poll until every task has completed; raises if one fails."""
+    remaining = task_ids
+    while remaining:
+        pending = []
+        for start in range(0, len(remaining), LOOKUP_CHUNK):
+            chunk = remaining[start : start + LOOKUP_CHUNK]
+            response = await client.post("/get-task-outputs", json={"task_uuids": chunk})
+            tasks = response.json()["tasks"]
+            for task_id in chunk:
+                status = tasks.get(task_id, {}).get("status")
+                if status == "failed":
+                    raise RuntimeError(f"Task {task_id} failed: {tasks[task_id]['error']}")
+                if status != "completed":
+                    pending.append(task_id)
+        remaining = pending
+        if remaining:
+            await asyncio.sleep(0.2)
+
+
+async def end_to_end(base_url: str, pairs: list[tuple[float, float]]) -> None:
+    """Submit the pairs as sum tasks, then as one vector_op, timing each until completed."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        start = time.perf_counter()
+        task_ids: list[str] = []
+        for i in range(0, len(pairs), SUBMIT_CHUNK):
+            tasks = [{"task_name": "sum", "a": a, "b": b} for a, b in pairs[i : i + SUBMIT_CHUNK]]
+            response = await client.post("/run-tasks", json={"tasks": tasks})
+            task_ids.extend(result["task_uuid"] for result in response.json()["results"])
+        await wait_completed(client, task_ids)
+        elapsed = time.perf_counter() - start
+        print(f"{'live: sum tasks via /run-tasks':<40} {len(pairs) / elapsed:>14,.0f} ops/s")
+
+        a, b = columns(pairs)
+        start = time.perf_counter()
+        response = await client.post(
+            "/run-task", json={"task_name": "vector_op", "op": "add", "a": a, "b": b}
+        )
+        await wait_completed(client, [response.json()["task_uuid"]])
+        elapsed = time.perf_counter() - start
+        print(f"{'live: one vector_op add':<40} {len(pairs) / elapsed:>14,.0f} ops/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pairs", type=int, default=100_000)
+    parser.add_argument("--base-url", help="Also run end to end against this API")
+    args = parser.parse_args()
+
+    pairs = [(random.uniform(-1e6, 1e6), random.uniform(-1e6, 1e6)) for _ in range(args.pairs)]
+    a, b = columns(pairs)
+
+    measure("compute: sum per pair", lambda: [compute_sum(x, y) for x, y in pairs], len(pairs))
+    measure("compute: sum batch", lambda: compute_sum_batch(pairs), len(pairs))
+    measure("compute: vector_op add (base64)", lambda: compute_vector_op("add", a, b), len(pairs))
+
+    if args.base_url:
+        asyncio.run(end_to_end(args.base_url, pairs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Tasks per second end to end: the Celery/Redis queue vs the Postgres queue backend.
+
+Submits tasks to a running API through /run-tasks, 1000 per call, and waits for
+every one to complete. Run it once per backend on the same hardware, with the
+same number of worker processes, and compare the two lines:
+
+    # API with QUEUE_BACKEND=celery, and four prefork processes
+    PYTHONPATH=src uv run celery -A worker.celery_app worker -Q sum,file_hash,vector_op -c 4
+    uv run python benchmarks/queue_backends.py --tasks 50000 --label celery
+
+    # API with QUEUE_BACKEND=postgres, and four of
+    PYTHONPATH=src uv run python -m worker.pg_consumer
+    uv run python benchmarks/queue_backends.py --tasks 50000 --label postgres
+
+Submission and completion are timed separately: "submit" is the API's
+throughput alone, "end to end" runs from the first submission to the last
+completion. Sums are used by default so queueing, not compute, dominates.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any
+
+import httpx
+
+# Tasks per /run-tasks call and task UUIDs per /get-task-outputs call (the API's limits)
+SUBMIT_CHUNK = 1000
+LOOKUP_CHUNK = 500
+
+
+def task_body(task_name: str, i: int) -> dict[str, Any]:
+    """Request body of the i-th benchmark task; parameters vary so memoization never hits."""
+    if task_name == "vector_op":
+        return {"task_name": task_name, "op": "sum", "a": [i, 1, 2, 3]}
+    if task_name == "file_hash":
+        return {"task_name": task_name, "content": f"benchmark {i}"}
+    return {"task_name": task_name, "a": i, "b": 1}
+
+
+async def wait_completed(client: httpx.AsyncClient, task_ids: list[str]) -> None:
+    """Poll until every task has completed; raises if one fails."""
+    remaining = task_ids
+    while remaining:
+        pending = []
+        for start in range(0, len(remaining), LOOKUP_CHUNK):
+            chunk = remaining[start : start + LOOKUP_CHUNK]
+            response = await client.post("/get-task-outputs", json={"task_uuids": chunk})
+            tasks = response.json()["tasks"]
+            for task_id in chunk:
+                status = tasks.get(task_id, {}).get("status")
+                if status == "failed":
+                    raise RuntimeError(f"Task {task_id} failed: {tasks[task_id]['error']}")
+                if status != "completed":
+                    pending.append(task_id)
+        remaining = pending
+        if remaining:
+            await asyncio.sleep(0.2)
+
+
+async def run(base_url: str, task_name: str, count: int, label: str) -> None:
+    """Submit `count` tasks, then wait for them; prints both rates."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        start = time.perf_counter()
+        task_ids: list[str] = []
+        for i in range(0, count, SUBMIT_CHUNK):
+            tasks = [task_body(task_name, j) for j in range(i, min(i + SUBMIT_CHUNK, count))]
+            response = await client.post("/run-tasks", json={"tasks": tasks})
+            task_ids.extend(result["task_uuid"] for result in response.json()["results"])
+        submitted = time.perf_counter() - start
+        await wait_completed(client, task_ids)
+        elapsed = time.perf_counter() - start
+
+    print(f"{label:<10} {task_name:<10} tasks={count:<7}"
+          f" submit {count / submitted:>9,.0f} tasks/s"
+          f"  end to end {count / elapsed:>9,.0f} tasks/s  ({elapsed:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--task-name", default="sum", choices=["sum", "vector_op", "file_hash"])
+    parser.add_argument("--tasks", type=int, default=20_000)
+    parser.add_argument("--label", default="", help="Backend under test, for the output line")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.base_url, args.task_name, args.tasks, args.label or "run"))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,27 +9,60 @@ CREATE TABLE IF NOT EXISTS tasks (
     task_name VARCHAR(100) NOT NULL,
     task_parameters JSONB NOT NULL DEFAULT '{}',
     status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    priority VARCHAR(10) NOT NULL DEFAULT 'normal',
     task_output JSONB,
     error TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     started_at TIMESTAMP WITH TIME ZONE,
-    completed_at TIMESTAMP WITH TIME ZONE
+    completed_at TIMESTAMP WITH TIME ZONE,
+    held_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Columns added since the first release; re-run this script to upgrade an existing database
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS priority VARCHAR(10) NOT NULL DEFAULT 'normal';
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS held_at TIMESTAMP WITH TIME ZONE;
+
 -- Indexes for efficient querying
 CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
 CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
 CREATE INDEX IF NOT EXISTS idx_tasks_task_name ON tasks(task_name);
 
+-- Claim order of the Postgres queue backend (TaskRepository.claim_pending): only claimable
+-- rows, by priority then age, so a claim reads just the rows it takes
+CREATE INDEX IF NOT EXISTS idx_tasks_claimable ON tasks
+    ((CASE priority WHEN 'high' THEN 0 WHEN 'normal' THEN 1 ELSE 2 END), created_at)
+    WHERE status = 'pending' AND held_at IS NULL;
+
+-- Memoized submissions waiting on another execution, for the recovery sweep
+CREATE INDEX IF NOT EXISTS idx_tasks_held ON tasks(held_at) WHERE held_at IS NOT NULL;
+
 -- Add constraint for valid status values
 ALTER TABLE tasks DROP CONSTRAINT IF EXISTS chk_tasks_status;
 ALTER TABLE tasks ADD CONSTRAINT chk_tasks_status
     CHECK (status IN ('pending', 'running', 'completed', 'failed'));
 
+ALTER TABLE tasks DROP CONSTRAINT IF EXISTS chk_tasks_priority;
+ALTER TABLE tasks ADD CONSTRAINT chk_tasks_priority
+    CHECK (priority IN ('high', 'normal', 'low'));
+
 COMMENT ON TABLE tasks IS 'Stores async task submissions and their results';
 COMMENT ON COLUMN tasks.id IS 'Unique task identifier (UUID)';
-COMMENT ON COLUMN tasks.task_name IS 'Type of task: sum, query_llm, file_hash';
+COMMENT ON COLUMN tasks.task_name IS 'Type of task: sum, query_llm, file_hash, vector_op';
 COMMENT ON COLUMN tasks.task_parameters IS 'JSON input parameters for the task';
 COMMENT ON COLUMN tasks.status IS 'Current state: pending, running, completed, failed';
+COMMENT ON COLUMN tasks.priority IS 'Queue priority chosen by the client: high, normal, low';
 COMMENT ON COLUMN tasks.task_output IS 'JSON result after task completion';
 COMMENT ON COLUMN tasks.error IS 'Error message if task failed';
+COMMENT ON COLUMN tasks.held_at IS 'When a memoized submission began waiting on an identical execution';
+
+-- Transactional outbox: tasks committed but not yet published to the broker
+CREATE TABLE IF NOT EXISTS task_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    task_id UUID NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_outbox_task_id ON task_outbox(task_id);
+
+COMMENT ON TABLE task_outbox IS 'Dispatch records written with their task, published by the outbox relay';
@@ -1,27 +1,68 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator
 from typing import Annotated
 
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.cache import RedisCache, cache
-from shared.database import SessionLocal
+from api.services.inline import InlineExecutor, inline_executor
+from shared.blobs import BlobStore, blob_store
+from shared.cache import AsyncRedisCache, MemoryCache, async_cache, memory_cache
+from shared.config import get_settings
+from shared.database import AsyncSessionLocal
+from shared.events import TaskEventHub, task_event_hub
+from shared.llm_stream import AsyncLLMStreams, async_llm_streams
+from shared.memo import AsyncTaskMemo, async_task_memo
 
+settings = get_settings()
 
-def get_db() -> Generator[Session, None, None]:
-    """Yield a database session for request scope."""
-    db = SessionLocal()
-    try:
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """Yield an async database session for request scope."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def get_cache() -> RedisCache:
-    """Return the Redis cache instance."""
-    return cache
+def get_cache() -> AsyncRedisCache:
+    """Return the async Redis cache instance."""
+    return async_cache
+
+
+def get_memory_cache() -> MemoryCache | None:
+    """Return the in-process result cache, or None if disabled."""
+    return memory_cache
+
+
+def get_inline_executor() -> InlineExecutor | None:
+    """Return the inline task executor, or None if no task type runs inline."""
+    return inline_executor
+
+
+def get_memo() -> AsyncTaskMemo | None:
+    """Return the task result memo, or None if no task type is memoized."""
+    return async_task_memo if settings.memo_policies else None
+
+
+def get_event_hub() -> TaskEventHub:
+    """Return the task event hub."""
+    return task_event_hub
+
+
+def get_llm_streams() -> AsyncLLMStreams:
+    """Return the reader of partial LLM output streams."""
+    return async_llm_streams
+
+
+def get_blob_store() -> BlobStore:
+    """Return the store for uploaded task payloads."""
+    return blob_store
 
 
 # Annotated types for dependency injection
-DbSession = Annotated[Session, Depends(get_db)]
-Cache = Annotated[RedisCache, Depends(get_cache)]
+DbSession = Annotated[AsyncSession, Depends(get_db)]
+Cache = Annotated[AsyncRedisCache, Depends(get_cache)]
+LocalCache = Annotated[MemoryCache | None, Depends(get_memory_cache)]
+Inline = Annotated[InlineExecutor | None, Depends(get_inline_executor)]
+Memo = Annotated[AsyncTaskMemo | None, Depends(get_memo)]
+EventHub = Annotated[TaskEventHub, Depends(get_event_hub)]
+LLMStreams = Annotated[AsyncLLMStreams, Depends(get_llm_streams)]
+Blobs = Annotated[BlobStore, Depends(get_blob_store)]
@@ -6,6 +6,10 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
 
 from api.routers import metrics, tasks
+from api.services.inline import inline_executor
+from shared.cache import async_cache
+from shared.database import async_engine
+from shared.events import task_event_hub
 from shared.logging import get_logger, request_id_ctx, setup_logging
 from shared.metrics import http_request_duration_seconds, http_requests_total
 
@@ -20,6 +24,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     logger.info("Tasker API starting up")
     yield
     logger.info("Tasker API shutting down")
+    await task_event_hub.close()
+    if inline_executor is not None:
+        inline_executor.close()
+    await async_cache.close()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -1,10 +1,56 @@
+import json
+from collections.abc import Collection
 from datetime import UTC, datetime
 from typing import Any
-from uuid import UUID
+from uuid import UUID, uuid4
 
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    Text,
+    Uuid,
+    any_,
+    bindparam,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from shared.models.task import Task, TaskStatus
+from shared.models.task import Task, TaskOutbox, TaskPriority, TaskStatus
+from shared.pg_queue import CHANNEL
+
+# Order in which queue workers claim pending tasks: by priority, then oldest first. Written
+# out in SQL so it matches the expression of idx_tasks_claimable (see init.sql).
+CLAIM_ORDER = (
+    text("CASE tasks.priority WHEN 'high' THEN 0 WHEN 'normal' THEN 1 ELSE 2 END"),
+    Task.created_at,
+)
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _json_text(value: dict[str, Any] | None) -> str | None:
+    return json.dumps(value) if value is not None else None
+
+
+def _id_in(dialect: str, task_ids: list[UUID]) -> ColumnElement[bool]:
+    """Match any of the given IDs."""
+    if dialect == "postgresql":
+        # id = ANY($1) keeps one prepared statement regardless of list length
+        ids = bindparam("task_ids", task_ids, type_=ARRAY(Uuid))
+        return Task.id == any_(ids)
+    return Task.id.in_(task_ids)
 
 
 class TaskRepository:
@@ -17,12 +63,14 @@ class TaskRepository:
         self,
         task_name: str,
         task_parameters: dict[str, Any],
+        priority: str = TaskPriority.NORMAL,
     ) -> Task:
         """Create a new task in pending status."""
         task = Task(
             task_name=task_name,
             task_parameters=task_parameters,
             status=TaskStatus.PENDING,
+            priority=priority,
         )
         self.db.add(task)
         self.db.commit()
@@ -33,51 +81,504 @@ class TaskRepository:
         """Get task by UUID."""
         return self.db.query(Task).filter(Task.id == task_id).first()
 
+    def get_by_ids(self, task_ids: list[UUID]) -> list[Task]:
+        """Get many tasks by UUID in one query. Unknown IDs are omitted."""
+        if not task_ids:
+            return []
+        statement = select(Task).where(_id_in(self.db.get_bind().dialect.name, task_ids))
+        return list(self.db.execute(statement).scalars().all())
+
     def update_status(
         self,
         task_id: UUID,
         status: str,
         started_at: datetime | None = None,
         completed_at: datetime | None = None,
-    ) -> None:
-        """Update task status and timestamps."""
+    ) -> Task | None:
+        """Update task status and timestamps. Returns the updated task."""
         update_data: dict[str, Any] = {"status": status}
         if started_at:
             update_data["started_at"] = started_at
         if completed_at:
             update_data["completed_at"] = completed_at
 
-        self.db.query(Task).filter(Task.id == task_id).update(
-            update_data  # type: ignore[arg-type]
+        return self._update(task_id, **update_data)
+
+    def set_result(
+        self,
+        task_id: UUID,
+        output: dict[str, Any],
+    ) -> Task | None:
+        """Set task output and mark as completed. Returns the updated task."""
+        return self._update(
+            task_id,
+            task_output=output,
+            status=TaskStatus.COMPLETED,
+            completed_at=datetime.now(UTC),
         )
+
+    def set_error(
+        self,
+        task_id: UUID,
+        error: str,
+    ) -> Task | None:
+        """Set task error and mark as failed. Returns the updated task."""
+        return self._update(
+            task_id,
+            error=error,
+            status=TaskStatus.FAILED,
+            completed_at=datetime.now(UTC),
+        )
+
+    def claim_pending(self, task_names: Collection[str], limit: int) -> list[Task]:
+        """
+        Claim up to `limit` pending tasks of the given types, marking them running.
+
+        The claim is the running transition, in one UPDATE and commit. Rows
+        locked by another worker's claim are skipped, so workers can claim side
+        by side. Pending tasks held for a memoized execution (see hold_pending)
+        are never claimed. Returns the
+        claimed tasks in claim order, detached.
+        """
+        claimable = (
+            select(Task.id)
+            .where(
+                Task.status == TaskStatus.PENDING,
+                Task.held_at.is_(None),
+                Task.task_name.in_(task_names),
+            )
+            .order_by(*CLAIM_ORDER)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        tasks = list(
+            self.db.execute(
+                update(Task)
+                .where(Task.id.in_(claimable.scalar_subquery()))
+                .values(status=TaskStatus.RUNNING, started_at=datetime.now(UTC))
+                .returning(Task),
+                execution_options={"synchronize_session": False},
+            )
+            .scalars()
+            .all()
+        )
+        for task in tasks:
+            self.db.expunge(task)
         self.db.commit()
+        rank = {TaskPriority.HIGH: 0, TaskPriority.NORMAL: 1}
+        return sorted(tasks, key=lambda task: (rank.get(task.priority, 2), task.created_at))
 
-    def set_result(
+    def requeue_stale(self, task_names: Collection[str], started_before: datetime) -> int:
+        """
+        Put claimed tasks of the given types that started before a cutoff back to pending.
+
+        For tasks whose worker died mid-batch. Returns how many were requeued.
+        """
+        result = self.db.execute(
+            update(Task)
+            .where(
+                Task.status == TaskStatus.RUNNING,
+                Task.started_at < started_before,
+                Task.task_name.in_(task_names),
+            )
+            .values(status=TaskStatus.PENDING, started_at=None),
+            execution_options={"synchronize_session": False},
+        )
+        self.db.commit()
+        return int(result.rowcount)  # type: ignore[attr-defined]
+
+    def refresh_claims(self, task_ids: Collection[UUID]) -> int:
+        """
+        Restart the visibility timeout of claimed tasks still running.
+
+        Called while a batch runs, so requeue_stale only finds claims whose
+        worker stopped. Returns how many were refreshed.
+        """
+        result = self.db.execute(
+            update(Task)
+            .where(Task.id.in_(task_ids), Task.status == TaskStatus.RUNNING)
+            .values(started_at=datetime.now(UTC)),
+            execution_options={"synchronize_session": False},
+        )
+        self.db.commit()
+        return int(result.rowcount)  # type: ignore[attr-defined]
+
+    def get_held(self, limit: int) -> list[Task]:
+        """Up to `limit` pending tasks held for a memoized execution, longest held first."""
+        statement = (
+            select(Task)
+            .where(Task.status == TaskStatus.PENDING, Task.held_at.is_not(None))
+            .order_by(Task.held_at)
+            .limit(limit)
+        )
+        tasks = list(self.db.execute(statement).scalars().all())
+        for task in tasks:
+            self.db.expunge(task)
+        self.db.commit()
+        return tasks
+
+    def release_held(self, task_ids: list[UUID]) -> None:
+        """Stop holding tasks (see AsyncTaskRepository.hold_pending) and wake queue workers."""
+        self.db.execute(
+            update(Task).where(Task.id.in_(task_ids)).values(held_at=None),
+            execution_options={"synchronize_session": False},
+        )
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(select(func.pg_notify(CHANNEL, "")))
+        self.db.commit()
+
+    def lock_outbox(self, limit: int) -> list[tuple[TaskOutbox, Task]]:
+        """
+        Lock up to `limit` outbox entries, oldest first, with their tasks.
+
+        Entries locked by another relay are skipped, so relays can run side by
+        side. The locks are held until settle_outbox commits.
+        """
+        statement = (
+            select(TaskOutbox, Task)
+            .join(Task, Task.id == TaskOutbox.task_id)
+            .order_by(TaskOutbox.id)
+            .limit(limit)
+            .with_for_update(of=TaskOutbox, skip_locked=True)
+        )
+        return [(entry, task) for entry, task in self.db.execute(statement).tuples()]
+
+    def settle_outbox(
+        self,
+        published: list[int],
+        retried: list[int],
+        abandoned: dict[int, tuple[UUID, str]],
+    ) -> list[Task]:
+        """
+        Record the outcome of publishing locked outbox entries, in one commit.
+
+        Published entries are removed, retried ones count a failed attempt, and
+        abandoned ones are removed with their still-pending tasks (given as
+        entry ID -> (task ID, error)) marked failed. Returns those tasks, detached.
+        """
+        done = [*published, *abandoned]
+        if done:
+            self.db.execute(delete(TaskOutbox).where(TaskOutbox.id.in_(done)))
+        if retried:
+            self.db.execute(
+                update(TaskOutbox)
+                .where(TaskOutbox.id.in_(retried))
+                .values(attempts=TaskOutbox.attempts + 1)
+            )
+        failed: list[Task] = []
+        now = datetime.now(UTC)
+        for task_id, error in abandoned.values():
+            task = self.db.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status == TaskStatus.PENDING)
+                .values(error=error, status=TaskStatus.FAILED, completed_at=now)
+                .returning(Task),
+                execution_options={"synchronize_session": False},
+            ).scalar_one_or_none()
+            if task is not None:
+                self.db.expunge(task)
+                failed.append(task)
+        self.db.commit()
+        return failed
+
+    def apply_transitions(self, transitions: list[dict[str, Any]]) -> list[Task]:
+        """
+        Apply many state transitions in one statement and one commit.
+
+        Each transition has an `id` and a `status`, plus any of `started_at`,
+        `completed_at`, `task_output` and `error`; omitted (None) columns keep
+        their stored value. Completed tasks are left as they are, so a late
+        duplicate run (a requeued claim, a redelivered message) cannot undo a
+        result. Returns the updated tasks, detached.
+        """
+        if not transitions:
+            return []
+        if self.db.get_bind().dialect.name == "postgresql":
+            tasks = self._apply_transitions_from_values(transitions)
+        else:
+            completed = set(
+                self.db.execute(
+                    select(Task.id).where(
+                        Task.id.in_([transition["id"] for transition in transitions]),
+                        Task.status == TaskStatus.COMPLETED,
+                    )
+                ).scalars()
+            )
+            rows = [
+                {key: value for key, value in transition.items() if value is not None}
+                for transition in transitions
+                if transition["id"] not in completed
+            ]
+            if rows:
+                self.db.execute(update(Task), rows)
+            ids = [row["id"] for row in rows]
+            tasks = list(self.db.execute(select(Task).where(Task.id.in_(ids))).scalars().all())
+        for task in tasks:
+            self.db.expunge(task)
+        self.db.commit()
+        return tasks
+
+    def _apply_transitions_from_values(self, transitions: list[dict[str, Any]]) -> list[Task]:
+        """UPDATE tasks ... FROM (VALUES ...) RETURNING *, for Postgres."""
+        # Every value is sent as text and cast explicitly, so NULLs and the
+        # first row's literals never decide the column types of the VALUES list
+        rows = values(
+            column("id", Text),
+            column("status", Text),
+            column("started_at", Text),
+            column("completed_at", Text),
+            column("task_output", Text),
+            column("error", Text),
+            name="transitions",
+        ).data(
+            [
+                (
+                    str(transition["id"]),
+                    transition["status"],
+                    _isoformat(transition.get("started_at")),
+                    _isoformat(transition.get("completed_at")),
+                    _json_text(transition.get("task_output")),
+                    transition.get("error"),
+                )
+                for transition in transitions
+            ]
+        )
+        timestamp = DateTime(timezone=True)
+        statement = (
+            update(Task)
+            .where(Task.id == cast(rows.c.id, Uuid), Task.status != TaskStatus.COMPLETED)
+            .values(
+                status=rows.c.status,
+                started_at=func.coalesce(cast(rows.c.started_at, timestamp), Task.started_at),
+                completed_at=func.coalesce(cast(rows.c.completed_at, timestamp), Task.completed_at),
+                task_output=func.coalesce(cast(rows.c.task_output, JSONB), Task.task_output),
+                error=func.coalesce(rows.c.error, Task.error),
+            )
+            .returning(Task)
+        )
+        result = self.db.execute(statement, execution_options={"synchronize_session": False})
+        return list(result.scalars().all())
+
+    def _update(self, task_id: UUID, **values: Any) -> Task | None:
+        """Apply an update and return the row in the same round trip."""
+        task = self.db.execute(
+            update(Task).where(Task.id == task_id).values(**values).returning(Task)
+        ).scalar_one_or_none()
+        if task is not None:
+            # Detach so the returned values stay readable after commit/close
+            self.db.expunge(task)
+        self.db.commit()
+        return task
+
+
+class AsyncTaskRepository:
+    """Async repository for Task database operations (API request path)."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def create(
+        self,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        priority: str = TaskPriority.NORMAL,
+        outbox: bool = False,
+        queued: Collection[str] = (),
+    ) -> Task:
+        """
+        Create a new task in pending status; with `outbox`, its dispatch record too.
+
+        Task types in `queued` are claimed from Postgres by queue workers: they
+        get no dispatch record, and idle workers are notified on commit.
+        """
+        task = Task(
+            id=uuid4(),
+            task_name=task_name,
+            task_parameters=task_parameters,
+            status=TaskStatus.PENDING,
+            priority=priority,
+        )
+        self.db.add(task)
+        if task_name in queued:
+            await self._notify()
+        elif outbox:
+            # The task row must exist before the record referencing it
+            await self.db.flush()
+            self.db.add(TaskOutbox(task_id=task.id))
+        await self.db.commit()
+        await self.db.refresh(task)
+        return task
+
+    async def create_completed(
+        self,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        task_output: dict[str, Any],
+        started_at: datetime,
+        priority: str = TaskPriority.NORMAL,
+    ) -> Task:
+        """Create a task that has already run, in completed status, with one INSERT."""
+        now = datetime.now(UTC)
+        task = Task(
+            task_name=task_name,
+            task_parameters=task_parameters,
+            status=TaskStatus.COMPLETED,
+            priority=priority,
+            task_output=task_output,
+            created_at=started_at,
+            started_at=started_at,
+            completed_at=now,
+        )
+        self.db.add(task)
+        await self.db.commit()
+        return task
+
+    async def create_many(
+        self,
+        tasks: list[tuple[str, dict[str, Any], str]],
+        outbox: bool = False,
+        queued: Collection[str] = (),
+    ) -> list[Task]:
+        """
+        Create pending tasks from (task_name, task_parameters, priority) tuples.
+
+        Uses one multi-row INSERT ... RETURNING and a single commit; with
+        `outbox`, the tasks' dispatch records are inserted in the same commit.
+        Task types in `queued` get no dispatch record; idle queue workers are
+        notified of them instead. Returned tasks are in the same order as the input.
+        """
+        now = datetime.now(UTC)
+        rows = [
+            {
+                "id": uuid4(),
+                "task_name": task_name,
+                "task_parameters": task_parameters,
+                "status": TaskStatus.PENDING,
+                "priority": priority,
+                "created_at": now,
+            }
+            for task_name, task_parameters, priority in tasks
+        ]
+        result = await self.db.scalars(
+            insert(Task).returning(Task, sort_by_parameter_order=True),
+            rows,
+        )
+        created = list(result.all())
+        records = [{"task_id": row["id"]} for row in rows if row["task_name"] not in queued]
+        if outbox and records:
+            await self.db.execute(insert(TaskOutbox), records)
+        if len(records) < len(rows):
+            await self._notify()
+        await self.db.commit()
+        return created
+
+    async def get_by_id(self, task_id: UUID) -> Task | None:
+        """Get task by UUID."""
+        result = await self.db.execute(select(Task).where(Task.id == task_id))
+        return result.scalar_one_or_none()
+
+    async def get_by_ids(self, task_ids: list[UUID]) -> list[Task]:
+        """Get many tasks by UUID in one query. Unknown IDs are omitted."""
+        if not task_ids:
+            return []
+        result = await self.db.execute(select(Task).where(self._id_in(task_ids)))
+        return list(result.scalars().all())
+
+    def _id_in(self, task_ids: list[UUID]) -> ColumnElement[bool]:
+        """Match any of the given IDs."""
+        return _id_in(self.db.get_bind().dialect.name, task_ids)
+
+    async def update_status(
+        self,
+        task_id: UUID,
+        status: str,
+        started_at: datetime | None = None,
+        completed_at: datetime | None = None,
+    ) -> None:
+        """Update task status and timestamps."""
+        update_data: dict[str, Any] = {"status": status}
+        if started_at:
+            update_data["started_at"] = started_at
+        if completed_at:
+            update_data["completed_at"] = completed_at
+
+        await self.db.execute(update(Task).where(Task.id == task_id).values(update_data))
+        await self.db.commit()
+
+    async def set_result(
         self,
         task_id: UUID,
         output: dict[str, Any],
     ) -> None:
         """Set task output and mark as completed."""
-        self.db.query(Task).filter(Task.id == task_id).update(
-            {
-                "task_output": output,
-                "status": TaskStatus.COMPLETED,
-                "completed_at": datetime.now(UTC),
-            }
+        await self.db.execute(
+            update(Task)
+            .where(Task.id == task_id)
+            .values(
+                task_output=output,
+                status=TaskStatus.COMPLETED,
+                completed_at=datetime.now(UTC),
+            )
         )
-        self.db.commit()
+        await self.db.commit()
 
-    def set_error(
+    async def set_error(
         self,
         task_id: UUID,
         error: str,
     ) -> None:
         """Set task error and mark as failed."""
-        self.db.query(Task).filter(Task.id == task_id).update(
-            {
-                "error": error,
-                "status": TaskStatus.FAILED,
-                "completed_at": datetime.now(UTC),
-            }
+        await self.db.execute(
+            update(Task)
+            .where(Task.id == task_id)
+            .values(
+                error=error,
+                status=TaskStatus.FAILED,
+                completed_at=datetime.now(UTC),
+            )
         )
-        self.db.commit()
+        await self.db.commit()
+
+    async def _notify(self) -> None:
+        """Wake idle queue workers once the current transaction commits."""
+        if self.db.get_bind().dialect.name == "postgresql":
+            await self.db.execute(select(func.pg_notify(CHANNEL, "")))
+
+    async def hold_pending(self, task_ids: list[UUID]) -> None:
+        """
+        Mark pending tasks as waiting on another execution of the same work.
+
+        Held tasks are never claimed by queue workers, and are released by the
+        worker once that execution ends, or by the recovery sweep if it is lost
+        (see worker.memo). A task already claimed simply runs.
+        """
+        await self.db.execute(
+            update(Task)
+            .where(Task.id.in_(task_ids), Task.status == TaskStatus.PENDING)
+            .values(held_at=datetime.now(UTC))
+        )
+        await self.db.commit()
+
+    async def delete_outbox(self, task_ids: list[UUID]) -> None:
+        """Drop the dispatch records of tasks that no longer need publishing."""
+        await self.db.execute(delete(TaskOutbox).where(TaskOutbox.task_id.in_(task_ids)))
+        await self.db.commit()
+
+    async def set_errors(self, errors: dict[UUID, str]) -> None:
+        """Mark many tasks as failed in one transaction."""
+        if not errors:
+            return
+        now = datetime.now(UTC)
+        await self.db.execute(
+            update(Task),
+            [
+                {
+                    "id": task_id,
+                    "error": error,
+                    "status": TaskStatus.FAILED,
+                    "completed_at": now,
+                }
+                for task_id, error in errors.items()
+            ],
+        )
+        await self.db.commit()
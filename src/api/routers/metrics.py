@@ -1,9 +1,11 @@
+import asyncio
+
 from fastapi import APIRouter, Response
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from sqlalchemy import text
 
-from shared.cache import cache
-from shared.database import engine
+from shared.cache import async_cache
+from shared.database import async_engine
 from shared.logging import get_logger
 
 router = APIRouter(tags=["metrics"])
@@ -13,6 +15,16 @@ logger = get_logger(__name__)
 @router.get("/metrics")
 async def metrics() -> Response:
     """Prometheus metrics endpoint."""
+    # Import here to avoid circular imports
+    from worker.celery_app import celery_app
+    from worker.queues import update_queue_depths
+
+    # Broker I/O is blocking - keep it off the event loop
+    try:
+        await asyncio.to_thread(update_queue_depths, celery_app)
+    except Exception as e:
+        logger.warning(f"Failed to sample queue depths: {e}")
+
     return Response(
         content=generate_latest(),
         media_type=CONTENT_TYPE_LATEST,
@@ -24,8 +36,8 @@ async def health_check() -> dict[str, str]:
     """Health check endpoint."""
     # Check database
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         db_status = "healthy"
     except Exception as e:
         logger.error(f"Database health check failed: {e}")
@@ -33,7 +45,7 @@ async def health_check() -> dict[str, str]:
 
     # Check Redis
     try:
-        redis_status = "healthy" if cache.ping() else "unhealthy"
+        redis_status = "healthy" if await async_cache.ping() else "unhealthy"
     except Exception as e:
         logger.error(f"Redis health check failed: {e}")
         redis_status = "unhealthy"
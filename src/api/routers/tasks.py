@@ -1,13 +1,101 @@
+import re
+from collections.abc import AsyncIterator
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 
-from api.dependencies import Cache, DbSession
-from api.schemas.task import RunTaskRequest, RunTaskResponse, TaskOutputResponse
-from api.services.task_service import TaskNotFoundError, TaskService
+from api.dependencies import (
+    Blobs,
+    Cache,
+    DbSession,
+    EventHub,
+    Inline,
+    LLMStreams,
+    LocalCache,
+    Memo,
+)
+from api.schemas.task import (
+    MAX_BULK_LOOKUP,
+    RunTaskRequest,
+    RunTaskResponse,
+    RunTasksRequest,
+    RunTasksResponse,
+    TaskOutputResponse,
+    TaskOutputsRequest,
+    TaskOutputsResponse,
+    TaskPriorityLevel,
+)
+from api.services.task_service import AsyncTaskService, TaskNotFoundError
+from shared.blobs import BlobTooLargeError
+from shared.cache import CachedTaskOutput
+from shared.compute import HashAlgorithm
+from shared.config import get_settings
+from shared.models.task import TaskStatus
 
 router = APIRouter(tags=["tasks"])
+settings = get_settings()
+
+# Durations like "30", "30s", "1.5s" or "500ms"
+WAIT_PATTERN = r"^(\d+(?:\.\d+)?)(ms|s)?$"
+
+# Redis stream entry IDs, as sent back in Last-Event-ID to resume a stream
+STREAM_ID_PATTERN = r"^\d+-\d+$"
+
+# OpenAPI for endpoints taking a raw byte stream rather than JSON
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+}
+
+# Completed results never change; anything else must be revalidated (cheaply, via ETag)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def parse_wait(wait: str | None) -> float:
+    """Convert a ?wait= duration to seconds, capped at the configured maximum."""
+    if not wait:
+        return 0.0
+    match = re.fullmatch(WAIT_PATTERN, wait)
+    if not match:
+        raise ValueError(f"Invalid wait duration: {wait}")
+    value, unit = match.groups()
+    seconds = float(value) / 1000 if unit == "ms" else float(value)
+    return min(seconds, settings.long_poll_max_wait_seconds)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+    return etag in candidates
+
+
+def caching_headers(etag: str, status: str) -> dict[str, str]:
+    """ETag and Cache-Control for a task output in the given status."""
+    cache_control = (
+        IMMUTABLE_CACHE_CONTROL if status == TaskStatus.COMPLETED else REVALIDATE_CACHE_CONTROL
+    )
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified_response(etag: str, status: str) -> Response:
+    """304 for a client that already holds the current representation."""
+    return Response(status_code=304, headers=caching_headers(etag, status))
+
+
+def task_output_response(output: CachedTaskOutput) -> Response:
+    """Serve a cached task output's encoded body as-is, with its caching headers."""
+    return Response(
+        content=output.body,
+        media_type="application/json",
+        headers=caching_headers(output.etag, output.status),
+    )
 
 
 @router.post("/run-task", response_model=RunTaskResponse)
@@ -15,15 +103,87 @@ async def run_task(
     request: RunTaskRequest,
     db: DbSession,
     cache: Cache,
+    local_cache: LocalCache,
+    inline: Inline,
+    memo: Memo,
+    include_output: Annotated[
+        bool,
+        Query(description="Return the result in this response if the task ran inline"),
+    ] = False,
 ) -> RunTaskResponse:
     """
     Submit a task for async execution.
 
-    Returns immediately with a task UUID.
+    Returns immediately with a task UUID. Task types configured for inline
+    execution or memoization may be completed right away, in which case the
+    status is `completed` and, with `include_output`, the result is included.
+    """
+    service = AsyncTaskService(db, cache, local_cache, inline, memo)
+    task = await service.create_task(request)
+    if task.status == TaskStatus.COMPLETED:
+        return RunTaskResponse(
+            task_uuid=task.id,
+            status="completed",
+            task_output=task.task_output if include_output else None,
+        )
+    return RunTaskResponse(task_uuid=task.id)
+
+
+@router.post(
+    "/run-task/file-hash",
+    response_model=RunTaskResponse,
+    responses={413: {"description": "Upload too large"}},
+    openapi_extra={"requestBody": UPLOAD_REQUEST_BODY},
+)
+async def run_file_hash_upload(
+    request: Request,
+    db: DbSession,
+    cache: Cache,
+    blobs: Blobs,
+    algorithm: Annotated[HashAlgorithm, Query(description="Hash algorithm to use")] = "sha256",
+    algorithms: Annotated[
+        list[HashAlgorithm] | None,
+        Query(description="Several algorithms to compute in one pass; overrides algorithm"),
+    ] = None,
+    priority: Annotated[TaskPriorityLevel, Query(description="Queue priority")] = "normal",
+    content_length: Annotated[int | None, Header()] = None,
+) -> RunTaskResponse:
+    """
+    Submit a file_hash task for the raw request body.
+
+    For large inputs: the body is streamed to disk as it arrives, never
+    held in memory or stored in the task row, and the worker hashes it in
+    chunks. Send the bytes as-is, e.g. `curl --data-binary @file`.
+    """
+    if content_length is not None and content_length > settings.blob_max_bytes:
+        detail = f"Upload exceeds {settings.blob_max_bytes} bytes"
+        raise HTTPException(status_code=413, detail=detail)
+    service = AsyncTaskService(db, cache)
+    try:
+        task = await service.create_upload_hash_task(
+            request.stream(), algorithm, blobs, algorithms, priority
+        )
+    except BlobTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    return RunTaskResponse(task_uuid=task.id)
+
+
+@router.post("/run-tasks", response_model=RunTasksResponse)
+async def run_tasks(
+    request: RunTasksRequest,
+    db: DbSession,
+    cache: Cache,
+) -> RunTasksResponse:
+    """
+    Submit a batch of tasks for async execution.
+
+    All tasks are inserted in one transaction and published to the broker
+    in one batch. Returns one result per task in request order; tasks that
+    could not be dispatched are reported as failed.
     """
-    service = TaskService(db, cache)
-    task_uuid = service.create_task(request)
-    return RunTaskResponse(task_uuid=task_uuid)
+    service = AsyncTaskService(db, cache)
+    results = await service.create_tasks(request.tasks)
+    return RunTasksResponse(results=results)
 
 
 @router.get("/get-task-output", response_model=TaskOutputResponse)
@@ -31,15 +191,161 @@ async def get_task_output(
     taskuuid: Annotated[UUID, Query(description="UUID of the task")],
     db: DbSession,
     cache: Cache,
-) -> TaskOutputResponse:
+    local_cache: LocalCache,
+    events: EventHub,
+    wait: Annotated[
+        str | None,
+        Query(
+            pattern=WAIT_PATTERN,
+            description="Hold the request open until the task finishes, e.g. 30s or 500ms",
+        ),
+    ] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """
     Get the output of a task by UUID.
 
     Returns task status, output (if completed), or error (if failed).
+    With `wait`, a pending or running task is held open until it finishes
+    or the wait expires, then its current state is returned.
+
+    Responses carry an ETag; a matching `If-None-Match` gets 304 Not Modified.
+    Without `wait`, that check uses only the cached ETag and status, so the
+    output is neither loaded nor serialized.
+    """
+    service = AsyncTaskService(db, cache, local_cache)
+    timeout = parse_wait(wait)
+
+    if if_none_match and timeout == 0:
+        marker = await service.get_task_marker(taskuuid)
+        if marker and etag_matches(if_none_match, marker.etag):
+            return not_modified_response(marker.etag, marker.status)
+
+    try:
+        if timeout > 0:
+            output = await service.wait_for_task_output(taskuuid, timeout, events)
+        else:
+            output = await service.get_task_output(taskuuid)
+    except TaskNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+    if if_none_match and etag_matches(if_none_match, output.etag):
+        return not_modified_response(output.etag, output.status)
+    return task_output_response(output)
+
+
+@router.post("/get-task-outputs", response_model=TaskOutputsResponse)
+async def get_task_outputs(
+    request: TaskOutputsRequest,
+    db: DbSession,
+    cache: Cache,
+    local_cache: LocalCache,
+) -> Response:
+    """
+    Get the outputs of many tasks by UUID.
+
+    Returns a map of UUID to task output; unknown UUIDs are listed in `not_found`.
+    """
+    service = AsyncTaskService(db, cache, local_cache)
+    body = await service.get_task_outputs(request.task_uuids)
+    return Response(content=body, media_type="application/json")
+
+
+@router.get(
+    "/tasks/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_tasks(
+    db: DbSession,
+    cache: Cache,
+    events: EventHub,
+    ids: Annotated[
+        list[UUID] | None,
+        Query(max_length=MAX_BULK_LOOKUP, description="Task UUIDs to watch"),
+    ] = None,
+    task_name: Annotated[
+        list[str] | None,
+        Query(description="Only stream events for these task types"),
+    ] = None,
+) -> StreamingResponse:
+    """
+    Stream task status transitions as Server-Sent Events.
+
+    With `ids`, the current status of each task is sent first and the stream
+    closes once all of them are completed, failed, or not found. Without
+    `ids`, transitions for all tasks (optionally filtered by `task_name`) are
+    streamed until the client disconnects.
     """
-    service = TaskService(db, cache)
+    service = AsyncTaskService(db, cache)
+    stream = service.stream_task_events(
+        events,
+        task_ids=ids,
+        task_names=set(task_name) if task_name else None,
+        heartbeat=settings.stream_heartbeat_seconds,
+    )
+
+    async def sse() -> AsyncIterator[str]:
+        async for event in stream:
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {event.encode()}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+@router.get(
+    "/tasks/{task_uuid}/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}, 404: {"description": "Not found"}},
+)
+async def stream_task_output(
+    task_uuid: UUID,
+    db: DbSession,
+    cache: Cache,
+    local_cache: LocalCache,
+    streams: LLMStreams,
+    last_event_id: Annotated[
+        str | None,
+        Header(pattern=STREAM_ID_PATTERN, description="Resume after this event"),
+    ] = None,
+) -> StreamingResponse:
+    """
+    Stream a `query_llm` task's output as Server-Sent Events while it is generated.
+
+    A `start` event opens each upstream attempt (discard any text received
+    before it), `delta` events carry text as it arrives, and a final `end`
+    event carries the terminal status. A finished task gets its whole
+    response as one delta. Events carry IDs, so a reconnecting client can
+    resume with `Last-Event-ID`.
+    """
+    service = AsyncTaskService(db, cache, local_cache)
     try:
-        return service.get_task_output(taskuuid)
+        current = await service.get_task_output(task_uuid)
     except TaskNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
+    stream = service.stream_llm_output(
+        task_uuid,
+        current,
+        streams,
+        heartbeat=settings.stream_heartbeat_seconds,
+        after=last_event_id or "0",
+    )
+
+    async def sse() -> AsyncIterator[str]:
+        async for entry in stream:
+            if entry is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id = f"id: {entry.id}\n" if entry.id else ""
+            yield f"{event_id}event: {entry.kind}\ndata: {entry.encode()}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,12 +1,28 @@
+import base64
+import binascii
 from datetime import datetime
-from typing import Annotated, Any, Literal
+from typing import Annotated, Any, Literal, Self
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from shared.compute import BINARY_OPS, HashAlgorithm, Vector, VectorOp, is_finite
+
+# Priority levels a client can choose; high runs before normal and low in the same queue
+TaskPriorityLevel = Literal["high", "normal", "low"]
+
+
+class TaskRequestBase(BaseModel):
+    """Fields shared by every task request."""
+
+    priority: TaskPriorityLevel = Field(
+        default="normal",
+        description="Queue priority: waiting high tasks are taken first, then normal, then low",
+    )
 
 
 # Task-specific request schemas
-class SumTaskRequest(BaseModel):
+class SumTaskRequest(TaskRequestBase):
     """Request for sum task."""
 
     task_name: Literal["sum"] = Field(default="sum", description="Task type")
@@ -14,7 +30,7 @@ class SumTaskRequest(BaseModel):
     b: int | float = Field(..., description="Second number", examples=[3])
 
 
-class QueryLLMTaskRequest(BaseModel):
+class QueryLLMTaskRequest(TaskRequestBase):
     """Request for query_llm task."""
 
     task_name: Literal["query_llm"] = Field(default="query_llm", description="Task type")
@@ -22,22 +38,89 @@ class QueryLLMTaskRequest(BaseModel):
         ..., min_length=1, description="Prompt to send to Claude", examples=["What is 2+2?"]
     )
     max_tokens: int = Field(default=1024, ge=1, le=4096, description="Maximum tokens in response")
+    batch: bool = Field(
+        default=False,
+        description="Run in a Message Batch: cheaper, but may take up to 24 hours",
+    )
 
 
-class FileHashTaskRequest(BaseModel):
+class FileHashTaskRequest(TaskRequestBase):
     """Request for file_hash task."""
 
     task_name: Literal["file_hash"] = Field(default="file_hash", description="Task type")
     content: str = Field(..., min_length=1, description="Content to hash", examples=["hello world"])
-    algorithm: Literal["md5", "sha1", "sha256"] = Field(
+    algorithm: HashAlgorithm = Field(
         default="sha256",
         description="Hash algorithm to use",
     )
+    algorithms: list[HashAlgorithm] | None = Field(
+        default=None,
+        min_length=1,
+        description="Several algorithms to compute in one pass; overrides algorithm",
+        examples=[["md5", "sha256", "blake2b"]],
+    )
+
+
+# Upper bound on the elements of one vector_op operand
+MAX_VECTOR_LENGTH = 1_000_000
+
 
+def vector_length(values: Vector) -> int:
+    """Number of elements in a vector; raises ValueError for a malformed base64 payload."""
+    if isinstance(values, list):
+        return len(values)
+    try:
+        size = len(base64.b64decode(values, validate=True))
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64: {e}") from e
+    if size % 8:
+        raise ValueError("A base64 vector must hold whole little-endian float64 values")
+    return size // 8
+
+
+class VectorOpTaskRequest(TaskRequestBase):
+    """Request for vector_op task."""
+
+    task_name: Literal["vector_op"] = Field(default="vector_op", description="Task type")
+    op: VectorOp = Field(..., description="Reduction of a, or dot/element-wise op of a and b")
+    a: Vector = Field(
+        ...,
+        description="Numbers, or base64 of little-endian float64 values",
+        examples=[[1, 2, 3]],
+    )
+    b: Vector | None = Field(
+        default=None,
+        description="Second operand of dot, add and multiply; same length as a",
+        examples=[[4, 5, 6]],
+    )
+
+    @field_validator("a", "b")
+    @classmethod
+    def check_length(cls, values: Vector | None) -> Vector | None:
+        """Vectors hold between 1 and MAX_VECTOR_LENGTH finite numbers."""
+        if values is not None and not 1 <= vector_length(values) <= MAX_VECTOR_LENGTH:
+            raise ValueError(f"A vector holds 1 to {MAX_VECTOR_LENGTH} elements")
+        if values is not None and not is_finite(values):
+            raise ValueError("A vector holds finite numbers only, not NaN or infinity")
+        return values
+
+    @model_validator(mode="after")
+    def check_operands(self) -> Self:
+        """Binary operations take two vectors of the same length; reductions take one."""
+        if self.op not in BINARY_OPS:
+            if self.b is not None:
+                raise ValueError(f"{self.op} takes a single vector")
+        elif self.b is None or vector_length(self.a) != vector_length(self.b):
+            raise ValueError(f"{self.op} needs a and b of the same length")
+        return self
+
+
+# Any task request
+TaskRequest = SumTaskRequest | QueryLLMTaskRequest | FileHashTaskRequest | VectorOpTaskRequest
 
 # Discriminated union - Swagger will show different fields per task_name
 RunTaskRequest = Annotated[
-    SumTaskRequest | QueryLLMTaskRequest | FileHashTaskRequest,
+    TaskRequest,
     Field(discriminator="task_name"),
 ]
 
@@ -46,6 +129,44 @@ class RunTaskResponse(BaseModel):
     """Response for POST /run-task."""
 
     task_uuid: UUID = Field(..., description="Unique identifier for the task")
+    status: Literal["pending", "completed"] = Field(
+        default="pending",
+        description="completed if the task ran inline and its result is already available",
+    )
+    task_output: dict[str, Any] | None = Field(
+        default=None,
+        description="The result of an inline task, when requested with include_output",
+    )
+
+
+# Upper bound on tasks accepted by one POST /run-tasks call
+MAX_BATCH_SIZE = 1000
+
+
+class RunTasksRequest(BaseModel):
+    """Request for POST /run-tasks."""
+
+    tasks: list[RunTaskRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_SIZE,
+        description="Tasks to submit, in order",
+    )
+
+
+class BatchTaskResult(BaseModel):
+    """Outcome of one item in a batch submission."""
+
+    index: int = Field(..., description="Position of the task in the request")
+    task_uuid: UUID = Field(..., description="Task UUID; a failed task's row records the error")
+    status: Literal["accepted", "failed"]
+    error: str | None = None
+
+
+class RunTasksResponse(BaseModel):
+    """Response for POST /run-tasks."""
+
+    results: list[BatchTaskResult] = Field(..., description="One result per task, in order")
 
 
 class TaskOutputResponse(BaseModel):
@@ -57,3 +178,27 @@ class TaskOutputResponse(BaseModel):
     error: str | None = None
     created_at: datetime
     completed_at: datetime | None = None
+
+
+# Upper bound on task UUIDs accepted by one POST /get-task-outputs call
+MAX_BULK_LOOKUP = 500
+
+
+class TaskOutputsRequest(BaseModel):
+    """Request for POST /get-task-outputs."""
+
+    task_uuids: list[UUID] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BULK_LOOKUP,
+        description="UUIDs of the tasks to look up",
+    )
+
+
+class TaskOutputsResponse(BaseModel):
+    """Response for POST /get-task-outputs."""
+
+    tasks: dict[UUID, TaskOutputResponse] = Field(
+        default_factory=dict, description="Task outputs keyed by UUID"
+    )
+    not_found: list[UUID] = Field(default_factory=list, description="UUIDs with no such task")
@@ -0,0 +1,79 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from shared.compute import compute_hash, compute_sum
+from shared.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class InlineTask:
+    """A task type that can run in the API process: its compute function and input cost."""
+
+    compute: Callable[..., dict[str, Any]]
+    cost: Callable[[dict[str, Any]], int]
+
+
+# Task types cheap enough to skip the queue; query_llm never qualifies
+INLINE_TASKS: dict[str, InlineTask] = {
+    "sum": InlineTask(compute=compute_sum, cost=lambda params: 0),
+    "file_hash": InlineTask(
+        compute=compute_hash,
+        cost=lambda params: len(params["content"]) * len(params.get("algorithms") or [None]),
+    ),
+}
+
+
+class InlineExecutor:
+    """
+    Runs trivial tasks in a bounded thread pool inside the API process.
+
+    Only the configured task types whose input cost (characters of content,
+    per hash algorithm) is within `max_cost` are accepted. At most `max_workers` tasks run at
+    once; a submission beyond that is refused rather than queued, and the
+    caller sends it through the broker as usual.
+    """
+
+    def __init__(self, task_names: set[str], max_cost: int, max_workers: int) -> None:
+        self.tasks = {name: INLINE_TASKS[name] for name in task_names & INLINE_TASKS.keys()}
+        self.max_cost = max_cost
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inline-task")
+        self._in_flight = 0
+
+    def accepts(self, task_name: str, task_parameters: dict[str, Any]) -> bool:
+        """Whether the task is eligible to run inline."""
+        task = self.tasks.get(task_name)
+        return task is not None and task.cost(task_parameters) <= self.max_cost
+
+    async def run(self, task_name: str, task_parameters: dict[str, Any]) -> dict[str, Any] | None:
+        """Compute the task output, or return None if every worker thread is busy."""
+        if self._in_flight >= self.max_workers:
+            return None
+        compute = self.tasks[task_name].compute
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, lambda: compute(**task_parameters))
+        finally:
+            self._in_flight -= 1
+
+    def close(self) -> None:
+        """Stop the worker threads."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Singleton for the API process; None unless some task type is configured to run inline
+inline_executor = (
+    InlineExecutor(
+        task_names=set(settings.inline_task_names),
+        max_cost=settings.inline_max_input_chars,
+        max_workers=settings.inline_max_workers,
+    )
+    if settings.inline_task_names
+    else None
+)
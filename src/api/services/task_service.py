@@ -1,25 +1,65 @@
-from datetime import datetime
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, suppress
+from datetime import UTC, datetime
 from typing import Any
 from uuid import UUID
 
+import redis
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from api.repositories.task_repo import TaskRepository
+from api.repositories.task_repo import AsyncTaskRepository, TaskRepository
 from api.schemas.task import (
+    BatchTaskResult,
     FileHashTaskRequest,
     QueryLLMTaskRequest,
     SumTaskRequest,
     TaskOutputResponse,
+    TaskRequest,
+    VectorOpTaskRequest,
 )
-from shared.cache import RedisCache
+from api.services.inline import InlineExecutor
+from shared.blobs import BlobStore
+from shared.cache import (
+    NOT_FOUND_ENTRY,
+    NOT_FOUND_STATUS,
+    AsyncRedisCache,
+    CachedTaskOutput,
+    MemoryCache,
+    RedisCache,
+    TaskCacheMarker,
+    task_cache_entry,
+    task_cache_ttl,
+)
+from shared.compute import HashAlgorithm
+from shared.config import get_settings
+from shared.events import TaskEvent, TaskEventHub, publish_task_event_async
+from shared.llm_stream import AsyncLLMStreams, LLMStreamEntry
 from shared.logging import get_logger
-from shared.metrics import tasks_submitted_total
-from shared.models.task import Task, TaskStatus
+from shared.memo import AsyncTaskMemo, MemoClaim, memo_policy
+from shared.metrics import (
+    cache_fills_total,
+    cache_requests_total,
+    inline_tasks_total,
+    memo_requests_total,
+    task_duration_seconds,
+    tasks_completed_total,
+    tasks_submitted_total,
+)
+from shared.models.task import Task, TaskPriority, TaskStatus
+from shared.pg_queue import queued_task_names
+from shared.serialization import dumps, loads
 
+settings = get_settings()
 logger = get_logger(__name__)
 
 # Valid task names
-VALID_TASK_NAMES = {"sum", "query_llm", "file_hash"}
+VALID_TASK_NAMES = {"sum", "query_llm", "file_hash", "vector_op"}
+
+# Statuses after which a task never changes again
+TERMINAL_STATUSES = {TaskStatus.COMPLETED, TaskStatus.FAILED}
 
 
 class TaskNotFoundError(Exception):
@@ -28,6 +68,108 @@ class TaskNotFoundError(Exception):
     pass
 
 
+def hash_parameters(
+    algorithm: HashAlgorithm,
+    algorithms: list[HashAlgorithm] | None,
+) -> dict[str, Any]:
+    """The algorithm parameters of a file_hash task: one algorithm, or several in one pass."""
+    if algorithms:
+        return {"algorithms": list(dict.fromkeys(algorithms))}
+    return {"algorithm": algorithm}
+
+
+def extract_task_parameters(
+    request: TaskRequest,
+) -> dict[str, Any]:
+    """Validate the task name and extract worker parameters from a request."""
+    task_name = request.task_name
+
+    # Validate task name before creating DB record
+    if task_name not in VALID_TASK_NAMES:
+        raise ValueError(f"Unknown task name: {task_name}. Valid tasks: {VALID_TASK_NAMES}")
+
+    # Extract parameters based on task type
+    if isinstance(request, SumTaskRequest):
+        return {"a": request.a, "b": request.b}
+    if isinstance(request, QueryLLMTaskRequest):
+        parameters: dict[str, Any] = {"prompt": request.prompt, "max_tokens": request.max_tokens}
+        if request.batch:
+            parameters["batch"] = True
+        return parameters
+    if isinstance(request, FileHashTaskRequest):
+        algorithms = hash_parameters(request.algorithm, request.algorithms)
+        return {"content": request.content, **algorithms}
+    if isinstance(request, VectorOpTaskRequest):
+        parameters = {"op": request.op, "a": request.a}
+        if request.b is not None:
+            parameters["b"] = request.b
+        return parameters
+    raise ValueError(f"Unknown request type: {type(request)}")
+
+
+def response_from_cache(cached_response: CachedTaskOutput) -> TaskOutputResponse:
+    """Rebuild a response model from its cached, encoded form."""
+    return TaskOutputResponse.model_validate_json(cached_response.body)
+
+
+def response_from_task(task: Task) -> TaskOutputResponse:
+    """Build a response from a task row."""
+    return TaskOutputResponse(
+        task_uuid=task.id,
+        status=task.status,
+        task_output=task.task_output,
+        error=task.error,
+        created_at=task.created_at,
+        completed_at=task.completed_at,
+    )
+
+
+def encode_task_outputs(
+    outputs: dict[UUID, CachedTaskOutput],
+    not_found: list[UUID],
+) -> bytes:
+    """Assemble a TaskOutputsResponse body from already-encoded task responses."""
+    tasks = b",".join(
+        b'"%s":%s' % (str(task_uuid).encode(), output.body) for task_uuid, output in outputs.items()
+    )
+    return b'{"tasks":{%s},"not_found":%s}' % (
+        tasks,
+        dumps([str(task_uuid) for task_uuid in not_found]),
+    )
+
+
+def final_stream_entries(output: CachedTaskOutput) -> list[LLMStreamEntry]:
+    """A finished task's output as a complete stream, for tasks that have no live one."""
+    text = (loads(output.body).get("task_output") or {}).get("response", "")
+    entries = [LLMStreamEntry("start")]
+    if text:
+        entries.append(LLMStreamEntry("delta", text=text))
+    entries.append(LLMStreamEntry("end", status=output.status))
+    return entries
+
+
+def _dispatch_task(task: Task) -> None:
+    """Send task to Celery worker."""
+    # Import here to avoid circular imports
+    from worker.tasks import dispatch_task
+
+    dispatch_task(
+        task_id=str(task.id),
+        task_name=task.task_name,
+        task_parameters=task.task_parameters,
+        priority=task.priority,
+    )
+
+
+def _dispatch_tasks(tasks: list[Task]) -> list[Exception | None]:
+    """Send many tasks to Celery over one broker connection."""
+    from worker.tasks import dispatch_tasks
+
+    return dispatch_tasks(
+        [(str(task.id), task.task_name, task.task_parameters, task.priority) for task in tasks]
+    )
+
+
 class TaskService:
     """Business logic for task operations."""
 
@@ -37,38 +179,30 @@ class TaskService:
 
     def create_task(
         self,
-        request: SumTaskRequest | QueryLLMTaskRequest | FileHashTaskRequest,
+        request: TaskRequest,
     ) -> UUID:
         """Create a new task and dispatch to worker."""
-        task_name = request.task_name
-
-        # Validate task name before creating DB record
-        if task_name not in VALID_TASK_NAMES:
-            raise ValueError(f"Unknown task name: {task_name}. Valid tasks: {VALID_TASK_NAMES}")
-
-        # Extract parameters based on task type
-        task_parameters: dict[str, Any]
-        if isinstance(request, SumTaskRequest):
-            task_parameters = {"a": request.a, "b": request.b}
-        elif isinstance(request, QueryLLMTaskRequest):
-            task_parameters = {"prompt": request.prompt, "max_tokens": request.max_tokens}
-        elif isinstance(request, FileHashTaskRequest):
-            task_parameters = {"content": request.content, "algorithm": request.algorithm}
-        else:
-            raise ValueError(f"Unknown request type: {type(request)}")
+        task_parameters = extract_task_parameters(request)
 
         # Create task in DB
         task = self.repo.create(
-            task_name=task_name,
+            task_name=request.task_name,
             task_parameters=task_parameters,
+            priority=request.priority,
         )
 
         # Record metric
-        tasks_submitted_total.labels(task_name=task_name).inc()
+        tasks_submitted_total.labels(task_name=request.task_name).inc()
+
+        # Cache the pending state before dispatch so the worker's writes always land after it
+        try:
+            self.cache.set(str(task.id), task_cache_entry(task), ttl=task_cache_ttl(task.status))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to cache pending state of task {task.id}: {e}")
 
         # Dispatch to Celery worker with error handling
         try:
-            self._dispatch_task(task)
+            _dispatch_task(task)
         except Exception as e:
             logger.error(
                 f"Failed to dispatch task {task.id} to Celery: {e}",
@@ -79,66 +213,655 @@ class TaskService:
                 task_id=task.id,
                 error=f"Failed to dispatch task to worker: {str(e)}",
             )
+            with suppress(redis.RedisError):
+                self.cache.delete(str(task.id))
             raise
 
         return task.id
 
-    def _dispatch_task(self, task: Task) -> None:
-        """Send task to Celery worker."""
-        # Import here to avoid circular imports
-        from worker.tasks import dispatch_task
-
-        dispatch_task(
-            task_id=str(task.id),
-            task_name=task.task_name,
-            task_parameters=task.task_parameters,
-        )
-
     def get_task_output(self, task_uuid: UUID) -> TaskOutputResponse:
         """Get task output, checking cache first."""
-        # Check cache for completed tasks - cache stores full response
-        cache_key = f"response:{task_uuid}"
-        cached_response = self.cache.get_raw(cache_key)
+        # Cache stores the full response, or a marker for unknown task IDs
+        cached_response = self.cache.get(str(task_uuid))
         if cached_response:
-            # Cache hit - return cached response directly without DB query
-            # Convert ISO format strings back to datetime objects
-            if isinstance(cached_response.get("created_at"), str):
-                cached_response["created_at"] = datetime.fromisoformat(
-                    cached_response["created_at"]
-                )
-            completed_at = cached_response.get("completed_at")
-            if completed_at and isinstance(completed_at, str):
-                cached_response["completed_at"] = datetime.fromisoformat(completed_at)
-            if isinstance(cached_response.get("task_uuid"), str):
-                cached_response["task_uuid"] = UUID(cached_response["task_uuid"])
-            return TaskOutputResponse(**cached_response)
+            # Cache hit - answer directly without DB query
+            cache_requests_total.labels(tier="redis", result="hit").inc()
+            if cached_response.not_found:
+                raise TaskNotFoundError(f"Task {task_uuid} not found")
+            return response_from_cache(cached_response)
+        cache_requests_total.labels(tier="redis", result="miss").inc()
 
         # Fetch from database
         task = self.repo.get_by_id(task_uuid)
         if not task:
+            self.cache.set(
+                str(task_uuid),
+                NOT_FOUND_ENTRY,
+                ttl=settings.not_found_cache_ttl_seconds,
+                nx=True,
+            )
             raise TaskNotFoundError(f"Task {task_uuid} not found")
 
-        # Build response
-        response = TaskOutputResponse(
-            task_uuid=task.id,
-            status=task.status,
-            task_output=task.task_output,
-            error=task.error,
-            created_at=task.created_at,
-            completed_at=task.completed_at,
+        # Backfill only if still absent, so a newer worker write is never replaced
+        self.cache.set(
+            str(task.id),
+            task_cache_entry(task),
+            ttl=task_cache_ttl(task.status),
+            nx=True,
         )
+        cache_fills_total.labels(tier="redis", source="api").inc()
+
+        return response_from_task(task)
+
+
+class AsyncTaskService:
+    """Business logic for task operations on the async API request path."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        cache: AsyncRedisCache,
+        local_cache: MemoryCache | None = None,
+        inline: InlineExecutor | None = None,
+        memo: AsyncTaskMemo | None = None,
+    ) -> None:
+        self.repo = AsyncTaskRepository(db)
+        self.cache = cache
+        self.local_cache = local_cache
+        self.inline = inline
+        self.memo = memo
+
+    async def create_task(
+        self,
+        request: TaskRequest,
+    ) -> Task:
+        """
+        Create a new task and dispatch to worker.
+
+        Task types enabled for the inline fast path are instead computed in
+        the API process and stored already completed, when cheap enough and a
+        thread is free; the returned task's status tells the two apart.
+
+        For memoized task types, a stored result for the same parameters
+        completes the task immediately, and a submission identical to one
+        still in flight waits on that execution instead of dispatching.
+
+        With TASK_OUTBOX, the task is committed with its dispatch record and
+        published by the outbox relay; nothing here waits on the broker. With
+        QUEUE_BACKEND=postgres, the committed row is itself the queue entry.
+        """
+        task_parameters = extract_task_parameters(request)
+
+        memo = self.memo
+        policy = memo_policy(request.task_name) if memo is not None else None
+        if memo is not None and policy is not None:
+            try:
+                output = await memo.lookup(request.task_name, task_parameters, policy)
+            except redis.RedisError as e:
+                logger.warning(f"Memo lookup failed for {request.task_name}: {e}")
+                output = None
+            if output is not None:
+                memo_requests_total.labels(task_name=request.task_name, result="hit").inc()
+                return await self._store_completed(
+                    request.task_name,
+                    task_parameters,
+                    output,
+                    started_at=datetime.now(UTC),
+                    priority=request.priority,
+                )
+
+        if self.inline is not None and self.inline.accepts(request.task_name, task_parameters):
+            completed = await self._run_inline(
+                self.inline, request.task_name, task_parameters, request.priority
+            )
+            if completed is not None:
+                return completed
+
+        # Create task in DB
+        task = await self.repo.create(
+            task_name=request.task_name,
+            task_parameters=task_parameters,
+            priority=request.priority,
+            outbox=settings.task_outbox,
+            queued=queued_task_names(),
+        )
+
+        # Record metric
+        tasks_submitted_total.labels(task_name=request.task_name).inc()
+
+        # Cache the pending state before dispatch so the worker's writes always land after it
+        await self._cache_pending([task])
+
+        if memo is not None and policy is not None:
+            claim = await self._claim(memo, task)
+            memo_requests_total.labels(task_name=task.task_name, result=claim.outcome).inc()
+            if claim.outcome == "hit" and claim.output is not None:
+                # Stored between the lookup and the claim
+                await self.repo.set_result(task_id=task.id, output=claim.output)
+                await self._unqueue(task)
+                await self._cache_completed(task)
+                return task
+            if claim.outcome == "joined":
+                # The worker completes this task along with the execution it joined
+                await self._unqueue(task)
+                return task
+
+        if settings.task_outbox or task.task_name in queued_task_names():
+            return task
+
+        # Celery's publish is blocking I/O - keep it off the event loop
+        try:
+            await asyncio.to_thread(_dispatch_task, task)
+        except Exception as e:
+            logger.error(
+                f"Failed to dispatch task {task.id} to Celery: {e}",
+                exc_info=True,
+            )
+            # Mark task as failed since it can't be processed
+            error = f"Failed to dispatch task to worker: {str(e)}"
+            waiters = await self._release(memo, task) if memo is not None and policy else []
+            await self.repo.set_errors(dict.fromkeys([task.id, *waiters], error))
+            await self._uncache([task.id, *waiters])
+            raise
+
+        return task
+
+    async def create_upload_hash_task(
+        self,
+        chunks: AsyncIterator[bytes],
+        algorithm: HashAlgorithm,
+        blobs: BlobStore,
+        algorithms: list[HashAlgorithm] | None = None,
+        priority: str = TaskPriority.NORMAL,
+    ) -> Task:
+        """
+        Create a file_hash task for an upload, spooled to the blob store as it arrives.
+
+        Only the blob ID is stored and dispatched; the worker hashes the blob
+        in chunks. Neither side ever holds the whole upload in memory.
+        Raises BlobTooLargeError past `blob_max_bytes`.
+        """
+        blob = await blobs.write(chunks, settings.blob_max_bytes)
+        try:
+            task = await self.repo.create(
+                task_name="file_hash",
+                task_parameters={"blob": blob.id, **hash_parameters(algorithm, algorithms)},
+                priority=priority,
+                outbox=settings.task_outbox,
+                queued=queued_task_names(),
+            )
+        except Exception:
+            await asyncio.to_thread(blobs.delete, blob.id)
+            raise
+        tasks_submitted_total.labels(task_name=task.task_name).inc()
+        await self._cache_pending([task])
+        if settings.task_outbox or task.task_name in queued_task_names():
+            return task
+
+        try:
+            await asyncio.to_thread(_dispatch_task, task)
+        except Exception as e:
+            logger.error(f"Failed to dispatch task {task.id} to Celery: {e}", exc_info=True)
+            await self.repo.set_errors({task.id: f"Failed to dispatch task to worker: {str(e)}"})
+            await self._uncache([task.id])
+            await asyncio.to_thread(blobs.delete, blob.id)
+            raise
+        return task
+
+    async def _unqueue(self, task: Task) -> None:
+        """
+        Keep a task that needs no execution of its own from being run.
 
-        # Cache completed task output as full response for future requests
-        if task.status == TaskStatus.COMPLETED and task.task_output:
-            # Cache the full response dict for faster retrieval
-            cache_data = {
-                "task_uuid": str(task.id),
-                "status": task.status,
-                "task_output": task.task_output,
-                "error": task.error,
-                "created_at": task.created_at.isoformat(),
-                "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-            }
-            self.cache.set_raw(cache_key, cache_data)
-
-        return response
+        Marks it held, which keeps Postgres queue workers from claiming it and
+        lets the recovery sweep find it if its execution is lost, and drops its
+        dispatch record. If it was already published or claimed, the task simply
+        runs; memoized task types are deterministic, so its result is the same.
+        """
+        await self.repo.hold_pending([task.id])
+        if settings.task_outbox and task.task_name not in queued_task_names():
+            await self.repo.delete_outbox([task.id])
+
+    async def _claim(self, memo: AsyncTaskMemo, task: Task) -> MemoClaim:
+        """Claim a memoized task's execution; without Redis, it simply runs."""
+        try:
+            return await memo.claim(task.task_name, task.task_parameters, str(task.id))
+        except redis.RedisError as e:
+            logger.warning(f"Memo claim failed for task {task.id}, running it: {e}")
+            return MemoClaim("leader")
+
+    async def _release(self, memo: AsyncTaskMemo, task: Task) -> list[UUID]:
+        """Give up a memoized task's claim; returns the tasks that were waiting on it."""
+        try:
+            waiters = await memo.release(task.task_name, task.task_parameters, str(task.id))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to release memo claim of task {task.id}: {e}")
+            return []
+        return [UUID(waiter) for waiter in waiters]
+
+    async def _run_inline(
+        self,
+        inline: InlineExecutor,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        priority: str,
+    ) -> Task | None:
+        """
+        Compute a task in-process and persist it as completed.
+
+        Returns None, leaving the task to the queue, if the inline pool is
+        saturated or the computation fails; the worker then runs it with its
+        usual retries and error reporting.
+        """
+        started_at = datetime.now(UTC)
+        start_time = time.perf_counter()
+        try:
+            output = await inline.run(task_name, task_parameters)
+        except Exception as e:
+            inline_tasks_total.labels(task_name=task_name, result="failed").inc()
+            logger.warning(f"Inline {task_name} failed, queueing it instead: {e}")
+            return None
+        if output is None:
+            inline_tasks_total.labels(task_name=task_name, result="saturated").inc()
+            return None
+
+        task = await self._store_completed(task_name, task_parameters, output, started_at, priority)
+        task_duration_seconds.labels(task_name=task_name).observe(time.perf_counter() - start_time)
+        inline_tasks_total.labels(task_name=task_name, result="completed").inc()
+        return task
+
+    async def _store_completed(
+        self,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        output: dict[str, Any],
+        started_at: datetime,
+        priority: str,
+    ) -> Task:
+        """Insert a task whose result is already known, then cache and announce it."""
+        task = await self.repo.create_completed(
+            task_name=task_name,
+            task_parameters=task_parameters,
+            task_output=output,
+            started_at=started_at,
+            priority=priority,
+        )
+        tasks_submitted_total.labels(task_name=task_name).inc()
+        tasks_completed_total.labels(task_name=task_name, status="completed").inc()
+        await self._cache_completed(task)
+        return task
+
+    async def _cache_completed(self, task: Task) -> None:
+        """Cache a task completed by the API and publish its event. Best-effort."""
+        # Completed results never change, so a plain write cannot clobber anything newer
+        entry = task_cache_entry(task)
+        try:
+            await self.cache.set(str(task.id), entry, ttl=task_cache_ttl(task.status))
+            cache_fills_total.labels(tier="redis", source="api").inc()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to cache result of task {task.id}: {e}")
+        self._remember(str(task.id), entry)
+        await publish_task_event_async(self.cache.client, str(task.id), task.status, task.task_name)
+
+    async def create_tasks(
+        self,
+        requests: list[TaskRequest],
+    ) -> list[BatchTaskResult]:
+        """
+        Create many tasks in one transaction and dispatch them in one batch.
+
+        With TASK_OUTBOX, their dispatch records are committed with them and
+        the outbox relay publishes them. With QUEUE_BACKEND=postgres, the task
+        types it runs are left in the table for queue workers to claim.
+        """
+        queued = queued_task_names()
+        tasks = await self.repo.create_many(
+            [
+                (request.task_name, extract_task_parameters(request), request.priority)
+                for request in requests
+            ],
+            outbox=settings.task_outbox,
+            queued=queued,
+        )
+
+        for task in tasks:
+            tasks_submitted_total.labels(task_name=task.task_name).inc()
+
+        await self._cache_pending(tasks)
+
+        published = [i for i, task in enumerate(tasks) if task.task_name not in queued]
+        if settings.task_outbox or not published:
+            return [
+                BatchTaskResult(index=index, task_uuid=task.id, status="accepted")
+                for index, task in enumerate(tasks)
+            ]
+
+        try:
+            errors = await asyncio.to_thread(_dispatch_tasks, [tasks[i] for i in published])
+        except Exception as e:
+            # Could not reach the broker at all - every published task in the batch failed
+            logger.error(f"Failed to dispatch batch of {len(published)} tasks: {e}", exc_info=True)
+            errors = [e] * len(published)
+        dispatch_errors: list[Exception | None] = [None] * len(tasks)
+        for i, error in zip(published, errors, strict=True):
+            dispatch_errors[i] = error
+
+        results: list[BatchTaskResult] = []
+        failed: dict[UUID, str] = {}
+        for index, (task, error) in enumerate(zip(tasks, dispatch_errors, strict=True)):
+            if error is None:
+                results.append(BatchTaskResult(index=index, task_uuid=task.id, status="accepted"))
+                continue
+            message = f"Failed to dispatch task to worker: {str(error)}"
+            failed[task.id] = message
+            results.append(
+                BatchTaskResult(index=index, task_uuid=task.id, status="failed", error=message)
+            )
+
+        if failed:
+            logger.error(f"Failed to dispatch {len(failed)} of {len(tasks)} batched tasks")
+            await self.repo.set_errors(failed)
+            await self._uncache(list(failed))
+
+        return results
+
+    async def _cache_pending(self, tasks: list[Task]) -> None:
+        """Cache freshly created tasks so early polls skip Postgres. Best-effort."""
+        try:
+            await self.cache.set_many(
+                {
+                    str(task.id): (task_cache_entry(task), task_cache_ttl(task.status))
+                    for task in tasks
+                },
+                # The relay may publish an outbox task, or a queue worker claim a task, and
+                # its worker cache it, before this
+                nx=settings.task_outbox or settings.queue_backend == "postgres",
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Failed to cache pending state of {len(tasks)} tasks: {e}")
+
+    async def _uncache(self, task_ids: list[UUID]) -> None:
+        """Drop cached entries that no longer match Postgres. Best-effort."""
+        try:
+            await self.cache.delete_many([str(task_id) for task_id in task_ids])
+        except redis.RedisError as e:
+            logger.warning(f"Failed to invalidate {len(task_ids)} cached tasks: {e}")
+
+    async def get_task_output(self, task_uuid: UUID) -> CachedTaskOutput:
+        """
+        Get the encoded task output, checking the in-process tier, then Redis, then the DB.
+
+        The result is the response body as served, so cache hits never build
+        or validate a response model.
+        """
+        if self.local_cache is not None:
+            local_response = self.local_cache.get(str(task_uuid))
+            cache_requests_total.labels(
+                tier="memory", result="hit" if local_response else "miss"
+            ).inc()
+            if local_response:
+                return local_response
+
+        # Cache stores the full response, or a marker for unknown task IDs
+        cached_response = await self.cache.get(str(task_uuid))
+        if cached_response:
+            # Cache hit - answer directly without DB query
+            cache_requests_total.labels(tier="redis", result="hit").inc()
+            if cached_response.not_found:
+                raise TaskNotFoundError(f"Task {task_uuid} not found")
+            return self._remember(str(task_uuid), cached_response)
+        cache_requests_total.labels(tier="redis", result="miss").inc()
+
+        # Fetch from database
+        task = await self.repo.get_by_id(task_uuid)
+        if not task:
+            # Remember the miss so repeated lookups of unknown IDs skip Postgres
+            await self.cache.set(
+                str(task_uuid),
+                NOT_FOUND_ENTRY,
+                ttl=settings.not_found_cache_ttl_seconds,
+                nx=True,
+            )
+            raise TaskNotFoundError(f"Task {task_uuid} not found")
+
+        # Backfill only if still absent, so a newer worker write is never replaced
+        entry = task_cache_entry(task)
+        await self.cache.set(str(task.id), entry, ttl=task_cache_ttl(task.status), nx=True)
+        cache_fills_total.labels(tier="redis", source="api").inc()
+
+        return self._remember(str(task.id), entry)
+
+    async def get_task_marker(self, task_uuid: UUID) -> TaskCacheMarker | None:
+        """
+        Get the current ETag and status of a task from the cache tiers only.
+
+        Lets conditional requests be answered without loading the output.
+        Returns None if the task is not cached; callers then do a full read.
+        """
+        if self.local_cache is not None:
+            local_response = self.local_cache.get(str(task_uuid))
+            if local_response:
+                return TaskCacheMarker(etag=local_response.etag, status=local_response.status)
+        return await self.cache.get_marker(str(task_uuid))
+
+    def _remember(self, task_uuid: str, entry: CachedTaskOutput) -> CachedTaskOutput:
+        """Keep completed results in the in-process tier."""
+        if self.local_cache is not None and entry.status == TaskStatus.COMPLETED:
+            self.local_cache.set(task_uuid, entry)
+            cache_fills_total.labels(tier="memory", source="api").inc()
+        return entry
+
+    async def wait_for_task_output(
+        self,
+        task_uuid: UUID,
+        timeout: float,
+        events: TaskEventHub,
+    ) -> CachedTaskOutput:
+        """
+        Get task output, waiting up to `timeout` seconds for the task to finish.
+
+        The wait is driven by worker completion events, so an idle waiter does
+        no cache or DB reads; state is read once up front and once at the end.
+        """
+        async with AsyncExitStack() as stack:
+            try:
+                subscription = await stack.enter_async_context(events.subscribe({str(task_uuid)}))
+            except redis.RedisError as e:
+                logger.warning(f"Task events unavailable, not waiting on {task_uuid}: {e}")
+                return await self.get_task_output(task_uuid)
+
+            # Subscribed before reading, so a completion in between is not missed
+            response = await self.get_task_output(task_uuid)
+            if response.status in TERMINAL_STATUSES:
+                return response
+            # Release the pooled connection instead of holding it through the wait
+            await self.repo.db.close()
+
+            try:
+                async with asyncio.timeout(timeout):
+                    while (await subscription.get()).status not in TERMINAL_STATUSES:
+                        pass
+            except TimeoutError:
+                pass
+
+        return await self.get_task_output(task_uuid)
+
+    async def stream_task_events(
+        self,
+        events: TaskEventHub,
+        task_ids: list[UUID] | None,
+        task_names: set[str] | None,
+        heartbeat: float,
+    ) -> AsyncIterator[TaskEvent | None]:
+        """
+        Yield status transitions for the selected tasks as they happen.
+
+        With `task_ids`, the current status of each task is yielded first and
+        the stream ends once every task is terminal (or not found). Without
+        them, live events for all tasks (optionally filtered by name) are
+        yielded until the client goes away. None is yielded after `heartbeat`
+        idle seconds so the caller can keep the connection alive. Events can be
+        lost (a slow subscriber, a pub/sub reconnect), so on each heartbeat the
+        status of unfinished watched tasks is re-read, and changes are yielded.
+        """
+        watched = {str(task_id) for task_id in task_ids} if task_ids else None
+        async with events.subscribe(watched, task_names) as subscription:
+            last_status: dict[str, str] = {}
+            names: dict[str, str] = {}
+            if task_ids:
+                # Subscribed before the snapshot, so no transition is missed
+                tasks = {str(task.id): task for task in await self.repo.get_by_ids(task_ids)}
+                # Release the pooled connection - heartbeat re-reads are normally cache hits
+                await self.repo.db.close()
+                for task_id in dict.fromkeys(str(task_id) for task_id in task_ids):
+                    task = tasks.get(task_id)
+                    event = (
+                        TaskEvent(task_id, task.status, task.task_name)
+                        if task
+                        else TaskEvent(task_id, NOT_FOUND_STATUS)
+                    )
+                    if task:
+                        names[task_id] = task.task_name
+                    last_status[task_id] = event.status
+                    yield event
+
+            def unfinished() -> list[str]:
+                return [
+                    task_id
+                    for task_id in watched or ()
+                    if last_status.get(task_id) not in TERMINAL_STATUSES | {NOT_FOUND_STATUS}
+                ]
+
+            while watched is None or unfinished():
+                try:
+                    async with asyncio.timeout(heartbeat):
+                        event = await subscription.get()
+                except TimeoutError:
+                    yield None
+                    if watched is None:
+                        continue
+                    for task_id, status in (await self._read_statuses(unfinished())).items():
+                        if last_status.get(task_id) != status:
+                            last_status[task_id] = status
+                            yield TaskEvent(task_id, status, names.get(task_id))
+                    continue
+                if last_status.get(event.task_uuid) == event.status:
+                    continue
+                last_status[event.task_uuid] = event.status
+                yield event
+
+    async def _read_statuses(self, task_ids: list[str]) -> dict[str, str]:
+        """
+        Current status of each task, from Redis in one pipeline and the DB for misses.
+
+        Unknown tasks get NOT_FOUND_STATUS. The DB connection is released afterwards.
+        """
+        try:
+            cached_responses = await self.cache.get_many(task_ids)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to read cached status of {len(task_ids)} tasks: {e}")
+            cached_responses = [None] * len(task_ids)
+        statuses = {
+            task_id: cached_response.status
+            for task_id, cached_response in zip(task_ids, cached_responses, strict=True)
+            if cached_response
+        }
+        misses = [UUID(task_id) for task_id in task_ids if task_id not in statuses]
+        if misses:
+            for task in await self.repo.get_by_ids(misses):
+                statuses[str(task.id)] = task.status
+            await self.repo.db.close()
+        return {task_id: statuses.get(task_id, NOT_FOUND_STATUS) for task_id in task_ids}
+
+    async def stream_llm_output(
+        self,
+        task_uuid: UUID,
+        current: CachedTaskOutput,
+        streams: AsyncLLMStreams,
+        heartbeat: float,
+        after: str = "0",
+    ) -> AsyncIterator[LLMStreamEntry | None]:
+        """
+        Yield a task's LLM output as it is generated, ending with its terminal status.
+
+        Entries after the `after` ID are relayed from the task's Redis stream,
+        starting from `current`, the task's state when the client connected.
+        A task that finished without a stream (cache expiry, streaming
+        disabled, a worker that died mid-stream) gets its persisted response as
+        one delta instead. None is yielded after `heartbeat` idle seconds, and
+        the task's status is then re-read.
+        """
+        task_id = str(task_uuid)
+        output = current
+        # Release the pooled connection - status re-reads are normally cache hits
+        await self.repo.db.close()
+        while True:
+            entries: list[LLMStreamEntry] = []
+            try:
+                if output.status not in TERMINAL_STATUSES or await streams.exists(task_id):
+                    entries = await streams.read(task_id, after, heartbeat)
+            except redis.RedisError as e:
+                logger.warning(f"Output stream of task {task_id} unavailable: {e}")
+                if output.status not in TERMINAL_STATUSES:
+                    await asyncio.sleep(heartbeat)
+
+            for entry in entries:
+                after = entry.id
+                yield entry
+                if entry.kind == "end":
+                    return
+            if entries:
+                continue
+            if output.status in TERMINAL_STATUSES:
+                for entry in final_stream_entries(output):
+                    yield entry
+                return
+            yield None
+            output = await self.get_task_output(task_uuid)
+
+    async def get_task_outputs(self, task_uuids: list[UUID]) -> bytes:
+        """
+        Get many task outputs at once, as an encoded TaskOutputsResponse.
+
+        Cache hits are resolved with one Redis pipeline, misses with one DB
+        query, and the misses (including unknown IDs) are written back in one
+        pipeline.
+        """
+        task_uuids = list(dict.fromkeys(task_uuids))
+
+        found: dict[UUID, CachedTaskOutput] = {}
+        remote: list[UUID] = []
+        for task_uuid in task_uuids:
+            local_response = self.local_cache.get(str(task_uuid)) if self.local_cache else None
+            if local_response:
+                found[task_uuid] = local_response
+            else:
+                remote.append(task_uuid)
+        if self.local_cache is not None:
+            cache_requests_total.labels(tier="memory", result="hit").inc(len(found))
+            cache_requests_total.labels(tier="memory", result="miss").inc(len(remote))
+
+        cached_responses = await self.cache.get_many([str(task_uuid) for task_uuid in remote])
+        misses: list[UUID] = []
+        for task_uuid, cached_response in zip(remote, cached_responses, strict=True):
+            if not cached_response:
+                misses.append(task_uuid)
+            elif not cached_response.not_found:
+                found[task_uuid] = self._remember(str(task_uuid), cached_response)
+        cache_requests_total.labels(tier="redis", result="hit").inc(len(remote) - len(misses))
+        cache_requests_total.labels(tier="redis", result="miss").inc(len(misses))
+
+        backfill: dict[str, tuple[CachedTaskOutput, int | None]] = {}
+        for task in await self.repo.get_by_ids(misses):
+            entry = task_cache_entry(task)
+            found[task.id] = self._remember(str(task.id), entry)
+            backfill[str(task.id)] = (entry, task_cache_ttl(task.status))
+        cache_fills_total.labels(tier="redis", source="api").inc(len(backfill))
+        for task_uuid in misses:
+            if task_uuid not in found:
+                backfill[str(task_uuid)] = (NOT_FOUND_ENTRY, settings.not_found_cache_ttl_seconds)
+        await self.cache.set_many(backfill, nx=True)
+
+        return encode_task_outputs(
+            {task_uuid: found[task_uuid] for task_uuid in task_uuids if task_uuid in found},
+            [task_uuid for task_uuid in task_uuids if task_uuid not in found],
+        )
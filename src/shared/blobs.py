@@ -0,0 +1,108 @@
+import asyncio
+import os
+import re
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from shared.config import get_settings
+from shared.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Blob IDs are generated here; anything else is never turned into a path
+BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class BlobTooLargeError(Exception):
+    """Raised when an upload exceeds the maximum blob size."""
+
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Blob:
+    """A stored upload: its ID and size in bytes."""
+
+    id: str
+    size: int
+
+
+class BlobStore:
+    """
+    Uploaded payloads on a local directory shared by the API and the workers.
+
+    Uploads are spooled to disk `chunk_size` bytes at a time and reads come
+    back in chunks of the same size, so memory use is bounded whatever the
+    blob size. A blob only becomes visible under its ID once fully written.
+    """
+
+    def __init__(self, root: str, chunk_size: int) -> None:
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+
+    def path(self, blob_id: str) -> Path:
+        """Where a blob is stored."""
+        if not BLOB_ID_PATTERN.match(blob_id):
+            raise ValueError(f"Invalid blob ID: {blob_id!r}")
+        return self.root / blob_id
+
+    async def write(self, chunks: AsyncIterator[bytes], max_bytes: int) -> Blob:
+        """
+        Store a stream of bytes as a new blob.
+
+        Disk writes run in a worker thread, a full chunk at a time. Raises
+        BlobTooLargeError, keeping nothing, past `max_bytes`.
+        """
+        blob_id = uuid.uuid4().hex
+        path = self.path(blob_id)
+        partial = path.with_suffix(".part")
+        await asyncio.to_thread(self.root.mkdir, parents=True, exist_ok=True)
+        file = await asyncio.to_thread(open, partial, "wb")
+        size = 0
+        try:
+            buffer = bytearray()
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BlobTooLargeError(f"Upload exceeds {max_bytes} bytes")
+                buffer += chunk
+                if len(buffer) >= self.chunk_size:
+                    await asyncio.to_thread(file.write, buffer)
+                    buffer = bytearray()
+            await asyncio.to_thread(self._finish, file, buffer)
+            await asyncio.to_thread(os.replace, partial, path)
+        except BaseException:
+            await asyncio.to_thread(self._discard, file, partial)
+            raise
+        return Blob(id=blob_id, size=size)
+
+    def read_chunks(self, blob_id: str) -> Iterator[bytes]:
+        """Yield a blob's bytes, `chunk_size` at a time."""
+        with open(self.path(blob_id), "rb") as file:
+            while chunk := file.read(self.chunk_size):
+                yield chunk
+
+    def delete(self, blob_id: str) -> None:
+        """Remove a blob; one already gone is not an error."""
+        try:
+            self.path(blob_id).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Failed to delete blob {blob_id}: {e}")
+
+    @staticmethod
+    def _finish(file: BinaryIO, buffer: bytearray) -> None:
+        file.write(buffer)
+        file.close()
+
+    @staticmethod
+    def _discard(file: BinaryIO, partial: Path) -> None:
+        file.close()
+        partial.unlink(missing_ok=True)
+
+
+# Singleton shared by the API (writes) and the workers (reads)
+blob_store = BlobStore(settings.blob_store_dir, chunk_size=settings.hash_chunk_size)
@@ -1,63 +1,184 @@
-import json
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Any
 
 import redis
+import redis.asyncio as aioredis
 
 from shared.config import get_settings
+from shared.metrics import cache_evictions_total, memory_cache_bytes, memory_cache_entries
+from shared.models.task import Task, TaskStatus
+from shared.serialization import dumps
 
 settings = get_settings()
 
+# Status of the cached entry for task IDs that do not exist
+NOT_FOUND_STATUS = "not_found"
+
+# Writes an entry hash with its TTL; with nx set, only if no entry exists yet.
+# Non-hash values left under the key by older releases are replaced.
+SET_ENTRY_SCRIPT = """
+local kind = redis.call('TYPE', KEYS[1])['ok']
+if kind == 'hash' and ARGV[5] == '1' then
+    return 0
+end
+if kind ~= 'none' then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('HSET', KEYS[1], 'body', ARGV[1], 'etag', ARGV[2], 'status', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def task_cache_payload(task: Task) -> dict[str, Any]:
+    """
+    Full /get-task-output response for a task, in its cached JSON form.
+
+    This is the single cache schema for task results: the worker writes it on
+    completion and the API reads and backfills it under the same `task:` key.
+    """
+    return {
+        "task_uuid": str(task.id),
+        "status": task.status,
+        "task_output": task.task_output,
+        "error": task.error,
+        "created_at": task.created_at.isoformat(),
+        "completed_at": task.completed_at.isoformat() if task.completed_at else None,
+    }
+
+
+def task_etag(task_uuid: str, status: str, completed_at: str | None) -> str:
+    """ETag for a task's response; it changes exactly when status or completion time does."""
+    digest = hashlib.blake2b(f"{task_uuid}|{status}|{completed_at}".encode(), digest_size=8)
+    return f'"{digest.hexdigest()}"'
+
+
+@dataclass(frozen=True, slots=True)
+class CachedTaskOutput:
+    """A task's /get-task-output response body, pre-encoded, with its ETag."""
+
+    body: bytes
+    etag: str
+    status: str
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "CachedTaskOutput":
+        """Encode a response payload once, so reads can serve the bytes as-is."""
+        return cls(
+            body=dumps(payload),
+            etag=task_etag(payload["task_uuid"], payload["status"], payload["completed_at"]),
+            status=payload["status"],
+        )
+
+    @property
+    def not_found(self) -> bool:
+        """Whether this entry records that the task does not exist."""
+        return self.status == NOT_FOUND_STATUS
+
+
+@dataclass(frozen=True, slots=True)
+class TaskCacheMarker:
+    """ETag and status of a cached task output, read without its body."""
+
+    etag: str
+    status: str
+
+
+# Cached in place of a response for task IDs that do not exist
+NOT_FOUND_ENTRY = CachedTaskOutput(
+    body=dumps({"status": NOT_FOUND_STATUS}),
+    etag="",
+    status=NOT_FOUND_STATUS,
+)
+
+
+def task_cache_entry(task: Task) -> CachedTaskOutput:
+    """Cache entry holding a task's current response."""
+    return CachedTaskOutput.from_payload(task_cache_payload(task))
+
+
+def task_cache_ttl(status: str) -> int:
+    """
+    TTL for a cached response in the given status.
+
+    Completed results are final and keep the default TTL. Anything else can
+    still change, so it gets a short TTL; the worker also overwrites the
+    entry on every transition.
+    """
+    if status == TaskStatus.COMPLETED:
+        return settings.cache_ttl_seconds
+    return settings.status_cache_ttl_seconds
+
+
+def _entry_from_fields(fields: list[Any]) -> CachedTaskOutput | None:
+    """Build an entry from an HMGET of (body, etag, status)."""
+    body, etag, status = fields
+    if body is None:
+        return None
+    return CachedTaskOutput(
+        body=body.encode() if isinstance(body, str) else body,
+        etag=etag.decode() if isinstance(etag, bytes) else etag,
+        status=status.decode() if isinstance(status, bytes) else status,
+    )
+
 
 class RedisCache:
-    """Redis cache wrapper for task outputs."""
+    """
+    Redis cache wrapper for task outputs.
+
+    Each task is a hash under `task:<uuid>` with the encoded response `body`,
+    its `etag` and its `status`, so conditional reads can skip the body.
+    """
 
     def __init__(self, url: str, default_ttl: int = 3600) -> None:
         self.client = redis.from_url(url, decode_responses=True)
         self.default_ttl = default_ttl
+        self._set_entry = self.client.register_script(SET_ENTRY_SCRIPT)
 
     def _task_key(self, task_uuid: str) -> str:
         """Generate cache key for task."""
         return f"task:{task_uuid}"
 
-    def get(self, task_uuid: str) -> dict[str, Any] | None:
+    def get(self, task_uuid: str) -> CachedTaskOutput | None:
         """Get cached task output."""
-        data = self.client.get(self._task_key(task_uuid))
-        if data:
-            return json.loads(data)  # type: ignore[no-any-return]
-        return None
-
-    def get_raw(self, key: str) -> dict[str, Any] | None:
-        """Get cached value by raw key."""
-        data = self.client.get(key)
-        if data:
-            return json.loads(data)  # type: ignore[no-any-return]
-        return None
+        try:
+            fields = self.client.hmget(self._task_key(task_uuid), ["body", "etag", "status"])
+        except redis.ResponseError:
+            # Value in an older format - treat as a miss until it is rewritten
+            return None
+        return _entry_from_fields(fields)
 
     def set(
         self,
         task_uuid: str,
-        output: dict[str, Any],
+        entry: CachedTaskOutput,
         ttl: int | None = None,
+        nx: bool = False,
     ) -> None:
-        """Cache task output with TTL."""
-        self.client.set(
-            self._task_key(task_uuid),
-            json.dumps(output),
-            ex=ttl or self.default_ttl,
+        """Cache task output with TTL; with `nx`, only if no entry exists."""
+        self._set_entry(
+            keys=[self._task_key(task_uuid)],
+            args=[entry.body, entry.etag, entry.status, ttl or self.default_ttl, int(nx)],
         )
 
-    def set_raw(
+    def set_many(
         self,
-        key: str,
-        value: dict[str, Any],
-        ttl: int | None = None,
+        outputs: dict[str, tuple[CachedTaskOutput, int | None]],
+        nx: bool = False,
     ) -> None:
-        """Cache value by raw key with TTL."""
-        self.client.set(
-            key,
-            json.dumps(value),
-            ex=ttl or self.default_ttl,
-        )
+        """Cache many task outputs, each as (entry, ttl), in one pipeline."""
+        if not outputs:
+            return
+        with self.client.pipeline(transaction=False) as pipe:
+            for task_uuid, (entry, ttl) in outputs.items():
+                self._set_entry(
+                    keys=[self._task_key(task_uuid)],
+                    args=[entry.body, entry.etag, entry.status, ttl or self.default_ttl, int(nx)],
+                    client=pipe,
+                )
+            pipe.execute()
 
     def delete(self, task_uuid: str) -> None:
         """Remove task from cache."""
@@ -71,8 +192,161 @@ class RedisCache:
             return False
 
 
-# Singleton cache instance
+class AsyncRedisCache:
+    """Asyncio Redis cache wrapper for the API request path."""
+
+    def __init__(self, url: str, default_ttl: int = 3600) -> None:
+        # Raw bytes: cached bodies are served without decoding
+        self.client = aioredis.from_url(url, decode_responses=False)
+        self.default_ttl = default_ttl
+        self._set_entry = self.client.register_script(SET_ENTRY_SCRIPT)
+
+    def _task_key(self, task_uuid: str) -> str:
+        """Generate cache key for task."""
+        return f"task:{task_uuid}"
+
+    async def get(self, task_uuid: str) -> CachedTaskOutput | None:
+        """Get cached task output."""
+        try:
+            fields = await self.client.hmget(self._task_key(task_uuid), ["body", "etag", "status"])
+        except redis.ResponseError:
+            # Value in an older format - treat as a miss until it is rewritten
+            return None
+        return _entry_from_fields(fields)
+
+    async def get_marker(self, task_uuid: str) -> TaskCacheMarker | None:
+        """Get only the ETag and status of a cached task output, for conditional requests."""
+        try:
+            etag, status = await self.client.hmget(self._task_key(task_uuid), ["etag", "status"])
+        except redis.ResponseError:
+            return None
+        if etag is None or status is None:
+            return None
+        return TaskCacheMarker(etag=etag.decode(), status=status.decode())
+
+    async def get_many(self, task_uuids: list[str]) -> list[CachedTaskOutput | None]:
+        """Get many cached task outputs in one pipeline; misses are None, in input order."""
+        if not task_uuids:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for task_uuid in task_uuids:
+                pipe.hmget(self._task_key(task_uuid), ["body", "etag", "status"])
+            results = await pipe.execute(raise_on_error=False)
+        return [
+            None if isinstance(fields, Exception) else _entry_from_fields(fields)
+            for fields in results
+        ]
+
+    async def set(
+        self,
+        task_uuid: str,
+        entry: CachedTaskOutput,
+        ttl: int | None = None,
+        nx: bool = False,
+    ) -> None:
+        """Cache task output with TTL; with `nx`, only if no entry exists."""
+        await self._set_entry(
+            keys=[self._task_key(task_uuid)],
+            args=[entry.body, entry.etag, entry.status, ttl or self.default_ttl, int(nx)],
+        )
+
+    async def set_many(
+        self,
+        outputs: dict[str, tuple[CachedTaskOutput, int | None]],
+        nx: bool = False,
+    ) -> None:
+        """Cache many task outputs, each as (entry, ttl), in one pipeline."""
+        if not outputs:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for task_uuid, (entry, ttl) in outputs.items():
+                await self._set_entry(
+                    keys=[self._task_key(task_uuid)],
+                    args=[entry.body, entry.etag, entry.status, ttl or self.default_ttl, int(nx)],
+                    client=pipe,
+                )
+            await pipe.execute()
+
+    async def delete(self, task_uuid: str) -> None:
+        """Remove task from cache."""
+        await self.client.delete(self._task_key(task_uuid))
+
+    async def delete_many(self, task_uuids: list[str]) -> None:
+        """Remove many tasks from cache in one DEL."""
+        if task_uuids:
+            await self.client.delete(*(self._task_key(task_uuid) for task_uuid in task_uuids))
+
+    async def ping(self) -> bool:
+        """Check if Redis is reachable."""
+        try:
+            return await self.client.ping()
+        except redis.ConnectionError:
+            return False
+
+    async def close(self) -> None:
+        """Release pooled connections."""
+        await self.client.aclose()  # type: ignore[attr-defined]
+
+
+class MemoryCache:
+    """
+    Bounded in-process LRU tier in front of Redis for completed results.
+
+    Completed results never change, so entries need no TTL or invalidation;
+    they are evicted least-recently-used once either the entry or byte limit
+    is exceeded. Sizes are the encoded body length. Not thread-safe: use it
+    from the event loop only.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedTaskOutput] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, task_uuid: str) -> CachedTaskOutput | None:
+        """Get a cached response and mark it most recently used."""
+        entry = self._entries.get(task_uuid)
+        if entry is not None:
+            self._entries.move_to_end(task_uuid)
+        return entry
+
+    def set(self, task_uuid: str, entry: CachedTaskOutput) -> None:
+        """Cache a completed response; anything else is ignored."""
+        if entry.status != TaskStatus.COMPLETED or task_uuid in self._entries:
+            return
+        if len(entry.body) > self.max_bytes:
+            return
+        self._entries[task_uuid] = entry
+        self._bytes += len(entry.body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            cache_evictions_total.labels(tier="memory").inc()
+        memory_cache_entries.set(len(self._entries))
+        memory_cache_bytes.set(self._bytes)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Singleton cache instances
 cache = RedisCache(
     url=settings.redis_url,
     default_ttl=settings.cache_ttl_seconds,
 )
+
+async_cache = AsyncRedisCache(
+    url=settings.redis_url,
+    default_ttl=settings.cache_ttl_seconds,
+)
+
+# In-process tier for the API; None when disabled
+memory_cache = (
+    MemoryCache(
+        max_entries=settings.memory_cache_max_entries,
+        max_bytes=settings.memory_cache_max_bytes,
+    )
+    if settings.memory_cache_max_entries > 0
+    else None
+)
@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import math
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any, Literal
+
+import numpy as np
+import numpy.typing as npt
+
+# Hash algorithms offered by the file_hash task
+HashAlgorithm = Literal[
+    "md5",
+    "sha1",
+    "sha256",
+    "sha512",
+    "sha3_256",
+    "sha3_512",
+    "blake2b",
+    "blake2s",
+]
+
+# Their hashlib constructors
+HASH_FUNCTIONS: dict[str, Callable[[bytes], Any]] = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha512": hashlib.sha512,
+    "sha3_256": hashlib.sha3_256,
+    "sha3_512": hashlib.sha3_512,
+    "blake2b": hashlib.blake2b,
+    "blake2s": hashlib.blake2s,
+}
+
+
+# Operations of the vector_op task: reductions of `a`, and element-wise or dot products of `a`, `b`
+VectorOp = Literal["sum", "mean", "min", "max", "dot", "add", "multiply"]
+REDUCTIONS: dict[str, Callable[[npt.NDArray[Any]], Any]] = {
+    "sum": np.sum,
+    "mean": np.mean,
+    "min": np.min,
+    "max": np.max,
+}
+BINARY_OPS: dict[str, Callable[[npt.NDArray[Any], npt.NDArray[Any]], Any]] = {
+    "dot": np.dot,
+    "add": np.add,
+    "multiply": np.multiply,
+}
+
+# A vector is a JSON array of numbers, or base64 of little-endian float64 values (columnar)
+Vector = list[int | float] | str
+
+# Integers whose pairwise sums stay exact in int64; larger ones are added in Python
+_INT64_SAFE = 2**62
+_INT64_MAX = 2**63 - 1
+
+
+class NonFiniteResultError(ValueError):
+    """A vector_op result holding NaN or infinity, e.g. from an overflow; JSON cannot store it."""
+
+
+def compute_sum(a: int | float, b: int | float) -> dict[str, int | float]:
+    """Output of the sum task."""
+    return {"result": a + b}
+
+
+def compute_sum_batch(pairs: Sequence[tuple[int | float, int | float]]) -> list[int | float]:
+    """
+    Results of many sum tasks, with one vectorized addition per numeric kind.
+
+    Each result equals `a + b` in Python: integer pairs stay exact integers
+    (added in int64 when that cannot overflow) and any pair with a float is
+    added in float64.
+    """
+    results: list[int | float] = [0] * len(pairs)
+    ints: list[int] = []
+    floats: list[int] = []
+    for i, (a, b) in enumerate(pairs):
+        if isinstance(a, float) or isinstance(b, float):
+            floats.append(i)
+        elif abs(a) < _INT64_SAFE and abs(b) < _INT64_SAFE:
+            ints.append(i)
+        else:
+            results[i] = a + b
+    for indices, dtype in ((ints, np.int64), (floats, np.float64)):
+        if indices:
+            left = np.array([pairs[i][0] for i in indices], dtype=dtype)
+            right = np.array([pairs[i][1] for i in indices], dtype=dtype)
+            for i, result in zip(indices, np.add(left, right).tolist(), strict=True):
+                results[i] = result
+    return results
+
+
+def is_finite(values: Vector) -> bool:
+    """Whether every element of a vector is a finite number; base64 can carry NaN and infinity."""
+    if isinstance(values, str):
+        return bool(np.isfinite(as_array(values)).all())
+    return all(math.isfinite(value) for value in values if isinstance(value, float))
+
+
+def as_array(values: Vector) -> npt.NDArray[Any]:
+    """
+    A vector as a NumPy array; base64 payloads are decoded without copying.
+
+    Integer arrays are held in int64 (Python ints beyond its range), floats
+    and base64 payloads in float64.
+    """
+    if isinstance(values, str):
+        return np.frombuffer(base64.b64decode(values), dtype="<f8")
+    return np.asarray(values)
+
+
+def _may_overflow_int64(op: VectorOp, operands: list[npt.NDArray[Any]]) -> bool:
+    """Whether an integer operation could wrap in int64, from a bound on its result."""
+    if not all(operand.dtype.kind == "i" for operand in operands):
+        return False
+    # Bounds as Python ints: np.abs would itself wrap on the int64 minimum
+    bounds = [max(-int(operand.min()), int(operand.max())) for operand in operands]
+    length = len(operands[0])
+    if op == "sum":
+        bound = length * bounds[0]
+    elif op == "add":
+        bound = bounds[0] + bounds[1]
+    elif op == "multiply":
+        bound = bounds[0] * bounds[1]
+    elif op == "dot":
+        bound = length * bounds[0] * bounds[1]
+    else:
+        # mean accumulates in float64; min and max select an element
+        return False
+    return bound > _INT64_MAX
+
+
+def compute_vector_op(op: VectorOp, a: Vector, b: Vector | None = None) -> dict[str, Any]:
+    """
+    Output of the vector_op task: a number, or a list for element-wise operations.
+
+    Integer results are exact, as in Python: operations that could wrap in
+    int64 run on Python ints instead. A float result must stay finite.
+    """
+    if op not in REDUCTIONS and b is None:
+        raise ValueError(f"{op} needs two vectors")
+    operands = [as_array(a)] if b is None else [as_array(a), as_array(b)]
+    if _may_overflow_int64(op, operands):
+        operands = [operand.astype(object) for operand in operands]
+    try:
+        # Overflow is checked below, on the result
+        with np.errstate(over="ignore", invalid="ignore"):
+            operation = REDUCTIONS[op] if op in REDUCTIONS else BINARY_OPS[op]
+            result = operation(*operands)
+    except OverflowError as e:
+        # Python ints too large for float, e.g. the mean of huge integers
+        raise NonFiniteResultError(f"{op} result is not finite (overflow past float64)") from e
+    output = np.asarray(result).tolist()
+    if not is_finite(output if isinstance(output, list) else [output]):
+        raise NonFiniteResultError(f"{op} result is not finite (overflow past float64)")
+    return {"result": output}
+
+
+def compute_hash(
+    content: str,
+    algorithm: HashAlgorithm = "sha256",
+    algorithms: list[HashAlgorithm] | None = None,
+) -> dict[str, Any]:
+    """Output of the file_hash task."""
+    return compute_hash_chunks([content.encode("utf-8")], algorithm, algorithms)
+
+
+def compute_hash_chunks(
+    chunks: Iterable[bytes],
+    algorithm: HashAlgorithm = "sha256",
+    algorithms: list[HashAlgorithm] | None = None,
+) -> dict[str, Any]:
+    """
+    Output of the file_hash task for content read in chunks, in constant memory.
+
+    With `algorithms`, every digest is computed in the same pass over the
+    chunks and the output carries them all under `hashes`; otherwise it has
+    the single `algorithm`'s `hash`.
+    """
+    names = list(dict.fromkeys(algorithms)) if algorithms else [algorithm]
+    hashers = [HASH_FUNCTIONS[name](b"") for name in names]
+    content_length = 0
+    for chunk in chunks:
+        for hasher in hashers:
+            hasher.update(chunk)
+        content_length += len(chunk)
+    if algorithms:
+        return {
+            "hashes": {
+                name: hasher.hexdigest() for name, hasher in zip(names, hashers, strict=True)
+            },
+            "content_length": content_length,
+        }
+    return {
+        "hash": hashers[0].hexdigest(),
+        "algorithm": algorithm,
+        "content_length": content_length,
+    }
@@ -1,8 +1,28 @@
 from functools import lru_cache
+from typing import Literal
 
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class MemoPolicy(BaseModel):
+    """Memoization settings for one task type."""
+
+    # Idle lifetime of a stored result; each hit restarts it
+    ttl_seconds: int = 3600
+    # Least recently used results beyond this many are evicted; 0 means TTL only
+    max_entries: int = 0
+
+
+class BatchPolicy(BaseModel):
+    """How the batching consumer groups messages of one task type."""
+
+    # A batch runs once this many messages are waiting...
+    max_size: int = 100
+    # ...or once its oldest message has waited this long
+    linger_ms: int = 20
+
+
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
 
@@ -20,12 +40,105 @@ class Settings(BaseSettings):
 
     # Cache
     cache_ttl_seconds: int = 3600
+    # Short TTLs for non-final entries (pending/running/failed) and unknown task IDs
+    status_cache_ttl_seconds: int = 10
+    not_found_cache_ttl_seconds: int = 30
+    # In-process tier for completed results in each API process; 0 entries disables it
+    memory_cache_max_entries: int = 10_000
+    memory_cache_max_bytes: int = 64 * 1024 * 1024
+
+    # Long-poll: upper bound for ?wait= on /get-task-output
+    long_poll_max_wait_seconds: float = 60.0
+
+    # SSE: idle interval before a keep-alive comment on /tasks/stream
+    stream_heartbeat_seconds: float = 15.0
+
+    # Inline fast path: task types run in the API process instead of the queue,
+    # as a JSON list (e.g. ["sum", "file_hash"]); empty keeps everything queued
+    inline_task_names: list[str] = []
+    inline_max_input_chars: int = 64 * 1024
+    inline_max_workers: int = 4
+
+    # Uploaded file_hash payloads, spooled to a directory shared by the API and the workers
+    # (see shared/blobs.py); both sides move them in chunks of hash_chunk_size bytes
+    blob_store_dir: str = "/tmp/tasker-blobs"
+    blob_max_bytes: int = 1024 * 1024 * 1024
+    hash_chunk_size: int = 1024 * 1024
+
+    # Vectorized sums: /run-tasks sends its sum tasks as sum_batch messages of up to
+    # sum_batch_max_size tasks, each computed with one NumPy addition and one bulk write
+    sum_batching: bool = False
+    sum_batch_max_size: int = 1000
+
+    # Memoization of deterministic task types, as JSON keyed by task name, e.g.
+    # {"sum": {"ttl_seconds": 86400, "max_entries": 100000}}; unlisted types always run
+    memo_policies: dict[str, MemoPolicy] = {}
+    # How long identical submissions wait on one in-flight execution before it is presumed lost
+    memo_inflight_ttl_seconds: int = 600
+    # How often held submissions whose execution was lost are released (see worker/memo.py)
+    memo_recovery_interval_seconds: int = 60
+
+    # Transactional outbox: the API commits each task with a dispatch record instead of publishing
+    # it, and the relay (python -m worker.outbox_relay) publishes the records in batches, retrying
+    # each up to outbox_max_attempts times before failing its task
+    task_outbox: bool = False
+    outbox_batch_size: int = 500
+    outbox_poll_interval_ms: int = 100
+    outbox_max_attempts: int = 10
+
+    # Queue backend for sum, file_hash and vector_op: "celery" publishes them to Redis, "postgres"
+    # leaves them pending in the tasks table for python -m worker.pg_consumer to claim in batches
+    # (FOR UPDATE SKIP LOCKED), woken by LISTEN/NOTIFY; query_llm always goes through Celery
+    queue_backend: Literal["celery", "postgres"] = "celery"
+    pg_queue_batch_size: int = 100
+    # Idle workers also poll this often, in case a notification was missed
+    pg_queue_poll_interval_ms: int = 1000
+    # A claimed task still running after this long is presumed lost with its worker and requeued
+    pg_queue_visibility_timeout_seconds: int = 300
 
     # Celery
     celery_concurrency: int = 4
+    # Serve a worker's /metrics on this port; 0 is off. Prefork workers also need
+    # PROMETHEUS_MULTIPROC_DIR set (see worker/celery_app.py)
+    celery_metrics_port: int = 0
+    # Buffer worker state transitions and write them in batches (see worker/state_writer.py)
+    worker_state_batching: bool = False
+    worker_state_batch_size: int = 200
+    worker_state_flush_interval_ms: int = 50
+    # Batching consumer (python -m worker.batch_consumer): micro-batch policies as JSON keyed by
+    # task name, e.g. {"sum": {"max_size": 200, "linger_ms": 20}}; unlisted types run one by one
+    worker_batch_policies: dict[str, BatchPolicy] = {}
 
     # LLM (Anthropic)
     anthropic_api_key: str = ""
+    # Empty uses the SDK default; point at a local stub of the Messages API for testing
+    anthropic_base_url: str = ""
+    llm_model: str = "claude-3-haiku-20240307"
+    # Pooled HTTP connections of each worker process's client (see worker/llm_client.py)
+    anthropic_max_connections: int = 100
+    anthropic_keepalive_seconds: float = 60.0
+    # Cache of responses by model, prompt and max_tokens; 0 TTL disables it
+    llm_cache_ttl_seconds: int = 0
+    llm_cache_max_entries: int = 10_000
+    # How long an identical prompt waits on the in-flight call before calling upstream itself
+    llm_coalesce_timeout_seconds: float = 60.0
+    # Shared upstream quota for all workers (see worker/llm_limiter.py). The limits are starting
+    # points, replaced by those the API reports in its headers; 0 concurrency is unbounded
+    llm_rate_limiting: bool = False
+    llm_requests_per_minute: int = 50
+    llm_tokens_per_minute: int = 40_000
+    llm_max_concurrency: int = 0
+    llm_limiter_max_wait_seconds: float = 300.0
+    # Stream partial output to Redis as it is generated (see shared/llm_stream.py); text is
+    # appended at most every flush interval, and the stream expires after the TTL
+    llm_streaming: bool = True
+    llm_stream_flush_interval_ms: int = 50
+    llm_stream_ttl_seconds: int = 3600
+    # Batch-mode prompts go out in Message Batches of up to this many requests
+    # (see worker/llm_batch.py); celery beat submits and polls on these intervals
+    llm_batch_max_requests: int = 10_000
+    llm_batch_submit_interval_seconds: float = 60.0
+    llm_batch_poll_interval_seconds: float = 60.0
 
     # Logging
     log_level: str = "INFO"
@@ -1,12 +1,28 @@
 from typing import Annotated
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 
 from shared.config import get_settings
 
 settings = get_settings()
 
+# Async drivers for the sync URL schemes we accept in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching asyncio driver."""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+# Sync engine - used by the Celery worker
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,
@@ -16,6 +32,20 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine - used by the API so DB I/O never blocks the event loop
+async_engine = create_async_engine(
+    to_async_url(settings.database_url),
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
 class Base(DeclarativeBase):
     """Base class for all SQLAlchemy models."""
@@ -23,5 +53,6 @@ class Base(DeclarativeBase):
     pass
 
 
-# Type alias for dependency injection
+# Type aliases for dependency injection
 DatabaseSession = Annotated[Session, "Database session dependency"]
+AsyncDatabaseSession = Annotated[AsyncSession, "Async database session dependency"]
@@ -0,0 +1,220 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import redis
+import redis.asyncio as aioredis
+
+from shared.config import get_settings
+from shared.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Single pub/sub channel carrying every task status transition
+TASK_EVENTS_CHANNEL = "tasker:task-events"
+
+
+@dataclass(frozen=True)
+class TaskEvent:
+    """A task status transition."""
+
+    task_uuid: str
+    status: str
+    task_name: str | None = None
+
+    def encode(self) -> str:
+        """Serialize for publishing."""
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def decode(cls, data: str | bytes) -> "TaskEvent":
+        """Parse a published event."""
+        return cls(**json.loads(data))
+
+
+def publish_task_event(
+    client: "redis.Redis[str]",
+    task_id: str,
+    status: str,
+    task_name: str | None = None,
+) -> None:
+    """
+    Publish a task status transition.
+
+    Best-effort: the task state is already durable in Postgres, so a Redis
+    error is logged and swallowed rather than failing the task.
+    """
+    event = TaskEvent(task_uuid=task_id, status=status, task_name=task_name)
+    try:
+        client.publish(TASK_EVENTS_CHANNEL, event.encode())
+    except redis.RedisError as e:
+        logger.warning(f"Failed to publish task event for {task_id}: {e}")
+
+
+async def publish_task_event_async(
+    client: "aioredis.Redis[Any]",
+    task_id: str,
+    status: str,
+    task_name: str | None = None,
+) -> None:
+    """Publish a task status transition from asyncio code. Best-effort, like the sync variant."""
+    event = TaskEvent(task_uuid=task_id, status=status, task_name=task_name)
+    try:
+        await client.publish(TASK_EVENTS_CHANNEL, event.encode())
+    except redis.RedisError as e:
+        logger.warning(f"Failed to publish task event for {task_id}: {e}")
+
+
+class TaskSubscription:
+    """Receives the task events a subscriber is interested in."""
+
+    def __init__(
+        self,
+        task_ids: set[str] | None,
+        task_names: set[str] | None = None,
+        maxsize: int = 1000,
+    ) -> None:
+        self.task_ids = task_ids
+        self.task_names = task_names
+        self._queue: asyncio.Queue[TaskEvent] = asyncio.Queue(maxsize=maxsize)
+
+    def matches(self, event: TaskEvent) -> bool:
+        """Whether the event passes this subscription's task name filter."""
+        return self.task_names is None or event.task_name in self.task_names
+
+    def deliver(self, event: TaskEvent) -> None:
+        """Queue an event without blocking the hub; drops it if the subscriber is too slow."""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping task event for {event.task_uuid}: subscriber queue full")
+
+    async def get(self) -> TaskEvent:
+        """Wait for the next event."""
+        return await self._queue.get()
+
+
+class TaskEventHub:
+    """
+    Fans task events out to in-process subscribers.
+
+    Holds one Redis pub/sub connection per API process, opened on first use,
+    so any number of waiters cost a single subscription.
+    """
+
+    def __init__(self, url: str, channel: str = TASK_EVENTS_CHANNEL) -> None:
+        self.url = url
+        self.channel = channel
+        self._client: aioredis.Redis[str] | None = None
+        self._pubsub: aioredis.client.PubSub | None = None
+        self._reader: asyncio.Task[None] | None = None
+        self._lock = asyncio.Lock()
+        self._by_task: dict[str, set[TaskSubscription]] = {}
+        self._all: set[TaskSubscription] = set()
+
+    @asynccontextmanager
+    async def subscribe(
+        self,
+        task_ids: set[str] | None = None,
+        task_names: set[str] | None = None,
+    ) -> AsyncIterator[TaskSubscription]:
+        """
+        Subscribe to events for the given task IDs, or to all events if None.
+
+        `task_names` narrows a subscription to events for those task types.
+
+        The Redis subscription is confirmed before this yields, so a state read
+        made inside the block cannot miss a transition published after it.
+        """
+        await self._ensure_started()
+        subscription = TaskSubscription(task_ids, task_names)
+        self._register(subscription)
+        try:
+            yield subscription
+        finally:
+            self._unregister(subscription)
+
+    def _register(self, subscription: TaskSubscription) -> None:
+        if subscription.task_ids is None:
+            self._all.add(subscription)
+            return
+        for task_id in subscription.task_ids:
+            self._by_task.setdefault(task_id, set()).add(subscription)
+
+    def _unregister(self, subscription: TaskSubscription) -> None:
+        if subscription.task_ids is None:
+            self._all.discard(subscription)
+            return
+        for task_id in subscription.task_ids:
+            subscribers = self._by_task.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_task[task_id]
+
+    def dispatch(self, event: TaskEvent) -> None:
+        """Deliver an event to every matching subscriber."""
+        for subscription in self._by_task.get(event.task_uuid, ()):
+            if subscription.matches(event):
+                subscription.deliver(event)
+        for subscription in self._all:
+            if subscription.matches(event):
+                subscription.deliver(event)
+
+    async def _ensure_started(self) -> None:
+        if self._reader is not None and not self._reader.done():
+            return
+        async with self._lock:
+            if self._reader is not None:
+                if not self._reader.done():
+                    return
+                # The reader died on an unexpected error; start over on a fresh connection
+                reader, self._reader = self._reader, None
+                error = None if reader.cancelled() else reader.exception()
+                logger.warning(f"Task event reader stopped, restarting it: {error!r}")
+                await self.close()
+            self._client = aioredis.from_url(self.url, decode_responses=True)
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(self.channel)
+            self._reader = asyncio.create_task(self._read_loop(self._pubsub))
+
+    async def _read_loop(self, pubsub: aioredis.client.PubSub) -> None:
+        while True:
+            try:
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        self.dispatch(TaskEvent.decode(message["data"]))
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"Ignoring malformed task event: {e}")
+            except redis.RedisError as e:
+                # Waiters fall back to their timeout; resubscribe and carry on
+                logger.warning(f"Task event subscription lost, reconnecting: {e}")
+                await asyncio.sleep(1)
+                try:
+                    await pubsub.subscribe(self.channel)
+                except redis.RedisError:
+                    continue
+
+    async def close(self) -> None:
+        """Stop the reader and release the pub/sub connection."""
+        if self._reader is not None:
+            self._reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()  # type: ignore[attr-defined]
+            self._pubsub = None
+        if self._client is not None:
+            await self._client.aclose()  # type: ignore[attr-defined]
+            self._client = None
+
+
+# Singleton hub for the API process
+task_event_hub = TaskEventHub(settings.redis_url)
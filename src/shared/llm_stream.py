@@ -0,0 +1,145 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Literal
+
+import redis
+import redis.asyncio as aioredis
+
+from shared.cache import async_cache
+from shared.config import get_settings
+from shared.logging import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Kinds of stream entries: an upstream call began (a retry discards earlier text),
+# a piece of text, and the task reached a terminal status
+EntryKind = Literal["start", "delta", "end"]
+
+
+def llm_stream_key(task_id: str) -> str:
+    """Redis stream carrying a task's partial LLM output."""
+    return f"llm-stream:{task_id}"
+
+
+@dataclass(frozen=True, slots=True)
+class LLMStreamEntry:
+    """One entry of a task's output stream."""
+
+    kind: EntryKind
+    text: str = ""
+    status: str = ""
+    # Stream entry ID; empty for entries not read from Redis
+    id: str = ""
+
+    def encode(self) -> str:
+        """The entry's data as sent to clients."""
+        if self.kind == "delta":
+            return json.dumps({"text": self.text})
+        if self.kind == "end":
+            return json.dumps({"status": self.status})
+        return "{}"
+
+    @classmethod
+    def from_fields(cls, entry_id: str, fields: dict[str, str]) -> "LLMStreamEntry":
+        """Parse an entry read from Redis."""
+        return cls(
+            kind=fields["kind"],  # type: ignore[arg-type]
+            text=fields.get("text", ""),
+            status=fields.get("status", ""),
+            id=entry_id,
+        )
+
+
+class LLMStreamWriter:
+    """
+    Appends a task's LLM output to its Redis stream as it is generated.
+
+    Text is buffered and appended every `flush_interval` seconds rather than
+    per token. Best-effort: after a Redis error the rest of the stream is
+    dropped, and readers fall back to the persisted result.
+    """
+
+    def __init__(
+        self,
+        client: "redis.Redis[str]",
+        task_id: str,
+        flush_interval: float,
+        ttl: int,
+    ) -> None:
+        self.client = client
+        self.key = llm_stream_key(task_id)
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self.started = False
+        self._buffer: list[str] = []
+        self._flushed_at = 0.0
+        self._broken = False
+
+    def start(self) -> None:
+        """Mark the start of an upstream call; text from an earlier attempt is void."""
+        self._buffer.clear()
+        self.started = True
+        self._flushed_at = time.monotonic()
+        self._append({"kind": "start"})
+
+    def write(self, text: str) -> None:
+        """Add generated text, appending it once the flush interval has passed."""
+        self._buffer.append(text)
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append any buffered text."""
+        if self._buffer:
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self._append({"kind": "delta", "text": text})
+        self._flushed_at = time.monotonic()
+
+    def end(self, status: str) -> None:
+        """Close the stream with the task's terminal status."""
+        self.flush()
+        self._append({"kind": "end", "status": status})
+
+    def _append(self, fields: dict[str, Any]) -> None:
+        if self._broken:
+            return
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.xadd(self.key, fields)
+                pipe.expire(self.key, self.ttl)
+                pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to stream LLM output to {self.key}: {e}")
+            self._broken = True
+
+
+class AsyncLLMStreams:
+    """Reads task output streams on the API side."""
+
+    def __init__(self, client: "aioredis.Redis[bytes]") -> None:
+        self.client = client
+
+    async def read(self, task_id: str, after: str, timeout: float) -> list[LLMStreamEntry]:
+        """Entries after the `after` ID, waiting up to `timeout` seconds for the first one."""
+        response = await self.client.xread(
+            {llm_stream_key(task_id): after}, block=max(1, int(timeout * 1000))
+        )
+        return [
+            LLMStreamEntry.from_fields(
+                entry_id.decode(),
+                {name.decode(): value.decode() for name, value in fields.items()},
+            )
+            for _, entries in response or []
+            for entry_id, fields in entries
+        ]
+
+    async def exists(self, task_id: str) -> bool:
+        """Whether the task has a stream (it expires `llm_stream_ttl_seconds` after the end)."""
+        return bool(await self.client.exists(llm_stream_key(task_id)))
+
+
+# Singleton for the API process, sharing the cache's Redis connections
+async_llm_streams = AsyncLLMStreams(async_cache.client)
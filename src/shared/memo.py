@@ -0,0 +1,207 @@
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Literal
+
+import redis
+import redis.asyncio as aioredis
+
+from shared.cache import async_cache, cache
+from shared.config import MemoPolicy, get_settings
+from shared.metrics import cache_evictions_total
+from shared.serialization import dumps, loads
+
+settings = get_settings()
+
+# Returns a stored result and marks it recently used, restarting its TTL.
+# KEYS: result, index. ARGV: ttl, now.
+LOOKUP_SCRIPT = """
+local result = redis.call('GET', KEYS[1])
+if result then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    redis.call('ZADD', KEYS[2], ARGV[2], KEYS[1])
+end
+return result
+"""
+
+# Decides who runs a submission: a stored result wins, then an execution already
+# in flight (the submission waits on it), otherwise the caller becomes the leader.
+# KEYS: result, inflight, waiters. ARGV: task id, inflight ttl.
+CLAIM_SCRIPT = """
+local result = redis.call('GET', KEYS[1])
+if result then
+    return {'hit', result}
+end
+if redis.call('GET', KEYS[2]) then
+    redis.call('RPUSH', KEYS[3], ARGV[1])
+    redis.call('EXPIRE', KEYS[3], ARGV[2])
+    return {'joined', ''}
+end
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+return {'leader', ''}
+"""
+
+# Stores a result, evicts expired and least recently used results of the task
+# type, and hands back the submissions that were waiting for it.
+# KEYS: result, inflight, waiters, index. ARGV: output, ttl, now, max entries.
+COMPLETE_SCRIPT = """
+local ttl = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_entries = tonumber(ARGV[4])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ttl)
+redis.call('DEL', KEYS[2])
+redis.call('ZADD', KEYS[4], now, KEYS[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', now - ttl)
+local evicted = 0
+if max_entries > 0 then
+    local excess = redis.call('ZCARD', KEYS[4]) - max_entries
+    if excess > 0 then
+        local oldest = redis.call('ZPOPMIN', KEYS[4], excess)
+        for i = 1, #oldest, 2 do
+            redis.call('DEL', oldest[i])
+        end
+        evicted = excess
+    end
+end
+local waiters = redis.call('LRANGE', KEYS[3], 0, -1)
+redis.call('DEL', KEYS[3])
+return {waiters, evicted}
+"""
+
+# Gives up leadership after a failed execution and hands back the waiting
+# submissions so they can run on their own. A non-leader releases nothing.
+# KEYS: inflight, waiters. ARGV: task id.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return {}
+end
+redis.call('DEL', KEYS[1])
+local waiters = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+return waiters
+"""
+
+
+def memo_policy(task_name: str) -> MemoPolicy | None:
+    """Memoization settings for a task type, or None if it is not memoized."""
+    return settings.memo_policies.get(task_name)
+
+
+def memo_key(task_name: str, task_parameters: dict[str, Any]) -> str:
+    """
+    Key of a task's memoized result: a digest of its canonical parameters.
+
+    Keys are sorted and JSON types kept, so `{"a": 1, "b": 2}` and
+    `{"b": 2, "a": 1}` share a result while `1` and `1.0` do not.
+    """
+    canonical = json.dumps(task_parameters, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+    return f"memo:{task_name}:{digest}"
+
+
+def _index_key(task_name: str) -> str:
+    """Sorted set of a task type's stored results, scored by last use."""
+    return f"memo-index:{task_name}"
+
+
+@dataclass(frozen=True, slots=True)
+class MemoClaim:
+    """How a new submission of a memoized task type should proceed."""
+
+    outcome: Literal["hit", "leader", "joined"]
+    output: dict[str, Any] | None = None
+
+
+class TaskMemo:
+    """Memoized results on the worker side: storing them and releasing waiters."""
+
+    def __init__(self, client: "redis.Redis[str]") -> None:
+        self.client = client
+        self._complete = client.register_script(COMPLETE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    def complete(
+        self,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        output: dict[str, Any],
+        policy: MemoPolicy,
+    ) -> list[str]:
+        """Store a task's result; returns the IDs of submissions waiting on it."""
+        key = memo_key(task_name, task_parameters)
+        waiters, evicted = self._complete(
+            keys=[key, f"{key}:inflight", f"{key}:waiters", _index_key(task_name)],
+            args=[dumps(output), policy.ttl_seconds, time.time(), policy.max_entries],
+        )
+        if evicted:
+            cache_evictions_total.labels(tier="memo").inc(evicted)
+        return list(waiters)
+
+    def release(self, task_name: str, task_parameters: dict[str, Any], task_id: str) -> list[str]:
+        """Drop a failed leader's claim; returns the IDs of submissions waiting on it."""
+        key = memo_key(task_name, task_parameters)
+        return list(self._release(keys=[f"{key}:inflight", f"{key}:waiters"], args=[task_id]))
+
+    def in_flight(self, submissions: list[tuple[str, dict[str, Any]]]) -> list[bool]:
+        """Whether each (task_name, task_parameters) has a claimed execution, in one round trip."""
+        with self.client.pipeline(transaction=False) as pipe:
+            for task_name, task_parameters in submissions:
+                pipe.exists(f"{memo_key(task_name, task_parameters)}:inflight")
+            return [bool(exists) for exists in pipe.execute()]
+
+
+class AsyncTaskMemo:
+    """Memoized results on the API side: lookups and singleflight claims."""
+
+    def __init__(self, client: "aioredis.Redis[bytes]") -> None:
+        self.client = client
+        self._lookup = client.register_script(LOOKUP_SCRIPT)
+        self._claim = client.register_script(CLAIM_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    async def lookup(
+        self,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        policy: MemoPolicy,
+    ) -> dict[str, Any] | None:
+        """Get a stored result, if any."""
+        result = await self._lookup(
+            keys=[memo_key(task_name, task_parameters), _index_key(task_name)],
+            args=[policy.ttl_seconds, time.time()],
+        )
+        return loads(result) if result is not None else None
+
+    async def claim(
+        self,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        task_id: str,
+    ) -> MemoClaim:
+        """Claim the execution of a submission, or join the one already in flight."""
+        key = memo_key(task_name, task_parameters)
+        outcome, result = await self._claim(
+            keys=[key, f"{key}:inflight", f"{key}:waiters"],
+            args=[task_id, settings.memo_inflight_ttl_seconds],
+        )
+        outcome = outcome.decode()
+        if outcome == "hit":
+            return MemoClaim("hit", loads(result))
+        return MemoClaim(outcome)
+
+    async def release(
+        self,
+        task_name: str,
+        task_parameters: dict[str, Any],
+        task_id: str,
+    ) -> list[str]:
+        """Drop a leader's claim; returns the IDs of submissions waiting on it."""
+        key = memo_key(task_name, task_parameters)
+        waiters = await self._release(keys=[f"{key}:inflight", f"{key}:waiters"], args=[task_id])
+        return [waiter.decode() for waiter in waiters]
+
+
+# Singletons sharing the cache's Redis connections: the worker's and the API's
+task_memo = TaskMemo(cache.client)
+async_task_memo = AsyncTaskMemo(async_cache.client)
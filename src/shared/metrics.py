@@ -34,6 +34,128 @@ task_duration_seconds = Histogram(
     buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0],
 )
 
+inline_tasks_total = Counter(
+    "tasker_inline_tasks_total",
+    "Tasks eligible for the API's inline fast path, by outcome",
+    ["task_name", "result"],
+)
+
+state_flush_size = Histogram(
+    "tasker_worker_state_flush_size",
+    "Task state transitions written per batched worker flush",
+    buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500],
+)
+
+worker_batch_size = Histogram(
+    "tasker_worker_batch_size",
+    "Messages run together per batch by the batching consumer",
+    ["task_name"],
+    buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500, 1000],
+)
+
+# Outbox metrics
+outbox_entries_total = Counter(
+    "tasker_outbox_entries_total",
+    "Outbox entries handled by the relay: published, retried or abandoned",
+    ["result"],
+)
+
+outbox_lag_seconds = Histogram(
+    "tasker_outbox_lag_seconds",
+    "Time from a task's commit to the relay publishing it",
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0],
+)
+
+# Queue metrics
+queue_depth = Gauge(
+    "tasker_queue_depth",
+    "Messages waiting in a broker queue, sampled when metrics are scraped",
+    ["queue"],
+)
+
+queue_wait_seconds = Histogram(
+    "tasker_queue_wait_seconds",
+    "Time a task message waited in its queue before a worker started it",
+    ["queue"],
+    buckets=[0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0],
+)
+
+# Postgres queue metrics
+pg_queue_claim_size = Histogram(
+    "tasker_pg_queue_claim_size",
+    "Tasks claimed together per batch by a Postgres queue worker",
+    buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500, 1000],
+)
+
+pg_queue_requeued_total = Counter(
+    "tasker_pg_queue_requeued_total",
+    "Claimed tasks put back to pending after outliving the visibility timeout",
+)
+
+# Cache metrics - hit ratio = hits / (hits + misses)
+cache_requests_total = Counter(
+    "tasker_cache_requests_total",
+    "Task result cache lookups",
+    ["tier", "result"],
+)
+
+cache_fills_total = Counter(
+    "tasker_cache_fills_total",
+    "Task result cache writes",
+    ["tier", "source"],
+)
+
+memory_cache_entries = Gauge(
+    "tasker_memory_cache_entries",
+    "Results held in the in-process cache tier",
+)
+
+memory_cache_bytes = Gauge(
+    "tasker_memory_cache_bytes",
+    "Approximate size of results held in the in-process cache tier",
+)
+
+memo_requests_total = Counter(
+    "tasker_memo_requests_total",
+    "Submissions of memoized task types: hit (stored result), leader (runs) or joined",
+    ["task_name", "result"],
+)
+
+llm_calls_avoided_total = Counter(
+    "tasker_llm_calls_avoided_total",
+    "LLM upstream calls avoided, by a cached response (hit) or an identical in-flight call",
+    ["reason"],
+)
+
+llm_tokens_saved_total = Counter(
+    "tasker_llm_tokens_saved_total",
+    "Tokens not billed thanks to avoided LLM calls",
+    ["kind"],
+)
+
+llm_limiter_wait_seconds = Histogram(
+    "tasker_llm_limiter_wait_seconds",
+    "Time LLM calls waited for upstream rate limit or concurrency capacity",
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0],
+)
+
+llm_rate_limited_total = Counter(
+    "tasker_llm_rate_limited_total",
+    "LLM calls answered with 429 Too Many Requests",
+)
+
+llm_batch_requests_total = Counter(
+    "tasker_llm_batch_requests_total",
+    "Batch-mode LLM prompts submitted in Message Batches, and their results",
+    ["result"],
+)
+
+cache_evictions_total = Counter(
+    "tasker_cache_evictions_total",
+    "Task result cache evictions",
+    ["tier"],
+)
+
 # System metrics
 tasks_pending = Gauge(
     "tasker_tasks_pending",
@@ -2,7 +2,7 @@ import uuid
 from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import JSON, DateTime, String, Text, Uuid
+from sqlalchemy import JSON, BigInteger, DateTime, ForeignKey, Integer, String, Text, Uuid
 from sqlalchemy.orm import Mapped, mapped_column
 
 from shared.database import Base
@@ -17,6 +17,14 @@ class TaskStatus:
     FAILED = "failed"
 
 
+class TaskPriority:
+    """Task priority constants."""
+
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
+
+
 class Task(Base):
     """SQLAlchemy model for tasks table."""
 
@@ -39,6 +47,11 @@ class Task(Base):
         default=TaskStatus.PENDING,
         index=True,
     )
+    priority: Mapped[str] = mapped_column(
+        String(10),
+        nullable=False,
+        default=TaskPriority.NORMAL,
+    )
     task_output: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
@@ -54,6 +67,36 @@ class Task(Base):
         DateTime(timezone=True),
         nullable=True,
     )
+    # Set while a memoized submission waits on an identical in-flight execution
+    held_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
 
     def __repr__(self) -> str:
         return f"<Task {self.id} [{self.status}]>"
+
+
+class TaskOutbox(Base):
+    """SQLAlchemy model for task_outbox table: tasks committed but not yet published."""
+
+    __tablename__ = "task_outbox"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    task_id: Mapped[uuid.UUID] = mapped_column(
+        Uuid,
+        ForeignKey("tasks.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+    )
+
+    def __repr__(self) -> str:
+        return f"<TaskOutbox {self.id} [{self.task_id}]>"
@@ -0,0 +1,15 @@
+from shared.config import get_settings
+
+settings = get_settings()
+
+# Notified, with an empty payload, whenever tasks are queued in Postgres. Postgres folds
+# identical notifications within a transaction, so a batch of inserts wakes workers once.
+CHANNEL = "tasker_tasks"
+
+# Task types the Postgres backend runs; query_llm needs Celery's gevent workers and Message Batches
+TASK_NAMES = frozenset({"sum", "file_hash", "vector_op"})
+
+
+def queued_task_names() -> frozenset[str]:
+    """Task types left pending in Postgres for queue workers to claim, instead of published."""
+    return TASK_NAMES if settings.queue_backend == "postgres" else frozenset()
@@ -0,0 +1,226 @@
+"""
+Batching consumer: runs small tasks in micro-batches instead of one by one.
+
+    python -m worker.batch_consumer --queues sum,file_hash,vector_op --metrics-port 9101
+
+Takes the place of `celery worker` on the queues it consumes. Policies come
+from WORKER_BATCH_POLICIES.
+"""
+
+import argparse
+import heapq
+import signal
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+from celery import Celery
+from celery import Task as CeleryTask
+from celery.exceptions import Retry
+from kombu import Message
+from prometheus_client import start_http_server
+
+from shared.config import BatchPolicy, get_settings
+from shared.logging import get_logger, setup_logging
+from shared.metrics import worker_batch_size
+from worker.state_writer import state_writer
+from worker.tasks import _resolve_task
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Task types without a policy run one message at a time
+UNBATCHED = BatchPolicy(max_size=1, linger_ms=0)
+
+# Upper bound on one wait for messages, so a stop request is noticed promptly
+MAX_WAIT_SECONDS = 1.0
+
+
+@dataclass(order=True)
+class PendingMessage:
+    """A received task message waiting for its batch, ordered by when it is due."""
+
+    due: float
+    task_name: str = field(compare=False)
+    task_id: str = field(compare=False)
+    args: list[Any] = field(compare=False)
+    kwargs: dict[str, Any] = field(compare=False)
+    retries: int = field(compare=False)
+    message: Message = field(compare=False)
+
+
+class BatchConsumer:
+    """
+    Consumes Celery task messages and runs them in batches per task type.
+
+    Messages of a type are held until `max_size` of them are waiting or the
+    oldest has waited `linger_ms`. A batch runs through the regular task
+    functions with their state transitions collected, so the whole batch
+    costs one write: one UPDATE and commit, one cache pipeline and one
+    events pipeline (see TaskStateWriter.write). The messages are acked
+    together after the write, or all requeued if it fails. A failing task
+    is retried by its own Celery retry policy, as in a worker; messages with
+    an ETA (retries with a countdown) are held until due.
+    """
+
+    def __init__(self, app: Celery, policies: dict[str, BatchPolicy]) -> None:
+        self.app = app
+        # Policies are configured per task type ("sum"); messages carry the Celery task name
+        self._types = {_resolve_task(name).name: name for name in policies}
+        self.policies = {_resolve_task(name).name: policy for name, policy in policies.items()}
+        # Received messages per task type, oldest first
+        self._batches: dict[str, list[PendingMessage]] = {}
+        # Messages whose ETA has not come yet, soonest first
+        self._delayed: list[PendingMessage] = []
+        self._stopped = False
+
+    def policy(self, task_name: str) -> BatchPolicy:
+        """The batching policy for messages of a Celery task."""
+        return self.policies.get(task_name, UNBATCHED)
+
+    @property
+    def prefetch_count(self) -> int:
+        """Messages to take from the broker at once: enough to fill every batch."""
+        return sum(policy.max_size for policy in self.policies.values()) + 1
+
+    def on_message(self, body: Any, message: Message) -> None:
+        """Hold a received message for its batch; unknown tasks are dropped."""
+        headers = message.headers
+        task_name = headers.get("task", "")
+        if task_name not in self.app.tasks:
+            logger.error(f"Dropping message for unknown task {task_name!r}")
+            message.reject(requeue=False)
+            return
+        args, kwargs, _ = body
+        now = time.monotonic()
+        eta = headers.get("eta")
+        delay = (datetime.fromisoformat(eta).timestamp() - time.time()) if eta else 0.0
+        pending = PendingMessage(
+            due=now + max(0.0, delay),
+            task_name=task_name,
+            task_id=headers["id"],
+            args=list(args),
+            kwargs=dict(kwargs),
+            retries=headers.get("retries") or 0,
+            message=message,
+        )
+        if delay > 0:
+            heapq.heappush(self._delayed, pending)
+            return
+        self._add(pending, now)
+
+    def _add(self, pending: PendingMessage, now: float) -> None:
+        pending.due = now + self.policy(pending.task_name).linger_ms / 1000
+        batch = self._batches.setdefault(pending.task_name, [])
+        batch.append(pending)
+        if len(batch) >= self.policy(pending.task_name).max_size:
+            self.run_batch(pending.task_name)
+
+    def run_due(self) -> float:
+        """Run every batch that has lingered long enough; returns the seconds until the next."""
+        now = time.monotonic()
+        while self._delayed and self._delayed[0].due <= now:
+            self._add(heapq.heappop(self._delayed), now)
+        for task_name, batch in list(self._batches.items()):
+            if batch and batch[0].due <= now:
+                self.run_batch(task_name)
+        dues = [batch[0].due for batch in self._batches.values() if batch]
+        if self._delayed:
+            dues.append(self._delayed[0].due)
+        return min([MAX_WAIT_SECONDS, *(due - now for due in dues)])
+
+    def run_batch(self, task_name: str) -> None:
+        """Run the waiting messages of a task type, write their state at once and ack them."""
+        batch = self._batches.pop(task_name, [])
+        if not batch:
+            return
+        worker_batch_size.labels(task_name=self._types.get(task_name, task_name)).observe(
+            len(batch)
+        )
+        task = self.app.tasks[task_name]
+        with state_writer.collect() as collected:
+            for pending in batch:
+                self._run(task, pending)
+        try:
+            state_writer.write(list(collected.values()))
+        except Exception:
+            logger.exception(f"Failed to write state of a {task_name} batch, requeueing it")
+            for pending in batch:
+                pending.message.requeue()
+            return
+        for pending in batch:
+            pending.message.ack()
+
+    def _run(self, task: CeleryTask, pending: PendingMessage) -> None:
+        """Run one task with a worker-like request, so its retry policy applies."""
+        task.push_request(
+            id=pending.task_id,
+            args=pending.args,
+            kwargs=pending.kwargs,
+            retries=pending.retries,
+            delivery_info=pending.message.delivery_info,
+            called_directly=False,
+        )
+        try:
+            task.run(*pending.args, **pending.kwargs)
+        except Retry:
+            # Republished with a countdown; this message is done with
+            pass
+        except Exception as e:
+            logger.warning(f"Task {pending.task_id} failed without retries left: {e}")
+        finally:
+            task.pop_request()
+
+    def stop(self, *args: object) -> None:
+        """Finish the current wait, run what is held, then return from `run`."""
+        self._stopped = True
+
+    def run(self, queue_names: list[str]) -> None:
+        """Consume the given queues until stopped."""
+        queues = [self.app.amqp.queues[name] for name in queue_names]
+        with self.app.connection_for_read() as connection, connection.Consumer(
+            queues,
+            callbacks=[self.on_message],
+            accept=["json"],
+            prefetch_count=self.prefetch_count,
+        ):
+            logger.info(f"Batching consumer started on {', '.join(queue_names)}")
+            timeout = MAX_WAIT_SECONDS
+            while not self._stopped:
+                with suppress(TimeoutError):
+                    connection.drain_events(timeout=max(timeout, 0.001))
+                timeout = self.run_due()
+            for task_name in list(self._batches):
+                self.run_batch(task_name)
+            for pending in self._delayed:
+                pending.message.requeue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--queues", default="sum,file_hash,vector_op", help="Comma-separated queues to consume"
+    )
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve /metrics; 0 is off")
+    args = parser.parse_args()
+
+    # Import here so the task modules register with the app first
+    from worker.celery_app import celery_app
+
+    setup_logging()
+    celery_app.loader.import_default_modules()
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    consumer = BatchConsumer(celery_app, settings.worker_batch_policies)
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+    try:
+        consumer.run(args.queues.split(","))
+    finally:
+        state_writer.close()
+
+
+if __name__ == "__main__":
+    main()
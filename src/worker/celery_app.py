@@ -1,17 +1,76 @@
+import os
+from pathlib import Path
+
 from celery import Celery
-from celery.signals import setup_logging
+from celery.signals import setup_logging, worker_init, worker_process_shutdown
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess, start_http_server
 
 from shared.config import get_settings
 from shared.logging import setup_logging as setup_app_logging
+from shared.models.task import TaskPriority
+from worker.queues import BROKER_PRIORITY, TASK_QUEUES, TASK_ROUTES
 
 settings = get_settings()
 
 
+def patch_for_green_pool() -> None:
+    """
+    Make psycopg2 cooperative when the worker runs a gevent pool (`-P gevent`).
+
+    Celery monkey-patches the standard library before importing this module,
+    which covers Redis and the Anthropic client's sockets; psycopg2 is a C
+    extension and needs psycogreen to yield while waiting on Postgres.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return
+    if monkey.is_module_patched("socket"):
+        from psycogreen.gevent import patch_psycopg
+
+        patch_psycopg()
+
+
+patch_for_green_pool()
+
+
 @setup_logging.connect  # type: ignore[untyped-decorator]
 def configure_celery_logging(*args: object, **kwargs: object) -> None:
     """Configure Celery to use our structured logging."""
     setup_app_logging()
 
+
+@worker_init.connect  # type: ignore[untyped-decorator]
+def start_metrics_exporter(*args: object, **kwargs: object) -> None:
+    """
+    Serve the worker's metrics on CELERY_METRICS_PORT, if set.
+
+    Prefork children each have their own registry, so they record into
+    PROMETHEUS_MULTIPROC_DIR (which must be set before the worker starts), and
+    the main process serves the aggregate. A gevent or solo worker is a single
+    process and can do without it.
+    """
+    if not settings.celery_metrics_port:
+        return
+    registry = REGISTRY
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        # Files of a previous run would be aggregated with this one's
+        Path(multiproc_dir).mkdir(parents=True, exist_ok=True)
+        for stale in Path(multiproc_dir).glob("*.db"):
+            stale.unlink()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+    start_http_server(settings.celery_metrics_port, registry=registry)
+
+
+@worker_process_shutdown.connect  # type: ignore[untyped-decorator]
+def mark_metrics_process_dead(pid: int, *args: object, **kwargs: object) -> None:
+    """Drop a prefork child's live gauges from the aggregate once it exits."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)  # type: ignore[no-untyped-call]
+
+
 celery_app = Celery(
     "tasker",
     broker=settings.redis_url,
@@ -20,6 +79,9 @@ celery_app = Celery(
         "worker.tasks.sum_task",
         "worker.tasks.llm_task",
         "worker.tasks.hash_task",
+        "worker.tasks.vector_task",
+        "worker.tasks.llm_batch_task",
+        "worker.tasks.memo_task",
     ],
 )
 
@@ -31,6 +93,11 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Routing: a queue per task type (see worker/queues.py)
+    task_queues=TASK_QUEUES,
+    task_routes=TASK_ROUTES,
+    task_default_priority=BROKER_PRIORITY[TaskPriority.NORMAL],
+    broker_transport_options={"priority_steps": sorted(BROKER_PRIORITY.values())},
     # Worker settings
     worker_concurrency=settings.celery_concurrency,
     worker_prefetch_multiplier=1,
@@ -39,4 +106,25 @@ celery_app.conf.update(
     task_reject_on_worker_lost=True,
     # Result backend
     result_expires=3600,
+    # Periodic tasks, run by `celery beat`
+    beat_schedule={
+        "submit-llm-batches": {
+            "task": "worker.tasks.llm_batch_task.submit_llm_batches",
+            "schedule": settings.llm_batch_submit_interval_seconds,
+            # A tick nobody picked up is superseded by the next one
+            "options": {"expires": settings.llm_batch_submit_interval_seconds},
+        },
+        "poll-llm-batches": {
+            "task": "worker.tasks.llm_batch_task.poll_llm_batches",
+            "schedule": settings.llm_batch_poll_interval_seconds,
+            # A tick nobody picked up is superseded by the next one
+            "options": {"expires": settings.llm_batch_poll_interval_seconds},
+        },
+        "recover-memo-waiters": {
+            "task": "worker.tasks.memo_task.recover_memo_waiters",
+            "schedule": settings.memo_recovery_interval_seconds,
+            # A tick nobody picked up is superseded by the next one
+            "options": {"expires": settings.memo_recovery_interval_seconds},
+        },
+    },
 )
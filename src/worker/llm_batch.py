@@ -0,0 +1,224 @@
+from datetime import UTC, datetime
+from typing import Any, Literal
+from uuid import UUID
+
+import anthropic
+import redis
+from anthropic.types.messages import MessageBatchIndividualResponse
+from anthropic.types.messages.batch_create_params import Request
+
+from api.repositories.task_repo import TaskRepository
+from shared.cache import cache
+from shared.config import get_settings
+from shared.database import SessionLocal
+from shared.logging import get_logger
+from shared.metrics import llm_batch_requests_total, tasks_completed_total
+from shared.models.task import Task, TaskStatus
+from worker.state_writer import TaskTransition, state_writer
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+TASK_NAME = "query_llm"
+
+# Task IDs of batch-mode prompts waiting to be submitted, oldest first
+QUEUE_KEY = "llm-batch:queue"
+# Task IDs taken by the submission in progress, kept until its batch is recorded
+PROCESSING_KEY = "llm-batch:processing"
+# Held while a submission runs; a processing list found without it was abandoned
+SUBMIT_LOCK_KEY = "llm-batch:submitting"
+# Longest a submission may hold the lock before another presumes it crashed
+SUBMIT_LOCK_SECONDS = 600
+# IDs of Message Batches submitted and not yet fanned out to their tasks
+SUBMITTED_KEY = "llm-batch:submitted"
+
+# Results written back per bulk UPDATE while fanning out a batch
+FAN_OUT_CHUNK_SIZE = 1000
+
+
+def is_batched(task_name: str, task_parameters: dict[str, Any]) -> bool:
+    """Whether a task runs in a Message Batch rather than as its own call."""
+    return task_name == TASK_NAME and bool(task_parameters.get("batch"))
+
+
+def batch_request(task: Task) -> Request:
+    """The Message Batch request for a task, identified by the task ID."""
+    return {
+        "custom_id": str(task.id),
+        "params": {
+            "model": settings.llm_model,
+            "max_tokens": task.task_parameters.get("max_tokens", 1024),
+            "messages": [{"role": "user", "content": task.task_parameters["prompt"]}],
+        },
+    }
+
+
+def batch_transition(
+    response: MessageBatchIndividualResponse,
+    completed_at: datetime,
+) -> TaskTransition:
+    """The final state of a task from its result in an ended batch."""
+    # Import here to avoid circular imports
+    from worker.tasks.llm_task import message_output
+
+    result = response.result
+    if result.type == "succeeded":
+        return TaskTransition(
+            response.custom_id,
+            TaskStatus.COMPLETED,
+            TASK_NAME,
+            completed_at=completed_at,
+            task_output=message_output(result.message),
+        )
+    if result.type == "errored":
+        error = result.error.error.message
+    else:
+        error = f"Batch request {result.type}"
+    return TaskTransition(
+        response.custom_id,
+        TaskStatus.FAILED,
+        TASK_NAME,
+        completed_at=completed_at,
+        error=error,
+    )
+
+
+class LLMBatcher:
+    """
+    Runs batch-mode `query_llm` tasks through the Message Batches API.
+
+    Dispatch queues their IDs in Redis instead of publishing a Celery
+    message. A scheduled task drains the queue into Message Batches of up to
+    `max_requests` prompts and marks the tasks running; another polls the
+    submitted batches and, once one has ended, writes its results back to
+    the tasks in bulk UPDATEs of `FAN_OUT_CHUNK_SIZE` rows.
+    """
+
+    def __init__(self, client: "redis.Redis[str]", max_requests: int) -> None:
+        self.client = client
+        self.max_requests = max_requests
+
+    def collect(self, task_ids: list[str]) -> None:
+        """Queue tasks for the next batch submission."""
+        if task_ids:
+            self.client.rpush(QUEUE_KEY, *task_ids)
+
+    def submit(self, llm: anthropic.Anthropic) -> int:
+        """
+        Submit up to `max_requests` queued tasks as one Message Batch.
+
+        Returns how many tasks were taken from the queue. Tasks no longer
+        pending are skipped. Taken tasks move to a processing list, which is
+        cleared only once the batch is recorded; if the batch cannot be
+        created, they go back to the front of the queue. A submission that
+        crashed leaves them there, and the next one requeues them first. One
+        submission runs at a time; an overlapping one returns 0.
+        """
+        if not self.client.set(SUBMIT_LOCK_KEY, "1", nx=True, ex=SUBMIT_LOCK_SECONDS):
+            return 0
+        try:
+            return self._submit(llm)
+        finally:
+            self.client.delete(SUBMIT_LOCK_KEY)
+
+    def _submit(self, llm: anthropic.Anthropic) -> int:
+        abandoned = self._move(PROCESSING_KEY, QUEUE_KEY, "RIGHT", "LEFT", count=None)
+        if abandoned:
+            logger.warning(f"Requeued {len(abandoned)} prompts of an abandoned batch submission")
+        task_ids = self._move(QUEUE_KEY, PROCESSING_KEY, "LEFT", "RIGHT", count=self.max_requests)
+        if not task_ids:
+            return 0
+        try:
+            db = SessionLocal()
+            try:
+                tasks = TaskRepository(db).get_by_ids([UUID(task_id) for task_id in task_ids])
+            finally:
+                db.close()
+            tasks = [task for task in tasks if task.status == TaskStatus.PENDING]
+            if not tasks:
+                self.client.delete(PROCESSING_KEY)
+                return len(task_ids)
+            batch = llm.messages.batches.create(requests=[batch_request(task) for task in tasks])
+        except Exception:
+            self._move(PROCESSING_KEY, QUEUE_KEY, "RIGHT", "LEFT", count=None)
+            raise
+
+        # Recorded and released in one transaction; a crash before it resubmits the tasks
+        with self.client.pipeline() as pipe:
+            pipe.sadd(SUBMITTED_KEY, batch.id)
+            pipe.delete(PROCESSING_KEY)
+            pipe.execute()
+        llm_batch_requests_total.labels(result="submitted").inc(len(tasks))
+        logger.info(f"Submitted LLM batch {batch.id} with {len(tasks)} prompts")
+        started_at = datetime.now(UTC)
+        state_writer.write(
+            [
+                TaskTransition(str(task.id), TaskStatus.RUNNING, TASK_NAME, started_at=started_at)
+                for task in tasks
+            ]
+        )
+        return len(task_ids)
+
+    def _move(
+        self,
+        source: str,
+        destination: str,
+        pop: Literal["LEFT", "RIGHT"],
+        push: Literal["LEFT", "RIGHT"],
+        count: int | None,
+    ) -> list[str]:
+        """LMOVE up to `count` task IDs (all if None) between lists, in one transaction."""
+        length = self.client.llen(source)
+        if count is not None:
+            length = min(length, count)
+        if not length:
+            return []
+        with self.client.pipeline() as pipe:
+            for _ in range(length):
+                pipe.lmove(source, destination, pop, push)
+            moved: list[str | None] = pipe.execute()
+        return [task_id for task_id in moved if task_id is not None]
+
+    def poll(self, llm: anthropic.Anthropic) -> int:
+        """Fan out every submitted batch that has ended; returns how many tasks finished."""
+        finished = 0
+        for batch_id in self.client.smembers(SUBMITTED_KEY):
+            batch = llm.messages.batches.retrieve(batch_id)
+            if batch.processing_status != "ended":
+                continue
+            # Claim the batch, so an overlapping poll never fans it out twice
+            if not self.client.srem(SUBMITTED_KEY, batch_id):
+                continue
+            try:
+                finished += self._fan_out(llm, batch_id)
+            except Exception:
+                # Results are idempotent: fanning out again rewrites the same state
+                self.client.sadd(SUBMITTED_KEY, batch_id)
+                raise
+        return finished
+
+    def _fan_out(self, llm: anthropic.Anthropic, batch_id: str) -> int:
+        """Write an ended batch's results to its tasks, a chunk per UPDATE."""
+        completed_at = datetime.now(UTC)
+        chunk: list[tuple[TaskTransition, str]] = []
+        finished = 0
+        for response in llm.messages.batches.results(batch_id):
+            chunk.append((batch_transition(response, completed_at), response.result.type))
+            if len(chunk) >= FAN_OUT_CHUNK_SIZE:
+                finished += self._write(chunk)
+                chunk = []
+        if chunk:
+            finished += self._write(chunk)
+        logger.info(f"LLM batch {batch_id} ended, {finished} tasks finished")
+        return finished
+
+    def _write(self, chunk: list[tuple[TaskTransition, str]]) -> int:
+        state_writer.write([transition for transition, _ in chunk])
+        for transition, result in chunk:
+            llm_batch_requests_total.labels(result=result).inc()
+            tasks_completed_total.labels(task_name=TASK_NAME, status=transition.status).inc()
+        return len(chunk)
+
+
+# Singleton sharing the cache's Redis connection
+llm_batcher = LLMBatcher(cache.client, max_requests=settings.llm_batch_max_requests)
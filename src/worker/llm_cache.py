@@ -0,0 +1,189 @@
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import redis
+
+from shared.cache import cache
+from shared.config import get_settings
+from shared.logging import get_logger
+from shared.memo import COMPLETE_SCRIPT, LOOKUP_SCRIPT
+from shared.metrics import (
+    cache_evictions_total,
+    cache_requests_total,
+    llm_calls_avoided_total,
+    llm_tokens_saved_total,
+)
+from shared.serialization import dumps, loads
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Sorted set of cached responses, scored by last use, for LRU eviction
+INDEX_KEY = "llm-index"
+
+# Poll interval bounds while waiting on an identical in-flight call
+MIN_POLL_SECONDS = 0.05
+MAX_POLL_SECONDS = 0.5
+
+
+def llm_cache_key(model: str, prompt: str, max_tokens: int) -> str:
+    """Key of a cached response: a digest of everything that shapes the answer."""
+    request = json.dumps([model, max_tokens, prompt], separators=(",", ":"))
+    return f"llm:{hashlib.blake2b(request.encode(), digest_size=16).hexdigest()}"
+
+
+class LLMResponseCache:
+    """
+    Caches LLM responses in Redis and coalesces identical in-flight prompts.
+
+    The first worker to miss claims the prompt and makes the upstream call;
+    workers asking the same prompt meanwhile poll for its response instead of
+    calling too. Responses keep an idle TTL and the least recently used
+    beyond `max_entries` are evicted (the same scripts as memoized results).
+    Redis trouble never fails a query: it degrades to a plain upstream call.
+    """
+
+    def __init__(
+        self,
+        client: "redis.Redis[str]",
+        ttl: int,
+        max_entries: int,
+        coalesce_timeout: float,
+    ) -> None:
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.coalesce_timeout = coalesce_timeout
+        self._lookup = client.register_script(LOOKUP_SCRIPT)
+        self._store = client.register_script(COMPLETE_SCRIPT)
+
+    def get_or_call(
+        self,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        call: Callable[[], dict[str, Any]],
+    ) -> dict[str, Any]:
+        """Return the cached response for the prompt, or make `call` once and cache it."""
+        if self.ttl <= 0:
+            return call()
+        key = llm_cache_key(model, prompt, max_tokens)
+        try:
+            output = self.lookup(key)
+            if output is not None:
+                self._avoided(output, reason="hit")
+                return output
+            cache_requests_total.labels(tier="llm", result="miss").inc()
+
+            deadline = time.monotonic() + self.coalesce_timeout
+            while not self.client.set(f"{key}:inflight", "1", nx=True, ex=self._claim_ttl()):
+                output = self._wait(key, deadline)
+                if output is not None:
+                    self._avoided(output, reason="coalesced")
+                    return output
+                if time.monotonic() >= deadline:
+                    logger.warning("Timed out waiting on an identical LLM call, calling upstream")
+                    return call()
+                # The other call failed without a response: try to take over
+        except redis.RedisError as e:
+            logger.warning(f"LLM cache unavailable, calling upstream: {e}")
+            return call()
+
+        try:
+            with self._keep_claimed(key):
+                output = call()
+        except Exception:
+            # Let a waiting worker make the call instead of timing out
+            self._unclaim(key)
+            raise
+        self.store(key, output)
+        return output
+
+    def lookup(self, key: str) -> dict[str, Any] | None:
+        """Get a cached response, marking it recently used."""
+        result = self._lookup(keys=[key, INDEX_KEY], args=[self.ttl, time.time()])
+        return loads(result) if result is not None else None
+
+    def store(self, key: str, output: dict[str, Any]) -> None:
+        """Cache a response and release the claim on its prompt. Best-effort."""
+        try:
+            _, evicted = self._store(
+                keys=[key, f"{key}:inflight", f"{key}:waiters", INDEX_KEY],
+                args=[dumps(output), self.ttl, time.time(), self.max_entries],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Failed to cache LLM response: {e}")
+            self._unclaim(key)
+            return
+        if evicted:
+            cache_evictions_total.labels(tier="llm").inc(evicted)
+
+    def _claim_ttl(self) -> int:
+        """A claim outlives the wait on it, so a crashed caller only delays its waiters."""
+        return max(1, int(self.coalesce_timeout) + 1)
+
+    @contextmanager
+    def _keep_claimed(self, key: str) -> Iterator[None]:
+        """
+        Renew the claim every half TTL while the call runs.
+
+        The call can outlast the TTL, with its limiter wait (up to
+        `llm_limiter_max_wait_seconds`) and a long generation. An expired
+        claim would let another worker make the same call.
+        """
+        ttl = self._claim_ttl()
+        done = threading.Event()
+
+        def renew() -> None:
+            while not done.wait(ttl / 2):
+                try:
+                    self.client.expire(f"{key}:inflight", ttl)
+                except redis.RedisError as e:
+                    logger.warning(f"Failed to renew LLM call claim: {e}")
+
+        renewer = threading.Thread(target=renew, name="llm-claim-renewer", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            done.set()
+            renewer.join()
+
+    def _wait(self, key: str, deadline: float) -> dict[str, Any] | None:
+        """Poll for the in-flight call's response until it lands, fails or `deadline` passes."""
+        interval = MIN_POLL_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+            output = self.lookup(key)
+            if output is not None or not self.client.exists(f"{key}:inflight"):
+                return output
+            interval = min(interval * 2, MAX_POLL_SECONDS)
+        return None
+
+    def _unclaim(self, key: str) -> None:
+        try:
+            self.client.delete(f"{key}:inflight")
+        except redis.RedisError as e:
+            logger.warning(f"Failed to release LLM call claim: {e}")
+
+    def _avoided(self, output: dict[str, Any], reason: str) -> None:
+        if reason == "hit":
+            cache_requests_total.labels(tier="llm", result="hit").inc()
+        llm_calls_avoided_total.labels(reason=reason).inc()
+        usage = output.get("usage") or {}
+        llm_tokens_saved_total.labels(kind="input").inc(usage.get("input_tokens", 0))
+        llm_tokens_saved_total.labels(kind="output").inc(usage.get("output_tokens", 0))
+
+
+# Singleton for the worker process; disabled unless LLM_CACHE_TTL_SECONDS is set
+llm_cache = LLMResponseCache(
+    client=cache.client,
+    ttl=settings.llm_cache_ttl_seconds,
+    max_entries=settings.llm_cache_max_entries,
+    coalesce_timeout=settings.llm_coalesce_timeout_seconds,
+)
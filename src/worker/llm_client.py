@@ -0,0 +1,64 @@
+import os
+import threading
+
+import anthropic
+import httpx
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from shared.config import get_settings
+from worker.llm_limiter import llm_limiter
+
+settings = get_settings()
+
+_lock = threading.Lock()
+_client: anthropic.Anthropic | None = None
+_client_pid: int | None = None
+
+
+def get_llm_client() -> anthropic.Anthropic:
+    """
+    The worker process's Anthropic client, created on first use.
+
+    One client per process keeps its HTTP connections alive across tasks, so
+    only the first call pays for the TCP and TLS handshake. Under a gevent
+    pool every greenlet shares it, bounded by `anthropic_max_connections`.
+    A forked pool process never reuses its parent's sockets. Every response
+    is shown to the rate limiter, which learns the quota from its headers.
+    """
+    global _client, _client_pid
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = anthropic.Anthropic(
+                api_key=settings.anthropic_api_key,
+                base_url=settings.anthropic_base_url or None,
+                # The limiter waits out 429s itself, for every worker at once
+                max_retries=0 if settings.llm_rate_limiting else anthropic.DEFAULT_MAX_RETRIES,
+                http_client=anthropic.DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.anthropic_max_connections,
+                        max_keepalive_connections=settings.anthropic_max_connections,
+                        keepalive_expiry=settings.anthropic_keepalive_seconds,
+                    ),
+                    event_hooks={"response": [llm_limiter.observe]},
+                ),
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+@worker_process_init.connect  # type: ignore[untyped-decorator]
+def reset_llm_client(*args: object, **kwargs: object) -> None:
+    """Drop a client inherited over fork; the child opens its own connections."""
+    global _client, _client_pid
+    with _lock:
+        _client, _client_pid = None, None
+
+
+@worker_process_shutdown.connect  # type: ignore[untyped-decorator]
+def close_llm_client(*args: object, **kwargs: object) -> None:
+    """Close pooled connections when a worker process exits."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client, _client_pid = None, None
@@ -0,0 +1,279 @@
+import random
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+import anthropic
+import httpx
+import redis
+
+from shared.cache import cache
+from shared.config import get_settings
+from shared.logging import get_logger
+from shared.metrics import llm_limiter_wait_seconds, llm_rate_limited_total
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Hash holding both buckets, their learned capacities and any 429 pause
+STATE_KEY = "llm-limit"
+# Sorted set of in-flight calls, scored by lease expiry
+LEASES_KEY = "llm-limit:leases"
+
+# Calls abandoned by a crashed worker free their concurrency slot after this long
+LEASE_TTL_SECONDS = 300
+# Upper bound on one sleep while waiting, so learned capacity is picked up quickly
+MAX_SLEEP_SECONDS = 1.0
+# Back-to-back 429s tolerated in place before giving the task back to Celery
+RATE_LIMITED_ATTEMPTS = 3
+
+# Shared prelude: refills both buckets up to the current time (Redis clock, so all
+# workers agree) and leaves now, capacities and levels in locals.
+# KEYS[1] is the state hash; ARGV[1], ARGV[2] are the configured RPM/TPM capacities.
+REFILL = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'rpm_cap', 'rpm', 'tpm_cap', 'tpm', 'ts', 'paused_until')
+local rpm_cap = tonumber(state[1]) or tonumber(ARGV[1])
+local tpm_cap = tonumber(state[3]) or tonumber(ARGV[2])
+local rpm = tonumber(state[2]) or rpm_cap
+local tpm = tonumber(state[4]) or tpm_cap
+local elapsed = math.max(0, now - (tonumber(state[5]) or now))
+local paused_until = tonumber(state[6]) or 0
+rpm = math.min(rpm_cap, rpm + elapsed * rpm_cap / 60)
+tpm = math.min(tpm_cap, tpm + elapsed * tpm_cap / 60)
+"""
+
+# Takes one request and `cost` tokens plus a concurrency lease, or returns the
+# seconds to wait before trying again. A capacity of 0 is unlimited.
+# KEYS: state, leases. ARGV: rpm, tpm, cost, max concurrency, lease id, lease ttl.
+ACQUIRE_SCRIPT = (
+    REFILL
+    + """
+local cost = math.min(tonumber(ARGV[3]), tpm_cap)
+local max_concurrency = tonumber(ARGV[4])
+local wait = math.max(0, paused_until - now)
+if rpm_cap > 0 and rpm < 1 then
+    wait = math.max(wait, (1 - rpm) * 60 / rpm_cap)
+end
+if tpm_cap > 0 and tpm < cost then
+    wait = math.max(wait, (cost - tpm) * 60 / tpm_cap)
+end
+if max_concurrency > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+    if redis.call('ZCARD', KEYS[2]) >= max_concurrency then
+        wait = math.max(wait, 0.05)
+    end
+end
+if wait == 0 then
+    rpm = rpm - 1
+    tpm = tpm - cost
+    if max_concurrency > 0 then
+        redis.call('ZADD', KEYS[2], now + tonumber(ARGV[6]), ARGV[5])
+    end
+end
+redis.call('HSET', KEYS[1], 'rpm', rpm, 'tpm', tpm, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+)
+
+# Frees a lease and settles the tokens actually used against the estimate.
+# KEYS: state, leases. ARGV: rpm, tpm, lease id, tokens to give back (negative charges).
+RELEASE_SCRIPT = (
+    REFILL
+    + """
+redis.call('ZREM', KEYS[2], ARGV[3])
+tpm = math.min(tpm_cap, tpm + tonumber(ARGV[4]))
+redis.call('HSET', KEYS[1], 'rpm', rpm, 'tpm', tpm, 'ts', now)
+return 1
+"""
+)
+
+# Adopts the limits and remaining budget reported by the API, and pauses every
+# caller for `retry-after` seconds after a 429. Empty arguments are not reported.
+# KEYS: state. ARGV: rpm, tpm, request limit, requests left, token limit, tokens left, retry.
+OBSERVE_SCRIPT = (
+    REFILL
+    + """
+if ARGV[3] ~= '' then
+    rpm_cap = tonumber(ARGV[3])
+    rpm = math.min(rpm_cap, rpm)
+end
+if ARGV[4] ~= '' then
+    rpm = math.min(rpm, tonumber(ARGV[4]))
+end
+if ARGV[5] ~= '' then
+    tpm_cap = tonumber(ARGV[5])
+    tpm = math.min(tpm_cap, tpm)
+end
+if ARGV[6] ~= '' then
+    tpm = math.min(tpm, tonumber(ARGV[6]))
+end
+if ARGV[7] ~= '' then
+    paused_until = math.max(paused_until, now + tonumber(ARGV[7]))
+end
+redis.call('HSET', KEYS[1], 'rpm_cap', rpm_cap, 'rpm', rpm, 'tpm_cap', tpm_cap, 'tpm', tpm,
+    'ts', now, 'paused_until', paused_until)
+redis.call('EXPIRE', KEYS[1], 3600)
+return 1
+"""
+)
+
+
+class LimiterTimeoutError(Exception):
+    """Raised when upstream capacity did not free up within the maximum wait."""
+
+    pass
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Upper-bound token cost of a call: ~4 characters per input token plus the output cap."""
+    return len(prompt) // 4 + 1 + max_tokens
+
+
+def _number(header: str | None) -> str:
+    """A numeric header value as sent to the scripts; "" if absent or not a number."""
+    try:
+        return str(float(header)) if header is not None else ""
+    except ValueError:
+        return ""
+
+
+class LLMRateLimiter:
+    """
+    Shares the upstream LLM quota between every worker, through Redis.
+
+    Requests and tokens per minute are token buckets refilled continuously,
+    and at most `max_concurrency` calls are in flight (0 is unbounded). A call
+    reserves its estimated tokens up front and settles the difference with the
+    actual usage afterwards. Capacities start from the configured limits and
+    then follow the `anthropic-ratelimit-*` headers of every response; a 429
+    pauses all callers for its `retry-after`. Callers wait for capacity
+    rather than failing. Redis trouble degrades to unlimited calls.
+    """
+
+    def __init__(
+        self,
+        client: "redis.Redis[str]",
+        enabled: bool,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_concurrency: int,
+        max_wait: float,
+    ) -> None:
+        self.client = client
+        self.enabled = enabled
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._observe = client.register_script(OBSERVE_SCRIPT)
+
+    def call(self, estimated_tokens: int, call: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+        """
+        Make an upstream call once capacity is available.
+
+        A 429 is retried in place after the pause it sets, a few times, before
+        the error is raised for Celery's retry to handle.
+        """
+        if not self.enabled:
+            return call()
+        attempt = 1
+        while True:
+            lease = self.acquire(estimated_tokens)
+            used_tokens = estimated_tokens
+            try:
+                output = call()
+                usage = output.get("usage") or {}
+                used_tokens = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+                return output
+            except anthropic.RateLimitError:
+                llm_rate_limited_total.inc()
+                if attempt >= RATE_LIMITED_ATTEMPTS:
+                    raise
+                logger.warning(f"LLM call rate limited, waiting for capacity (attempt {attempt})")
+            finally:
+                if lease is not None:
+                    self.release(lease, estimated_tokens - used_tokens)
+            attempt += 1
+
+    def acquire(self, estimated_tokens: int) -> str | None:
+        """
+        Wait for capacity and take it; returns the lease to release after the call.
+
+        Returns None, taking nothing, if Redis is unavailable.
+        """
+        lease = uuid.uuid4().hex
+        start = time.monotonic()
+        while True:
+            try:
+                wait = float(
+                    self._acquire(
+                        keys=[STATE_KEY, LEASES_KEY],
+                        args=[
+                            self.requests_per_minute,
+                            self.tokens_per_minute,
+                            estimated_tokens,
+                            self.max_concurrency,
+                            lease,
+                            LEASE_TTL_SECONDS,
+                        ],
+                    )
+                )
+            except redis.RedisError as e:
+                logger.warning(f"LLM rate limiter unavailable, calling without it: {e}")
+                return None
+            waited = time.monotonic() - start
+            if wait <= 0:
+                llm_limiter_wait_seconds.observe(waited)
+                return lease
+            if waited + wait > self.max_wait:
+                llm_limiter_wait_seconds.observe(waited)
+                raise LimiterTimeoutError(f"No LLM capacity within {self.max_wait}s")
+            # Jitter keeps waiting workers from retrying in lockstep
+            time.sleep(min(wait, MAX_SLEEP_SECONDS) * random.uniform(1.0, 1.1))
+
+    def release(self, lease: str, unused_tokens: int) -> None:
+        """Free a lease, giving back (or, if negative, charging) the estimate's error."""
+        try:
+            self._release(
+                keys=[STATE_KEY, LEASES_KEY],
+                args=[self.requests_per_minute, self.tokens_per_minute, lease, unused_tokens],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Failed to release LLM rate limiter lease: {e}")
+
+    def observe(self, response: httpx.Response) -> None:
+        """httpx response hook: learn limits from rate-limit headers. Best-effort."""
+        headers = response.headers
+        args = [
+            _number(headers.get("anthropic-ratelimit-requests-limit")),
+            _number(headers.get("anthropic-ratelimit-requests-remaining")),
+            _number(headers.get("anthropic-ratelimit-tokens-limit")),
+            _number(headers.get("anthropic-ratelimit-tokens-remaining")),
+            _number(headers.get("retry-after")) if response.status_code == 429 else "",
+        ]
+        if not any(args):
+            return
+        try:
+            self._observe(
+                keys=[STATE_KEY],
+                args=[self.requests_per_minute, self.tokens_per_minute, *args],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Failed to record LLM rate limit headers: {e}")
+
+
+# Singleton for the worker process; disabled unless LLM_RATE_LIMITING is set
+llm_limiter = LLMRateLimiter(
+    client=cache.client,
+    enabled=settings.llm_rate_limiting,
+    requests_per_minute=settings.llm_requests_per_minute,
+    tokens_per_minute=settings.llm_tokens_per_minute,
+    max_concurrency=settings.llm_max_concurrency,
+    max_wait=settings.llm_limiter_max_wait_seconds,
+)
@@ -0,0 +1,173 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+import redis
+
+from api.repositories.task_repo import TaskRepository
+from shared.cache import cache, task_cache_entry, task_cache_ttl
+from shared.config import get_settings
+from shared.database import SessionLocal
+from shared.events import publish_task_event
+from shared.logging import get_logger
+from shared.memo import memo_policy, task_memo
+from shared.metrics import cache_fills_total, tasks_completed_total
+from shared.models.task import Task, TaskStatus
+from shared.pg_queue import queued_task_names
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Held submissions examined per recovery sweep
+RECOVERY_BATCH_SIZE = 1000
+
+
+def settle_memoized(tasks: list[Task]) -> None:
+    """
+    Share the outcome of finished memoized tasks with the submissions waiting on them.
+
+    A completed task stores its result for later submissions and completes the
+    identical ones that joined it in flight, with one UPDATE. A failed leader
+    gives up its claim and its waiters are dispatched to run on their own, or
+    handed back to Postgres queue workers. Best-effort: errors are logged and
+    leave the waiters pending.
+    """
+    joined: list[tuple[Task, str]] = []
+    released: list[tuple[Task, str]] = []
+    for task in tasks:
+        policy = memo_policy(task.task_name)
+        if policy is None:
+            continue
+        try:
+            if task.status == TaskStatus.COMPLETED and task.task_output is not None:
+                waiters = task_memo.complete(
+                    task.task_name, task.task_parameters, task.task_output, policy
+                )
+                joined.extend((task, waiter) for waiter in waiters)
+            elif task.status == TaskStatus.FAILED:
+                waiters = task_memo.release(task.task_name, task.task_parameters, str(task.id))
+                released.extend((task, waiter) for waiter in waiters)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to settle memoized task {task.id}: {e}")
+
+    # The leader's own state is already written; never fail it over its waiters
+    try:
+        if joined:
+            _complete_waiters(joined)
+        if released:
+            # At the leader's priority: the waiters' own rows are not read here
+            _release_waiters(
+                [
+                    (waiter, task.task_name, task.task_parameters, task.priority)
+                    for task, waiter in released
+                ]
+            )
+    except Exception:
+        logger.exception(f"Failed to settle {len(joined) + len(released)} waiting submissions")
+
+
+def recover_waiters() -> int:
+    """
+    Release held submissions whose execution was lost; returns how many.
+
+    Waiters are otherwise only released when their leader finishes. One is
+    presumed lost when no execution of its work is claimed any more, or when
+    it has been held longer than MEMO_INFLIGHT_TTL_SECONDS, past which the
+    claim and its waiters list have expired. That covers a lost message, a
+    dead worker and an expired claim. Run periodically, by `celery beat` and
+    by Postgres queue workers.
+    """
+    db = SessionLocal()
+    try:
+        held = TaskRepository(db).get_held(RECOVERY_BATCH_SIZE)
+    finally:
+        db.close()
+    if not held:
+        return 0
+
+    cutoff = datetime.now(UTC) - timedelta(seconds=settings.memo_inflight_ttl_seconds)
+    in_flight = task_memo.in_flight([(task.task_name, task.task_parameters) for task in held])
+    lost = [
+        task
+        for task, claimed in zip(held, in_flight, strict=True)
+        if task.held_at is not None
+        # SQLite hands back naive UTC timestamps
+        and (not claimed or task.held_at.replace(tzinfo=task.held_at.tzinfo or UTC) < cutoff)
+    ]
+    if lost:
+        logger.warning(f"Releasing {len(lost)} memoized submissions whose execution was lost")
+        _release_waiters(
+            [(str(task.id), task.task_name, task.task_parameters, task.priority) for task in lost]
+        )
+    return len(lost)
+
+
+def _release_waiters(waiters: list[tuple[str, str, dict[str, Any], str]]) -> None:
+    """
+    Let held submissions, as (task_id, task_name, task_parameters, priority), run on their own.
+
+    Postgres queue workers claim them once released. The others are dispatched
+    first and released once published, so a failed publish leaves them held
+    for the next recovery sweep.
+    """
+    # Import here to avoid circular imports
+    from worker.tasks import dispatch_tasks
+
+    queued = queued_task_names()
+    dispatched = [waiter for waiter in waiters if waiter[1] not in queued]
+    errors = dispatch_tasks(dispatched) if dispatched else []
+    released = [UUID(waiter[0]) for waiter in waiters if waiter[1] in queued]
+    released += [
+        UUID(waiter[0]) for waiter, error in zip(dispatched, errors, strict=True) if error is None
+    ]
+    if len(released) < len(waiters):
+        logger.warning(f"Failed to dispatch {len(waiters) - len(released)} waiting submissions")
+    if released:
+        db = SessionLocal()
+        try:
+            TaskRepository(db).release_held(released)
+        finally:
+            db.close()
+
+
+def _complete_waiters(joined: list[tuple[Task, str]]) -> None:
+    """Complete waiting submissions with their leader's output, then cache and announce them."""
+    now = datetime.now(UTC)
+    db = SessionLocal()
+    try:
+        completed = TaskRepository(db).apply_transitions(
+            [
+                {
+                    "id": UUID(waiter),
+                    "status": TaskStatus.COMPLETED,
+                    "started_at": None,
+                    "completed_at": now,
+                    "task_output": task.task_output,
+                    "error": None,
+                }
+                for task, waiter in joined
+            ]
+        )
+    finally:
+        db.close()
+
+    for task in completed:
+        tasks_completed_total.labels(task_name=task.task_name, status="completed").inc()
+    try:
+        cache.set_many(
+            {
+                str(task.id): (task_cache_entry(task), task_cache_ttl(task.status))
+                for task in completed
+            }
+        )
+        cache_fills_total.labels(tier="redis", source="worker").inc(len(completed))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to cache {len(completed)} memoized results: {e}")
+
+    with cache.client.pipeline(transaction=False) as pipe:
+        for task in completed:
+            publish_task_event(pipe, str(task.id), task.status, task.task_name)
+        try:
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish events for {len(completed)} tasks: {e}")
@@ -0,0 +1,134 @@
+"""
+Outbox relay: publishes tasks committed with a dispatch record to the broker.
+
+    python -m worker.outbox_relay --metrics-port 9102
+
+Needed when the API runs with TASK_OUTBOX=true. Several relays can run side
+by side; each locks its own entries.
+"""
+
+import argparse
+import signal
+import time
+from datetime import UTC, datetime
+from uuid import UUID
+
+from prometheus_client import start_http_server
+
+from api.repositories.task_repo import TaskRepository
+from shared.cache import cache
+from shared.config import get_settings
+from shared.database import SessionLocal
+from shared.events import publish_task_event
+from shared.logging import get_logger, setup_logging
+from shared.metrics import outbox_entries_total, outbox_lag_seconds
+from worker.memo import settle_memoized
+from worker.tasks import dispatch_tasks
+from worker.tasks.base import cache_task_state
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class OutboxRelay:
+    """
+    Publishes outbox entries in batches until stopped.
+
+    Each batch is locked (FOR UPDATE SKIP LOCKED), published over one broker
+    connection through dispatch_tasks, and settled in one commit: published
+    entries are removed, the others retried on a later batch. An entry that
+    still fails after `max_attempts` fails its task, as a failed dispatch in
+    the API would. A crash before the commit releases the locks, so the batch
+    is published again: delivery is at least once.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float, max_attempts: int) -> None:
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._stopped = False
+
+    def relay_batch(self) -> int:
+        """Publish one batch of outbox entries; returns how many were locked."""
+        db = SessionLocal()
+        try:
+            repo = TaskRepository(db)
+            entries = repo.lock_outbox(self.batch_size)
+            if not entries:
+                db.rollback()
+                return 0
+            errors = dispatch_tasks(
+                [
+                    (str(task.id), task.task_name, task.task_parameters, task.priority)
+                    for _, task in entries
+                ]
+            )
+            now = datetime.now(UTC)
+            published: list[int] = []
+            retried: list[int] = []
+            abandoned: dict[int, tuple[UUID, str]] = {}
+            for (entry, task), error in zip(entries, errors, strict=True):
+                if error is None:
+                    published.append(entry.id)
+                    # SQLite hands back naive UTC timestamps
+                    created_at = entry.created_at.replace(tzinfo=entry.created_at.tzinfo or UTC)
+                    outbox_lag_seconds.observe((now - created_at).total_seconds())
+                elif entry.attempts + 1 < self.max_attempts:
+                    retried.append(entry.id)
+                else:
+                    abandoned[entry.id] = (task.id, f"Failed to dispatch task to worker: {error}")
+            failed = repo.settle_outbox(published, retried, abandoned)
+        finally:
+            db.close()
+
+        outbox_entries_total.labels(result="published").inc(len(published))
+        outbox_entries_total.labels(result="retried").inc(len(retried))
+        outbox_entries_total.labels(result="abandoned").inc(len(abandoned))
+        if retried or abandoned:
+            logger.warning(
+                f"Failed to publish {len(retried) + len(abandoned)} of {len(entries)} outbox "
+                f"entries; {len(abandoned)} abandoned"
+            )
+        for task in failed:
+            cache_task_state(task)
+            publish_task_event(cache.client, str(task.id), task.status, task_name=task.task_name)
+        settle_memoized(failed)
+        return len(entries)
+
+    def stop(self, *args: object) -> None:
+        """Finish the current batch, then return from `run`."""
+        self._stopped = True
+
+    def run(self) -> None:
+        """Relay until stopped; a full batch is followed at once by the next."""
+        logger.info("Outbox relay started")
+        while not self._stopped:
+            try:
+                locked = self.relay_batch()
+            except Exception:
+                logger.exception("Outbox relay batch failed")
+                locked = 0
+            if locked < self.batch_size:
+                time.sleep(self.poll_interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve /metrics; 0 is off")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    relay = OutboxRelay(
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval_ms / 1000,
+        max_attempts=settings.outbox_max_attempts,
+    )
+    signal.signal(signal.SIGTERM, relay.stop)
+    signal.signal(signal.SIGINT, relay.stop)
+    relay.run()
+
+
+if __name__ == "__main__":
+    main()
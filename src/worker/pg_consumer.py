@@ -0,0 +1,225 @@
+"""
+Postgres queue worker: claims pending tasks straight from the tasks table.
+
+    python -m worker.pg_consumer --metrics-port 9103
+
+Takes the place of `celery worker` for sum, file_hash and vector_op when the
+API runs with QUEUE_BACKEND=postgres. Several can run side by side; each
+claims its own rows.
+"""
+
+import argparse
+import select
+import signal
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+from prometheus_client import start_http_server
+
+from api.repositories.task_repo import TaskRepository
+from shared.config import get_settings
+from shared.database import SessionLocal, engine
+from shared.logging import get_logger, setup_logging
+from shared.metrics import pg_queue_claim_size, pg_queue_requeued_total, queue_wait_seconds
+from shared.models.task import Task
+from shared.pg_queue import CHANNEL, TASK_NAMES
+from worker.memo import recover_waiters
+from worker.state_writer import state_writer
+from worker.tasks import _resolve_task
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class PostgresQueueConsumer:
+    """
+    Claims pending tasks in batches and runs them until stopped.
+
+    A claim marks up to `batch_size` tasks running in one UPDATE, highest
+    priority and oldest first, skipping rows other workers are claiming. The
+    batch runs through the regular task functions with their transitions
+    collected, so it ends with one write (see TaskStateWriter.write). A task
+    costs no broker message, no separate running write and no result backend
+    entry. A failing task fails at once: these task types are deterministic,
+    so Celery's retries would mostly repeat the error. Claimed tasks whose
+    worker died are requeued once they outlive `visibility_timeout`, so
+    delivery is at least once. Idle workers wait on LISTEN/NOTIFY, and poll
+    every `poll_interval` in case a notification was missed. While a batch
+    runs, its claims are refreshed every third of the timeout, so a long batch
+    is not taken for a lost one. Workers also run
+    the memo recovery sweep, which `celery beat` sends to Celery workers.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float, visibility_timeout: float) -> None:
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._listener: Any = None
+        self._next_requeue = 0.0
+        self._next_recovery = 0.0
+        self._stopped = False
+
+    def claim_batch(self) -> int:
+        """Claim and run one batch of pending tasks; returns how many were claimed."""
+        db = SessionLocal()
+        try:
+            tasks = TaskRepository(db).claim_pending(TASK_NAMES, self.batch_size)
+        finally:
+            db.close()
+        if not tasks:
+            return 0
+
+        pg_queue_claim_size.observe(len(tasks))
+        for task in tasks:
+            if task.started_at is not None:
+                waited = (task.started_at - task.created_at).total_seconds()
+                queue_wait_seconds.labels(queue=task.task_name).observe(max(0.0, waited))
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=([task.id for task in tasks], done),
+            name="pg-queue-heartbeat",
+            daemon=True,
+        )
+        heartbeat.start()
+        try:
+            with state_writer.collect() as collected:
+                for task in tasks:
+                    self._run(task)
+        finally:
+            done.set()
+            heartbeat.join()
+        # If this fails the tasks stay running, and are requeued after the visibility timeout
+        state_writer.write(list(collected.values()))
+        return len(tasks)
+
+    def _run(self, task: Task) -> None:
+        """Run one claimed task as a direct call, so a failure is final rather than retried."""
+        celery_task = _resolve_task(task.task_name)
+        task_id = str(task.id)
+        celery_task.push_request(
+            id=task_id,
+            args=[task_id],
+            kwargs=task.task_parameters,
+            # The last attempt: file_hash then deletes its blob on failure
+            retries=celery_task.max_retries,
+            called_directly=True,
+        )
+        try:
+            celery_task.run(task_id, **task.task_parameters)
+        except Exception as e:
+            logger.warning(f"Task {task_id} failed: {e}")
+        finally:
+            celery_task.pop_request()
+
+    def _heartbeat(self, task_ids: list[UUID], done: threading.Event) -> None:
+        """Refresh the batch's claims until `done` is set."""
+        while not done.wait(self.visibility_timeout / 3):
+            db = SessionLocal()
+            try:
+                TaskRepository(db).refresh_claims(task_ids)
+            except Exception:
+                # Retried on the next beat; only a timeout's worth of misses requeues the batch
+                logger.exception("Failed to refresh claimed tasks")
+            finally:
+                db.close()
+
+    def requeue_stale(self) -> int:
+        """Put tasks claimed longer ago than the visibility timeout back to pending."""
+        db = SessionLocal()
+        try:
+            requeued = TaskRepository(db).requeue_stale(
+                TASK_NAMES,
+                started_before=datetime.now(UTC) - timedelta(seconds=self.visibility_timeout),
+            )
+        finally:
+            db.close()
+        if requeued:
+            pg_queue_requeued_total.inc(requeued)
+            logger.warning(f"Requeued {requeued} tasks whose worker was presumed lost")
+        return requeued
+
+    def listen(self) -> None:
+        """Subscribe to queue notifications on a dedicated connection; SQLite only polls."""
+        if engine.dialect.name != "postgresql":
+            return
+        connection = engine.raw_connection()
+        # Never hand a LISTEN session back to the pool
+        connection.detach()
+        driver: Any = connection.driver_connection
+        driver.autocommit = True
+        with driver.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        self._listener = connection
+
+    def unlisten(self) -> None:
+        """Close the notification connection, if any."""
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            listener.close()
+
+    def wait(self, timeout: float) -> None:
+        """Sleep until new tasks are notified, or for at most `timeout` seconds."""
+        if self._listener is None:
+            time.sleep(timeout)
+            return
+        driver = self._listener.driver_connection
+        if select.select([driver], [], [], timeout)[0]:
+            driver.poll()
+            driver.notifies.clear()
+
+    def stop(self, *args: object) -> None:
+        """Finish the current batch, then return from `run`."""
+        self._stopped = True
+
+    def run(self) -> None:
+        """Claim until stopped; a full batch is followed at once by the next."""
+        logger.info("Postgres queue worker started")
+        try:
+            while not self._stopped:
+                try:
+                    if self._listener is None:
+                        # Before claiming, so nothing queued in between goes unnoticed
+                        self.listen()
+                    if time.monotonic() >= self._next_requeue:
+                        self.requeue_stale()
+                        self._next_requeue = time.monotonic() + self.visibility_timeout / 2
+                    if time.monotonic() >= self._next_recovery:
+                        recover_waiters()
+                        self._next_recovery = (
+                            time.monotonic() + settings.memo_recovery_interval_seconds
+                        )
+                    claimed = self.claim_batch()
+                    if claimed < self.batch_size:
+                        self.wait(self.poll_interval)
+                except Exception:
+                    logger.exception("Postgres queue batch failed")
+                    self.unlisten()
+                    time.sleep(self.poll_interval)
+        finally:
+            self.unlisten()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve /metrics; 0 is off")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    consumer = PostgresQueueConsumer(
+        batch_size=settings.pg_queue_batch_size,
+        poll_interval=settings.pg_queue_poll_interval_ms / 1000,
+        visibility_timeout=settings.pg_queue_visibility_timeout_seconds,
+    )
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+    consumer.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Celery queue topology: one queue per task type, with broker priorities.
+
+Slow query_llm tasks then never hold up sum or file_hash ones, and each
+worker picks the queues it consumes with `-Q`, with a pool and concurrency
+suited to them.
+"""
+
+import time
+from datetime import datetime
+from typing import Any
+
+from celery import Celery
+from celery import Task as CeleryTask
+from celery.signals import before_task_publish, task_prerun
+from kombu import Queue
+
+from shared.metrics import queue_depth, queue_wait_seconds
+from shared.models.task import TaskPriority
+
+# Queue of every Celery task, by module
+TASK_ROUTES = {
+    "worker.tasks.sum_task.*": {"queue": "sum"},
+    "worker.tasks.hash_task.*": {"queue": "file_hash"},
+    "worker.tasks.vector_task.*": {"queue": "vector_op"},
+    "worker.tasks.llm_task.*": {"queue": "query_llm"},
+    # Message Batch submission and polling are LLM API calls as well
+    "worker.tasks.llm_batch_task.*": {"queue": "query_llm"},
+    # The memo recovery sweep is short DB and Redis work; Postgres queue workers run it themselves
+    "worker.tasks.memo_task.*": {"queue": "sum"},
+}
+
+QUEUES = list(dict.fromkeys(route["queue"] for route in TASK_ROUTES.values()))
+
+# A worker started without -Q consumes all of them
+TASK_QUEUES = [Queue(name) for name in QUEUES]
+
+# Broker priority of each level. On Redis, kombu keeps one list per priority
+# step and a worker pops the lowest step first, across all queues it consumes.
+BROKER_PRIORITY = {TaskPriority.HIGH: 0, TaskPriority.NORMAL: 3, TaskPriority.LOW: 6}
+
+# Message header holding the publish time, for tasker_queue_wait_seconds
+PUBLISHED_AT_HEADER = "published_at"
+
+
+@before_task_publish.connect  # type: ignore[untyped-decorator]
+def stamp_published_at(headers: dict[str, Any] | None = None, **kwargs: object) -> None:
+    """Record when a task message is published; a retry is stamped again."""
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect  # type: ignore[untyped-decorator]
+def observe_queue_wait(task: CeleryTask, **kwargs: object) -> None:
+    """Record how long a message waited in its queue; a retry's countdown is not counted."""
+    published_at = task.request.get(PUBLISHED_AT_HEADER)
+    if published_at is None:
+        return
+    eta = task.request.eta
+    ready_at = max(published_at, datetime.fromisoformat(eta).timestamp()) if eta else published_at
+    queue = (task.request.delivery_info or {}).get("routing_key") or "unknown"
+    queue_wait_seconds.labels(queue=queue).observe(max(0.0, time.time() - ready_at))
+
+
+def update_queue_depths(app: Celery) -> None:
+    """Sample the messages waiting in each task queue, over every priority, into the gauge."""
+    with app.connection_for_read() as connection:
+        # Fail fast rather than retry forever while the broker is down
+        connection.ensure_connection(max_retries=1)
+        channel = connection.default_channel
+        for queue in QUEUES:
+            _, depth, _ = channel.queue_declare(queue=queue)
+            queue_depth.labels(queue=queue).set(depth)
@@ -0,0 +1,264 @@
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+import redis
+from celery.signals import worker_process_shutdown, worker_shutdown
+
+from api.repositories.task_repo import TaskRepository
+from shared.cache import RedisCache, cache, task_cache_entry, task_cache_ttl
+from shared.config import get_settings
+from shared.database import SessionLocal
+from shared.events import publish_task_event
+from shared.logging import get_logger
+from shared.metrics import cache_fills_total, state_flush_size
+from worker.memo import settle_memoized
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class TaskTransition:
+    """A task status change and the columns it sets; None leaves a column unchanged."""
+
+    task_id: str
+    status: str
+    task_name: str | None = None
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
+    task_output: dict[str, Any] | None = None
+    error: str | None = None
+
+    def then(self, newer: "TaskTransition") -> "TaskTransition":
+        """Fold a later transition of the same task into this one."""
+        changes = {
+            field.name: getattr(newer, field.name)
+            for field in fields(newer)
+            if getattr(newer, field.name) is not None
+        }
+        return replace(self, **changes)
+
+    def as_row(self) -> dict[str, Any]:
+        """Columns for TaskRepository.apply_transitions."""
+        return {
+            "id": UUID(self.task_id),
+            "status": self.status,
+            "started_at": self.started_at,
+            "completed_at": self.completed_at,
+            "task_output": self.task_output,
+            "error": self.error,
+        }
+
+
+class TaskStateWriter:
+    """
+    Buffers worker state transitions and writes them in batches.
+
+    Transitions are folded per task, so a task that starts and finishes within
+    one flush interval costs a single row in a single UPDATE. A background
+    thread flushes every `flush_interval` seconds, or as soon as `batch_size`
+    tasks are buffered; each flush is one DB statement and commit, one Redis
+    pipeline for the cache entries and one for the events; finished memoized
+    tasks then release the submissions waiting on them. The buffer is
+    flushed on worker shutdown. Terminal transitions are submitted as
+    durable: they flush the buffer before the task returns, because with
+    late acks its message is acknowledged right after, and a crash would
+    lose the write. They still fold in the task's running transition and
+    whatever else is buffered, so a hard crash only loses running states.
+
+    Flushes take and write the buffer under one write lock, so writes
+    commit in the order their transitions were buffered. Durable callers
+    arriving while a write runs queue on the lock and the first of them
+    writes for all (a group commit); the rest find their transitions
+    already committed.
+    """
+
+    def __init__(
+        self,
+        result_cache: RedisCache,
+        batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        self.cache = result_cache
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._reset()
+
+    def _reset(self) -> None:
+        """Fresh buffer, lock and thread; a forked pool process must not share its parent's."""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        # Held from taking a batch until its write ends; never taken while holding _lock
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: dict[str, TaskTransition] = {}
+        self._flusher: threading.Thread | None = None
+        self._closed = False
+
+    @property
+    def collecting(self) -> bool:
+        """Whether transitions submitted on this thread are being collected."""
+        return getattr(self._local, "collected", None) is not None
+
+    @contextmanager
+    def collect(self) -> Iterator[dict[str, TaskTransition]]:
+        """
+        Collect the transitions submitted on this thread instead of buffering them.
+
+        They are folded per task into the yielded dict, and the caller writes
+        them, e.g. once for a whole batch of tasks.
+        """
+        collected: dict[str, TaskTransition] = {}
+        self._local.collected = collected
+        try:
+            yield collected
+        finally:
+            self._local.collected = None
+
+    def submit(self, transition: TaskTransition, durable: bool = False) -> None:
+        """
+        Buffer a transition; it is written within one flush interval.
+
+        With `durable`, the transition is committed before returning, by
+        this call's flush or by the one it waited on; a failed write raises
+        (the transition stays buffered for the next flush).
+        """
+        collected = getattr(self._local, "collected", None)
+        if collected is not None:
+            previous = collected.get(transition.task_id)
+            collected[transition.task_id] = previous.then(transition) if previous else transition
+            return
+        self._check_pid()
+        with self._lock:
+            buffered = not self._closed
+            if buffered:
+                self._buffer([transition])
+                if self._flusher is None:
+                    self._flusher = threading.Thread(
+                        target=self._run, name="task-state-writer", daemon=True
+                    )
+                    self._flusher.start()
+                if len(self._pending) >= self.batch_size and not durable:
+                    self._wakeup.notify()
+        if buffered:
+            if durable:
+                self.flush()
+            return
+        # Shutting down: nothing will flush again, so write through
+        with self._write_lock:
+            self.write([transition])
+
+    def flush(self) -> None:
+        """
+        Write everything buffered so far; on failure the batch stays buffered.
+
+        Waits for a write in progress first, so once this returns, every
+        transition buffered before the call is committed.
+        """
+        self._check_pid()
+        with self._write_lock:
+            with self._lock:
+                batch = list(self._pending.values())
+                self._pending = {}
+            if not batch:
+                return
+            try:
+                self.write(batch)
+            except Exception:
+                with self._lock:
+                    pending, self._pending = self._pending, {}
+                    self._buffer(batch)
+                    self._buffer(list(pending.values()))
+                raise
+
+    def close(self) -> None:
+        """Stop the background thread and write what is left."""
+        self._check_pid()
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval * 10)
+            self._flusher = None
+        self.flush()
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _buffer(self, transitions: list[TaskTransition]) -> None:
+        """Fold transitions into the buffer, in order. Caller holds the lock."""
+        for transition in transitions:
+            previous = self._pending.get(transition.task_id)
+            self._pending[transition.task_id] = (
+                previous.then(transition) if previous else transition
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush task state transitions, retrying")
+                time.sleep(self.flush_interval)
+
+    def write(self, batch: list[TaskTransition]) -> None:
+        """Persist transitions, then refresh their cache entries and publish events."""
+        state_flush_size.observe(len(batch))
+        db = SessionLocal()
+        try:
+            tasks = TaskRepository(db).apply_transitions(
+                [transition.as_row() for transition in batch]
+            )
+        finally:
+            db.close()
+
+        # Best-effort, like the unbatched path: Postgres already holds the state
+        try:
+            self.cache.set_many(
+                {
+                    str(task.id): (task_cache_entry(task), task_cache_ttl(task.status))
+                    for task in tasks
+                }
+            )
+            cache_fills_total.labels(tier="redis", source="worker").inc(len(tasks))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to cache state of {len(tasks)} tasks: {e}")
+
+        names = {transition.task_id: transition.task_name for transition in batch}
+        with self.cache.client.pipeline(transaction=False) as pipe:
+            for task in tasks:
+                publish_task_event(pipe, str(task.id), task.status, names.get(str(task.id)))
+            try:
+                pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f"Failed to publish events for {len(tasks)} tasks: {e}")
+
+        settle_memoized(tasks)
+
+
+state_writer = TaskStateWriter(
+    result_cache=cache,
+    batch_size=settings.worker_state_batch_size,
+    flush_interval=settings.worker_state_flush_interval_ms / 1000,
+)
+
+
+@worker_process_shutdown.connect  # type: ignore[untyped-decorator]
+@worker_shutdown.connect  # type: ignore[untyped-decorator]
+def flush_state_on_shutdown(*args: object, **kwargs: object) -> None:
+    """Write buffered transitions before a worker (or pool process) exits."""
+    state_writer.close()
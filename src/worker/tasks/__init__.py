@@ -1,23 +1,122 @@
 from typing import Any
 
+from celery import Task as CeleryTask
 
-def dispatch_task(
-    task_id: str,
-    task_name: str,
-    task_parameters: dict[str, Any],
-) -> None:
-    """Dispatch task to appropriate Celery worker."""
+from shared.config import get_settings
+from shared.models.task import TaskPriority
+
+settings = get_settings()
+
+
+def _resolve_task(task_name: str) -> CeleryTask:
+    """Return the Celery task registered for a task name."""
     if task_name == "sum":
         from worker.tasks.sum_task import sum_task
 
-        sum_task.delay(task_id, **task_parameters)
+        return sum_task
     elif task_name == "query_llm":
         from worker.tasks.llm_task import llm_task
 
-        llm_task.delay(task_id, **task_parameters)
+        return llm_task
     elif task_name == "file_hash":
         from worker.tasks.hash_task import hash_task
 
-        hash_task.delay(task_id, **task_parameters)
+        return hash_task
+    elif task_name == "vector_op":
+        from worker.tasks.vector_task import vector_task
+
+        return vector_task
     else:
         raise ValueError(f"Unknown task: {task_name}")
+
+
+def dispatch_task(
+    task_id: str,
+    task_name: str,
+    task_parameters: dict[str, Any],
+    priority: str = TaskPriority.NORMAL,
+) -> None:
+    """Dispatch task to its type's queue at its priority, or to the LLM batch queue."""
+    from worker.llm_batch import is_batched, llm_batcher
+    from worker.queues import BROKER_PRIORITY
+
+    if is_batched(task_name, task_parameters):
+        llm_batcher.collect([task_id])
+        return
+    _resolve_task(task_name).apply_async(
+        args=(task_id,),
+        kwargs=task_parameters,
+        priority=BROKER_PRIORITY[priority],
+    )
+
+
+def dispatch_tasks(
+    tasks: list[tuple[str, str, dict[str, Any], str]],
+) -> list[Exception | None]:
+    """
+    Dispatch many tasks over a single broker connection.
+
+    Takes (task_id, task_name, task_parameters, priority) tuples and returns
+    one entry per task, in order: None if published, otherwise the publish
+    error. Batch-mode LLM tasks are queued for the next Message Batch in one
+    push. With SUM_BATCHING, the sum tasks of each priority are sent as
+    `sum_batch` messages of up to `sum_batch_max_size` tasks each, computed
+    together by one worker.
+
+    The shared connection saves a connect per task, but every message is
+    still its own publish round trip. Kombu's Redis transport has no batched
+    publish, and a pipeline would bypass Celery's message protocol. A
+    1000-task request costs 1000 round trips; SUM_BATCHING, the outbox relay
+    or the Postgres queue backend cut that where it matters.
+    """
+    from worker.celery_app import celery_app
+    from worker.llm_batch import is_batched, llm_batcher
+    from worker.queues import BROKER_PRIORITY
+    from worker.tasks.sum_task import sum_batch_task
+
+    errors: list[Exception | None] = [None] * len(tasks)
+    batched = [
+        i for i, (_, name, parameters, _) in enumerate(tasks) if is_batched(name, parameters)
+    ]
+    if batched:
+        try:
+            llm_batcher.collect([tasks[i][0] for i in batched])
+        except Exception as e:
+            for i in batched:
+                errors[i] = e
+
+    sums: dict[str, list[int]] = {}
+    if settings.sum_batching:
+        for i, (_, name, _, priority) in enumerate(tasks):
+            if name == "sum":
+                sums.setdefault(priority, []).append(i)
+        sums = {priority: indexes for priority, indexes in sums.items() if len(indexes) >= 2}
+
+    with celery_app.producer_or_acquire() as producer:
+        for priority, indexes in sums.items():
+            for start in range(0, len(indexes), settings.sum_batch_max_size):
+                chunk = indexes[start : start + settings.sum_batch_max_size]
+                try:
+                    sum_batch_task.apply_async(
+                        args=([(tasks[i][0], tasks[i][2]["a"], tasks[i][2]["b"]) for i in chunk],),
+                        priority=BROKER_PRIORITY[priority],
+                        producer=producer,
+                    )
+                except Exception as e:
+                    for i in chunk:
+                        errors[i] = e
+
+        vectorized = {i for indexes in sums.values() for i in indexes}
+        for i, (task_id, task_name, task_parameters, priority) in enumerate(tasks):
+            if i in vectorized or is_batched(task_name, task_parameters):
+                continue
+            try:
+                _resolve_task(task_name).apply_async(
+                    args=(task_id,),
+                    kwargs=task_parameters,
+                    priority=BROKER_PRIORITY[priority],
+                    producer=producer,
+                )
+            except Exception as e:
+                errors[i] = e
+    return errors
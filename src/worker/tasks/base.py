@@ -3,16 +3,40 @@ from datetime import UTC, datetime
 from typing import Any
 from uuid import UUID
 
+import redis
+
 from api.repositories.task_repo import TaskRepository
-from shared.cache import cache
+from shared.cache import cache, task_cache_entry, task_cache_ttl
+from shared.config import get_settings
 from shared.database import SessionLocal
+from shared.events import publish_task_event
 from shared.logging import get_logger, setup_logging, task_id_ctx
-from shared.metrics import task_duration_seconds, tasks_completed_total
-from shared.models.task import TaskStatus
+from shared.metrics import cache_fills_total, task_duration_seconds, tasks_completed_total
+from shared.models.task import Task, TaskStatus
+from worker.memo import settle_memoized
+from worker.state_writer import TaskTransition, state_writer
 
 # Initialize logging for worker
 setup_logging()
 logger = get_logger(__name__)
+settings = get_settings()
+
+
+def cache_task_state(task: Task | None) -> None:
+    """
+    Overwrite the task's cached response with its new state.
+
+    Best-effort, like event publishing: Postgres already holds the state and a
+    missed write only leaves a short-lived status entry to expire.
+    """
+    if task is None:
+        return
+    try:
+        cache.set(str(task.id), task_cache_entry(task), ttl=task_cache_ttl(task.status))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to cache state of task {task.id}: {e}")
+        return
+    cache_fills_total.labels(tier="redis", source="worker").inc()
 
 
 def update_task_running(task_id: str, task_name: str | None = None) -> float:
@@ -25,10 +49,21 @@ def update_task_running(task_id: str, task_name: str | None = None) -> float:
         extra={"task_name": task_name or "unknown"},
     )
 
+    if settings.worker_state_batching or state_writer.collecting:
+        state_writer.submit(
+            TaskTransition(
+                task_id,
+                TaskStatus.RUNNING,
+                task_name=task_name,
+                started_at=datetime.now(UTC),
+            )
+        )
+        return start_time
+
     db = SessionLocal()
     try:
         repo = TaskRepository(db)
-        repo.update_status(
+        task = repo.update_status(
             task_id=UUID(task_id),
             status=TaskStatus.RUNNING,
             started_at=datetime.now(UTC),
@@ -36,6 +71,10 @@ def update_task_running(task_id: str, task_name: str | None = None) -> float:
     finally:
         db.close()
 
+    # Replace the API's pending entry so pollers see the transition without Postgres
+    cache_task_state(task)
+    publish_task_event(cache.client, task_id, TaskStatus.RUNNING, task_name=task_name)
+
     return start_time
 
 
@@ -62,15 +101,35 @@ def update_task_completed(
         },
     )
 
+    if settings.worker_state_batching or state_writer.collecting:
+        state_writer.submit(
+            TaskTransition(
+                task_id,
+                TaskStatus.COMPLETED,
+                task_name=name,
+                completed_at=datetime.now(UTC),
+                task_output=output,
+            ),
+            # Written before the task returns and its message is acknowledged
+            durable=True,
+        )
+        return
+
     db = SessionLocal()
     try:
         repo = TaskRepository(db)
-        repo.set_result(task_id=UUID(task_id), output=output)
+        task = repo.set_result(task_id=UUID(task_id), output=output)
     finally:
         db.close()
 
-    # Cache the result
-    cache.set(task_id, output)
+    # Cache the full response so the first read after completion skips Postgres
+    cache_task_state(task)
+
+    # Wake API requests waiting on this task
+    publish_task_event(cache.client, task_id, TaskStatus.COMPLETED, task_name=name)
+
+    if task is not None:
+        settle_memoized([task])
 
 
 def update_task_failed(
@@ -91,9 +150,32 @@ def update_task_failed(
         },
     )
 
+    if settings.worker_state_batching or state_writer.collecting:
+        state_writer.submit(
+            TaskTransition(
+                task_id,
+                TaskStatus.FAILED,
+                task_name=name,
+                completed_at=datetime.now(UTC),
+                error=error,
+            ),
+            # Written before the task returns and its message is acknowledged
+            durable=True,
+        )
+        return
+
     db = SessionLocal()
     try:
         repo = TaskRepository(db)
-        repo.set_error(task_id=UUID(task_id), error=error)
+        task = repo.set_error(task_id=UUID(task_id), error=error)
     finally:
         db.close()
+
+    # Short-lived like any non-completed state: the task may still be retried
+    cache_task_state(task)
+
+    # Wake API requests waiting on this task
+    publish_task_event(cache.client, task_id, TaskStatus.FAILED, task_name=name)
+
+    if task is not None:
+        settle_memoized([task])
@@ -1,8 +1,9 @@
-import hashlib
-from typing import Any, Literal
+from typing import Any
 
 from celery import Task as CeleryTask
 
+from shared.blobs import blob_store
+from shared.compute import HashAlgorithm, compute_hash, compute_hash_chunks
 from worker.celery_app import celery_app
 from worker.tasks.base import (
     update_task_completed,
@@ -23,34 +24,35 @@ TASK_NAME = "file_hash"
 def hash_task(
     self: CeleryTask,
     task_id: str,
-    content: str,
-    algorithm: Literal["md5", "sha1", "sha256"] = "sha256",
+    content: str | None = None,
+    algorithm: HashAlgorithm = "sha256",
+    blob: str | None = None,
+    algorithms: list[HashAlgorithm] | None = None,
 ) -> dict[str, Any]:
-    """Calculate hash of content."""
+    """
+    Calculate hash of content.
+
+    The content is either inline or, for uploads, a blob read in chunks; a
+    blob is deleted once hashed, or once the last retry has failed. With
+    `algorithms`, all of them are computed in a single pass.
+    """
     start_time = update_task_running(task_id, task_name=TASK_NAME)
 
     try:
-        # Get the hash function
-        hash_funcs = {
-            "md5": hashlib.md5,
-            "sha1": hashlib.sha1,
-            "sha256": hashlib.sha256,
-        }
-        hash_func = hash_funcs[algorithm]
-
-        # Calculate hash
-        content_bytes = content.encode("utf-8")
-        hash_value = hash_func(content_bytes).hexdigest()
-
-        output = {
-            "hash": hash_value,
-            "algorithm": algorithm,
-            "content_length": len(content_bytes),
-        }
+        if blob is not None:
+            output = compute_hash_chunks(blob_store.read_chunks(blob), algorithm, algorithms)
+        elif content is not None:
+            output = compute_hash(content, algorithm, algorithms)
+        else:
+            raise ValueError("file_hash needs either content or a blob")
 
         update_task_completed(task_id, output, start_time=start_time, task_name=TASK_NAME)
+        if blob is not None:
+            blob_store.delete(blob)
         return output
 
     except Exception as e:
         update_task_failed(task_id, str(e), task_name=TASK_NAME)
+        if blob is not None and self.request.retries >= self.max_retries:
+            blob_store.delete(blob)
         raise
@@ -0,0 +1,21 @@
+from worker.celery_app import celery_app
+from worker.llm_batch import llm_batcher
+from worker.llm_client import get_llm_client
+
+
+@celery_app.task(ignore_result=True)  # type: ignore[untyped-decorator]
+def submit_llm_batches() -> int:
+    """Submit every queued batch-mode prompt, in Message Batches of the maximum size."""
+    client = get_llm_client()
+    submitted = 0
+    while (taken := llm_batcher.submit(client)) > 0:
+        submitted += taken
+        if taken < llm_batcher.max_requests:
+            break
+    return submitted
+
+
+@celery_app.task(ignore_result=True)  # type: ignore[untyped-decorator]
+def poll_llm_batches() -> int:
+    """Write the results of ended Message Batches back to their tasks."""
+    return llm_batcher.poll(get_llm_client())
@@ -3,8 +3,14 @@ from typing import Any
 import anthropic
 from celery import Task as CeleryTask
 
+from shared.cache import cache
 from shared.config import get_settings
+from shared.llm_stream import LLMStreamWriter
+from shared.models.task import TaskStatus
 from worker.celery_app import celery_app
+from worker.llm_cache import llm_cache
+from worker.llm_client import get_llm_client
+from worker.llm_limiter import LimiterTimeoutError, estimate_tokens, llm_limiter
 from worker.tasks.base import (
     update_task_completed,
     update_task_failed,
@@ -15,9 +21,71 @@ settings = get_settings()
 TASK_NAME = "query_llm"
 
 
+def query_messages_api(
+    client: anthropic.Anthropic,
+    model: str,
+    prompt: str,
+    max_tokens: int,
+) -> dict[str, Any]:
+    """Send one prompt to the Messages API and build the task output."""
+    message = client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return message_output(message)
+
+
+def stream_messages_api(
+    client: anthropic.Anthropic,
+    model: str,
+    prompt: str,
+    max_tokens: int,
+    stream: LLMStreamWriter,
+) -> dict[str, Any]:
+    """Like `query_messages_api`, appending the text to `stream` as it is generated."""
+    stream.start()
+    with client.messages.stream(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[
+            {"role": "user", "content": prompt},
+        ],
+    ) as response:
+        for text in response.text_stream:
+            stream.write(text)
+        message = response.get_final_message()
+    stream.flush()
+    return message_output(message)
+
+
+def message_output(message: anthropic.types.Message) -> dict[str, Any]:
+    """Build the task output from a Messages API response."""
+    # Extract response text
+    response_text = ""
+    for block in message.content:
+        if block.type == "text":
+            response_text += block.text
+
+    return {
+        "response": response_text,
+        "model": message.model,
+        "usage": {
+            "input_tokens": message.usage.input_tokens,
+            "output_tokens": message.usage.output_tokens,
+        },
+    }
+
+
+# Failures Celery retries: the next attempt reopens the output stream with a start entry
+RETRYABLE_ERRORS = (anthropic.APIConnectionError, anthropic.RateLimitError, LimiterTimeoutError)
+
+
 @celery_app.task(  # type: ignore[untyped-decorator]
     bind=True,
-    autoretry_for=(anthropic.APIConnectionError, anthropic.RateLimitError),
+    autoretry_for=RETRYABLE_ERRORS,
     max_retries=3,
     retry_backoff=True,
     acks_late=True,
@@ -28,38 +96,53 @@ def llm_task(
     prompt: str,
     max_tokens: int = 1024,
 ) -> dict[str, Any]:
-    """Query Claude API with a prompt."""
+    """
+    Query Claude API with a prompt.
+
+    With `llm_streaming`, partial output is readable from the task's Redis
+    stream while it is generated; the result is persisted once, at the end.
+    """
     start_time = update_task_running(task_id, task_name=TASK_NAME)
+    stream = (
+        LLMStreamWriter(
+            cache.client,
+            task_id,
+            flush_interval=settings.llm_stream_flush_interval_ms / 1000,
+            ttl=settings.llm_stream_ttl_seconds,
+        )
+        if settings.llm_streaming
+        else None
+    )
 
     try:
-        client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
-
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=max_tokens,
-            messages=[
-                {"role": "user", "content": prompt},
-            ],
-        )
+        client = get_llm_client()
+        model = settings.llm_model
 
-        # Extract response text
-        response_text = ""
-        for block in message.content:
-            if block.type == "text":
-                response_text += block.text
-
-        output = {
-            "response": response_text,
-            "model": message.model,
-            "usage": {
-                "input_tokens": message.usage.input_tokens,
-                "output_tokens": message.usage.output_tokens,
-            },
-        }
+        def call() -> dict[str, Any]:
+            if stream is None:
+                return query_messages_api(client, model, prompt, max_tokens)
+            return stream_messages_api(client, model, prompt, max_tokens, stream)
+
+        output = llm_cache.get_or_call(
+            model,
+            prompt,
+            max_tokens,
+            lambda: llm_limiter.call(estimate_tokens(prompt, max_tokens), call),
+        )
+        if stream is not None and not stream.started:
+            # Served from the cache: stream the whole response at once
+            stream.start()
+            stream.write(output["response"])
 
         update_task_completed(task_id, output, start_time=start_time, task_name=TASK_NAME)
+        if stream is not None:
+            stream.end(TaskStatus.COMPLETED)
         return output
 
     except Exception as e:
         update_task_failed(task_id, str(e), task_name=TASK_NAME)
+        # Readers stop at the end entry, so a failure that will be retried leaves it open
+        final = not isinstance(e, RETRYABLE_ERRORS) or self.request.retries >= self.max_retries
+        if stream is not None and final:
+            stream.end(TaskStatus.FAILED)
         raise
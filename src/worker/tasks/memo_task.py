@@ -0,0 +1,8 @@
+from worker.celery_app import celery_app
+from worker.memo import recover_waiters
+
+
+@celery_app.task(ignore_result=True)  # type: ignore[untyped-decorator]
+def recover_memo_waiters() -> int:
+    """Release memoized submissions whose execution was lost."""
+    return recover_waiters()
@@ -1,6 +1,14 @@
+import time
+from datetime import UTC, datetime
+
 from celery import Task as CeleryTask
 
+from shared.compute import compute_sum, compute_sum_batch
+from shared.logging import get_logger
+from shared.metrics import tasks_completed_total
+from shared.models.task import TaskStatus
 from worker.celery_app import celery_app
+from worker.state_writer import TaskTransition, state_writer
 from worker.tasks.base import (
     update_task_completed,
     update_task_failed,
@@ -9,6 +17,8 @@ from worker.tasks.base import (
 
 TASK_NAME = "sum"
 
+logger = get_logger(__name__)
+
 
 @celery_app.task(  # type: ignore[untyped-decorator]
     bind=True,
@@ -27,10 +37,74 @@ def sum_task(
     start_time = update_task_running(task_id, task_name=TASK_NAME)
 
     try:
-        result = a + b
-        output = {"result": result}
+        output = compute_sum(a, b)
         update_task_completed(task_id, output, start_time=start_time, task_name=TASK_NAME)
         return output
     except Exception as e:
         update_task_failed(task_id, str(e), task_name=TASK_NAME)
         raise
+
+
+@celery_app.task(  # type: ignore[untyped-decorator]
+    bind=True,
+    autoretry_for=(Exception,),
+    max_retries=3,
+    retry_backoff=True,
+    acks_late=True,
+)
+def sum_batch_task(
+    self: CeleryTask,
+    tasks: list[tuple[str, int | float, int | float]],
+) -> int:
+    """
+    Run many sum tasks, given as (task_id, a, b), as one vectorized addition.
+
+    The tasks go from pending to completed in a single bulk write: one
+    UPDATE, one cache pipeline and one events pipeline for the whole batch,
+    instead of two writes per task. Returns how many tasks completed. Once
+    the last retry has failed, every task in the batch is marked failed.
+    """
+    start_time = time.perf_counter()
+    started_at = datetime.now(UTC)
+
+    try:
+        results = compute_sum_batch([(a, b) for _, a, b in tasks])
+        completed_at = datetime.now(UTC)
+        state_writer.write(
+            [
+                TaskTransition(
+                    task_id,
+                    TaskStatus.COMPLETED,
+                    TASK_NAME,
+                    started_at=started_at,
+                    completed_at=completed_at,
+                    task_output={"result": result},
+                )
+                for (task_id, _, _), result in zip(tasks, results, strict=True)
+            ]
+        )
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            tasks_completed_total.labels(task_name=TASK_NAME, status="failed").inc(len(tasks))
+            completed_at = datetime.now(UTC)
+            state_writer.write(
+                [
+                    TaskTransition(
+                        task_id,
+                        TaskStatus.FAILED,
+                        TASK_NAME,
+                        completed_at=completed_at,
+                        error=str(e),
+                    )
+                    for task_id, _, _ in tasks
+                ]
+            )
+        raise
+
+    duration_ms = (time.perf_counter() - start_time) * 1000
+    tasks_completed_total.labels(task_name=TASK_NAME, status="completed").inc(len(tasks))
+    logger.info(
+        f"Sum batch of {len(tasks)} tasks completed",
+        extra={"task_name": TASK_NAME, "duration_ms": round(duration_ms, 2)},
+    )
+    return len(tasks)
@@ -0,0 +1,41 @@
+from typing import Any
+
+from celery import Task as CeleryTask
+
+from shared.compute import NonFiniteResultError, Vector, VectorOp, compute_vector_op
+from worker.celery_app import celery_app
+from worker.tasks.base import (
+    update_task_completed,
+    update_task_failed,
+    update_task_running,
+)
+
+TASK_NAME = "vector_op"
+
+
+@celery_app.task(  # type: ignore[untyped-decorator]
+    bind=True,
+    autoretry_for=(Exception,),
+    # Deterministic: a retry would overflow again
+    dont_autoretry_for=(NonFiniteResultError,),
+    max_retries=3,
+    retry_backoff=True,
+    acks_late=True,
+)
+def vector_task(
+    self: CeleryTask,
+    task_id: str,
+    op: VectorOp,
+    a: Vector,
+    b: Vector | None = None,
+) -> dict[str, Any]:
+    """Run a sum, dot product or reduction over whole arrays with NumPy."""
+    start_time = update_task_running(task_id, task_name=TASK_NAME)
+
+    try:
+        output = compute_vector_op(op, a, b)
+        update_task_completed(task_id, output, start_time=start_time, task_name=TASK_NAME)
+        return output
+    except Exception as e:
+        update_task_failed(task_id, str(e), task_name=TASK_NAME)
+        raise
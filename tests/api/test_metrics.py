@@ -0,0 +1,24 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+
+class TestMetrics:
+    """Tests for GET /metrics."""
+
+    def test_metrics_samples_queue_depths(self, client: TestClient) -> None:
+        """Queue depths are sampled from the broker on every scrape."""
+        with patch("worker.queues.update_queue_depths") as update:
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        update.assert_called_once()
+        assert "tasker_queue_depth" in response.text
+
+    def test_metrics_survive_unreachable_broker(self, client: TestClient) -> None:
+        """A failed sample leaves the other metrics available."""
+        with patch("worker.queues.update_queue_depths", side_effect=ConnectionError("down")):
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert "tasker_http_requests_total" in response.text
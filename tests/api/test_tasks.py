@@ -1,9 +1,31 @@
-from uuid import uuid4
+import base64
+import json
+import math
+import struct
+import threading
+import time
+from collections.abc import Generator
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import UUID, uuid4
 
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from shared.models.task import Task, TaskStatus
+from api.dependencies import get_blob_store, get_inline_executor, get_llm_streams, get_memo
+from api.main import app
+from api.services.inline import InlineExecutor
+from shared.blobs import BlobStore
+from shared.cache import NOT_FOUND_ENTRY, CachedTaskOutput, MemoryCache, TaskCacheMarker
+from shared.config import MemoPolicy, get_settings
+from shared.events import TaskEvent, TaskEventHub
+from shared.llm_stream import LLMStreamEntry
+from shared.memo import MemoClaim
+from shared.models.task import Task, TaskOutbox, TaskStatus
 
 
 class TestRunTask:
@@ -39,6 +61,26 @@ class TestRunTask:
         data = response.json()
         assert "task_uuid" in data
 
+    def test_run_batch_llm_task_is_queued_for_a_batch(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+    ) -> None:
+        """A batch-mode prompt joins the Message Batch queue instead of the broker."""
+        with patch("worker.llm_batch.llm_batcher.collect") as collect:
+            response = client.post(
+                "/run-task",
+                json={"task_name": "query_llm", "prompt": "Hello", "batch": True},
+            )
+
+        task_uuid = response.json()["task_uuid"]
+        collect.assert_called_once_with([task_uuid])
+        mock_celery["llm"].assert_not_called()
+        task = db_session.get(Task, UUID(task_uuid))
+        assert task is not None
+        assert task.task_parameters == {"prompt": "Hello", "max_tokens": 1024, "batch": True}
+
     def test_run_file_hash_task_returns_uuid(self, client: TestClient) -> None:
         """File hash task submission returns a UUID."""
         response = client.post(
@@ -54,6 +96,120 @@ class TestRunTask:
         data = response.json()
         assert "task_uuid" in data
 
+    def test_run_file_hash_task_with_several_algorithms(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+    ) -> None:
+        """Several algorithms make one task, deduplicated, that computes them all."""
+        response = client.post(
+            "/run-task",
+            json={
+                "task_name": "file_hash",
+                "content": "test",
+                "algorithms": ["md5", "sha3_256", "md5"],
+            },
+        )
+
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.task_parameters == {"content": "test", "algorithms": ["md5", "sha3_256"]}
+        mock_celery["hash"].assert_called_once_with(
+            args=(str(task.id),),
+            kwargs={"content": "test", "algorithms": ["md5", "sha3_256"]},
+            priority=3,
+        )
+
+    def test_run_file_hash_task_unknown_algorithm_returns_422(self, client: TestClient) -> None:
+        """Algorithms outside the supported set are rejected."""
+        response = client.post(
+            "/run-task",
+            json={"task_name": "file_hash", "content": "test", "algorithms": ["crc32"]},
+        )
+
+        assert response.status_code == 422
+
+    def test_run_vector_op_task(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+    ) -> None:
+        """A vector_op task stores its operands as given."""
+        a = base64.b64encode(struct.pack("<2d", 1.0, 2.0)).decode()
+
+        response = client.post(
+            "/run-task",
+            json={"task_name": "vector_op", "op": "dot", "a": a, "b": [3, 4]},
+        )
+
+        assert response.status_code == 200
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.task_parameters == {"op": "dot", "a": a, "b": [3, 4]}
+        mock_celery["vector"].assert_called_once()
+
+    @pytest.mark.parametrize(
+        "fields",
+        [
+            {"op": "dot", "a": [1, 2], "b": [1]},
+            {"op": "add", "a": [1, 2]},
+            {"op": "sum", "a": [1, 2], "b": [1, 2]},
+            {"op": "sum", "a": []},
+            {"op": "sum", "a": "not base64!"},
+            {"op": "sum", "a": base64.b64encode(b"12345").decode()},
+            {"op": "sum", "a": base64.b64encode(struct.pack("<2d", 1, float("nan"))).decode()},
+            {"op": "add", "a": [1], "b": base64.b64encode(struct.pack("<d", -math.inf)).decode()},
+        ],
+    )
+    def test_run_vector_op_task_invalid_operands_returns_422(
+        self, client: TestClient, fields: dict[str, Any]
+    ) -> None:
+        """Mismatched, missing, empty, malformed or non-finite operands are rejected."""
+        response = client.post("/run-task", json={"task_name": "vector_op", **fields})
+
+        assert response.status_code == 422
+
+    def test_run_task_caches_pending_state(
+        self,
+        client: TestClient,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """A submitted task is cached as pending so early polls skip the DB."""
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        task_uuid = response.json()["task_uuid"]
+        cached = mock_cache.set_many.await_args.args[0]
+        entry, ttl = cached[task_uuid]
+        assert entry.status == "pending"
+        assert ttl == get_settings().status_cache_ttl_seconds
+
+    def test_run_task_priority_is_stored_and_sent(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+    ) -> None:
+        """The chosen priority is kept on the row and becomes the message's broker priority."""
+        response = client.post(
+            "/run-task", json={"task_name": "sum", "a": 1, "b": 2, "priority": "high"}
+        )
+
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.priority == "high"
+        assert task.task_parameters == {"a": 1, "b": 2}
+        assert mock_celery["sum"].call_args.kwargs["priority"] == 0
+
+    def test_run_task_unknown_priority_returns_422(self, client: TestClient) -> None:
+        """Only the high, normal and low levels are accepted."""
+        response = client.post(
+            "/run-task", json={"task_name": "sum", "a": 1, "b": 2, "priority": "urgent"}
+        )
+
+        assert response.status_code == 422
+
     def test_run_task_invalid_task_name_returns_422(self, client: TestClient) -> None:
         """Invalid task name returns 422."""
         response = client.post(
@@ -79,6 +235,454 @@ class TestRunTask:
         assert response.status_code == 422
 
 
+class TestRunTaskInline:
+    """Tests for the inline fast path of POST /run-task."""
+
+    @pytest.fixture
+    def inline(self, client: TestClient) -> Generator[InlineExecutor, None, None]:
+        """Run sum and small file_hash tasks inline."""
+        executor = InlineExecutor(task_names={"sum", "file_hash"}, max_cost=16, max_workers=2)
+        app.dependency_overrides[get_inline_executor] = lambda: executor
+        yield executor
+        executor.close()
+
+    def test_inline_task_is_stored_completed(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+        inline: InlineExecutor,
+    ) -> None:
+        """An inline task skips the broker and is persisted already completed."""
+        response = client.post("/run-task", json={"task_name": "sum", "a": 5, "b": 3})
+
+        data = response.json()
+        assert data["status"] == "completed"
+        assert data["task_output"] is None
+        mock_celery["sum"].assert_not_called()
+        task = db_session.get(Task, UUID(data["task_uuid"]))
+        assert task is not None
+        assert task.status == TaskStatus.COMPLETED
+        assert task.task_output == {"result": 8}
+
+    def test_inline_task_returns_output_on_request(
+        self,
+        client: TestClient,
+        mock_cache: AsyncMock,
+        memory_cache: MemoryCache,
+        inline: InlineExecutor,
+    ) -> None:
+        """include_output returns the result, which is also cached for reads."""
+        response = client.post(
+            "/run-task?include_output=true",
+            json={"task_name": "file_hash", "content": "hello", "algorithm": "md5"},
+        )
+
+        data = response.json()
+        assert data["task_output"]["hash"] == "5d41402abc4b2a76b9719d911017c592"
+        entry = mock_cache.set.await_args.args[1]
+        assert entry.status == "completed"
+        assert memory_cache.get(data["task_uuid"]) == entry
+
+    def test_costly_task_is_queued(
+        self,
+        client: TestClient,
+        mock_celery: dict[str, Any],
+        inline: InlineExecutor,
+    ) -> None:
+        """Input over the cost threshold goes through the broker as usual."""
+        response = client.post("/run-task", json={"task_name": "file_hash", "content": "x" * 17})
+
+        assert response.json()["status"] == "pending"
+        mock_celery["hash"].assert_called_once()
+
+    def test_saturated_pool_falls_back_to_queue(
+        self,
+        client: TestClient,
+        mock_celery: dict[str, Any],
+        inline: InlineExecutor,
+    ) -> None:
+        """With every inline thread busy, the task is queued rather than waiting."""
+        inline._in_flight = inline.max_workers
+
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        assert response.json()["status"] == "pending"
+        mock_celery["sum"].assert_called_once()
+
+
+class TestRunFileHashUpload:
+    """Tests for POST /run-task/file-hash endpoint."""
+
+    @pytest.fixture
+    def blobs(self, client: TestClient, tmp_path: Path) -> BlobStore:
+        """A blob store in a temporary directory, with small chunks."""
+        store = BlobStore(str(tmp_path / "blobs"), chunk_size=4)
+        app.dependency_overrides[get_blob_store] = lambda: store
+        return store
+
+    def test_upload_is_stored_as_blob_and_dispatched(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+        blobs: BlobStore,
+    ) -> None:
+        """The body goes to the blob store; only its ID reaches the task and the broker."""
+        response = client.post(
+            "/run-task/file-hash?algorithm=md5",
+            content=b"hello",
+            headers={"Content-Type": "application/octet-stream"},
+        )
+
+        assert response.status_code == 200
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.task_name == "file_hash"
+        blob_id = task.task_parameters["blob"]
+        assert task.task_parameters == {"blob": blob_id, "algorithm": "md5"}
+        assert blobs.path(blob_id).read_bytes() == b"hello"
+        mock_celery["hash"].assert_called_once_with(
+            args=(str(task.id),), kwargs={"blob": blob_id, "algorithm": "md5"}, priority=3
+        )
+
+    def test_upload_with_several_algorithms(
+        self,
+        client: TestClient,
+        db_session: Session,
+        blobs: BlobStore,
+    ) -> None:
+        """Repeated algorithms query parameters hash the upload in one pass."""
+        response = client.post(
+            "/run-task/file-hash?algorithms=sha1&algorithms=blake2s",
+            content=b"hello",
+        )
+
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.task_parameters["algorithms"] == ["sha1", "blake2s"]
+        assert "algorithm" not in task.task_parameters
+
+    def test_oversized_upload_is_rejected(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+        blobs: BlobStore,
+    ) -> None:
+        """A body past the size limit gets 413 and leaves no task or blob behind."""
+        with patch.object(get_settings(), "blob_max_bytes", 8):
+            response = client.post("/run-task/file-hash", content=b"x" * 9)
+
+        assert response.status_code == 413
+        assert db_session.query(Task).count() == 0
+        assert list(blobs.root.glob("*")) == []
+        mock_celery["hash"].assert_not_called()
+
+
+class TestRunTaskMemo:
+    """Tests for memoized submissions on POST /run-task."""
+
+    @pytest.fixture
+    def memo(self, client: TestClient, monkeypatch: pytest.MonkeyPatch) -> AsyncMock:
+        """Memoize sum, with no stored result and no execution in flight."""
+        monkeypatch.setattr(get_settings(), "memo_policies", {"sum": MemoPolicy()})
+        memo = AsyncMock()
+        memo.lookup.return_value = None
+        memo.claim.return_value = MemoClaim("leader")
+        app.dependency_overrides[get_memo] = lambda: memo
+        return memo
+
+    def test_stored_result_completes_task_without_dispatch(
+        self,
+        client: TestClient,
+        mock_celery: dict[str, Any],
+        memo: AsyncMock,
+    ) -> None:
+        """An identical earlier result completes the new task immediately."""
+        memo.lookup.return_value = {"result": 3}
+
+        response = client.post(
+            "/run-task?include_output=true", json={"task_name": "sum", "a": 1, "b": 2}
+        )
+
+        assert response.json()["status"] == "completed"
+        assert response.json()["task_output"] == {"result": 3}
+        mock_celery["sum"].assert_not_called()
+
+    def test_first_submission_is_dispatched(
+        self,
+        client: TestClient,
+        mock_celery: dict[str, Any],
+        memo: AsyncMock,
+    ) -> None:
+        """The leader of a new computation runs on a worker as usual."""
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        assert response.json()["status"] == "pending"
+        memo.claim.assert_awaited_once_with("sum", {"a": 1, "b": 2}, response.json()["task_uuid"])
+        mock_celery["sum"].assert_called_once()
+
+    def test_identical_submission_in_flight_is_not_dispatched(
+        self,
+        client: TestClient,
+        mock_celery: dict[str, Any],
+        memo: AsyncMock,
+    ) -> None:
+        """A submission joining an in-flight execution waits for its result."""
+        memo.claim.return_value = MemoClaim("joined")
+
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        assert response.json()["status"] == "pending"
+        mock_celery["sum"].assert_not_called()
+
+    def test_result_stored_after_lookup_completes_task(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+        memo: AsyncMock,
+    ) -> None:
+        """A result that lands between lookup and claim still skips dispatch."""
+        memo.claim.return_value = MemoClaim("hit", {"result": 3})
+
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        assert response.json()["status"] == "completed"
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.task_output == {"result": 3}
+        mock_celery["sum"].assert_not_called()
+
+
+class TestRunTaskOutbox:
+    """Tests for submissions through the transactional outbox."""
+
+    @pytest.fixture(autouse=True)
+    def outbox(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Submit through the outbox."""
+        monkeypatch.setattr(get_settings(), "task_outbox", True)
+
+    def test_task_is_committed_with_dispatch_record(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+        mock_cache: AsyncMock,
+    ) -> None:
+        """The row and its outbox entry are written together; nothing is published."""
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        assert response.status_code == 200
+        task_uuid = UUID(response.json()["task_uuid"])
+        entries = db_session.scalars(select(TaskOutbox)).all()
+        assert [entry.task_id for entry in entries] == [task_uuid]
+        mock_celery["sum"].assert_not_called()
+        # A worker may already have cached a newer state by now
+        assert mock_cache.set_many.await_args.kwargs["nx"] is True
+
+    def test_batch_is_committed_with_dispatch_records(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_batch_dispatch: MagicMock,
+    ) -> None:
+        """Every task of a batch gets its outbox entry in the same transaction."""
+        response = client.post(
+            "/run-tasks",
+            json={
+                "tasks": [
+                    {"task_name": "sum", "a": 1, "b": 2},
+                    {"task_name": "sum", "a": 3, "b": 4},
+                ]
+            },
+        )
+
+        results = response.json()["results"]
+        assert all(r["status"] == "accepted" for r in results)
+        task_ids = {entry.task_id for entry in db_session.scalars(select(TaskOutbox))}
+        assert task_ids == {UUID(r["task_uuid"]) for r in results}
+        mock_batch_dispatch.assert_not_called()
+
+    def test_joined_submission_drops_its_dispatch_record(
+        self,
+        client: TestClient,
+        db_session: Session,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """A submission waiting on an identical execution is never published."""
+        monkeypatch.setattr(get_settings(), "memo_policies", {"sum": MemoPolicy()})
+        memo = AsyncMock()
+        memo.lookup.return_value = None
+        memo.claim.return_value = MemoClaim("joined")
+        app.dependency_overrides[get_memo] = lambda: memo
+
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        assert response.json()["status"] == "pending"
+        assert db_session.scalars(select(TaskOutbox)).all() == []
+
+
+class TestRunTaskPostgresQueue:
+    """Tests for submissions with the Postgres queue backend."""
+
+    @pytest.fixture(autouse=True)
+    def postgres_queue(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Queue sum, file_hash and vector_op in Postgres."""
+        monkeypatch.setattr(get_settings(), "queue_backend", "postgres")
+
+    def test_task_is_left_pending_for_queue_workers(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_celery: dict[str, Any],
+        mock_cache: AsyncMock,
+    ) -> None:
+        """The committed row is the queue entry; nothing is published to Redis."""
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.status == TaskStatus.PENDING
+        assert task.started_at is None
+        mock_celery["sum"].assert_not_called()
+        # A queue worker may already have cached a newer state by now
+        assert mock_cache.set_many.await_args.kwargs["nx"] is True
+
+    def test_batch_publishes_only_celery_task_types(
+        self,
+        client: TestClient,
+        mock_batch_dispatch: MagicMock,
+    ) -> None:
+        """In a mixed batch, only query_llm goes to Celery; results keep their order."""
+        response = client.post(
+            "/run-tasks",
+            json={
+                "tasks": [
+                    {"task_name": "sum", "a": 1, "b": 2},
+                    {"task_name": "query_llm", "prompt": "Hello"},
+                    {"task_name": "vector_op", "op": "sum", "a": [1, 2]},
+                ]
+            },
+        )
+
+        results = response.json()["results"]
+        assert [r["status"] for r in results] == ["accepted"] * 3
+        [published] = mock_batch_dispatch.call_args.args[0]
+        assert published[0] == results[1]["task_uuid"]
+        assert published[1] == "query_llm"
+
+    def test_joined_submission_is_held_from_queue_workers(
+        self,
+        client: TestClient,
+        db_session: Session,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """A submission waiting on an identical execution is never claimed."""
+        monkeypatch.setattr(get_settings(), "memo_policies", {"sum": MemoPolicy()})
+        memo = AsyncMock()
+        memo.lookup.return_value = None
+        memo.claim.return_value = MemoClaim("joined")
+        app.dependency_overrides[get_memo] = lambda: memo
+
+        response = client.post("/run-task", json={"task_name": "sum", "a": 1, "b": 2})
+
+        task = db_session.get(Task, UUID(response.json()["task_uuid"]))
+        assert task is not None
+        assert task.status == TaskStatus.PENDING
+        assert task.held_at is not None
+        assert task.started_at is None
+
+
+class TestRunTasks:
+    """Tests for POST /run-tasks endpoint."""
+
+    def test_run_tasks_returns_uuids_in_order(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_batch_dispatch: MagicMock,
+    ) -> None:
+        """Batch submission creates one row per task and preserves order."""
+        response = client.post(
+            "/run-tasks",
+            json={
+                "tasks": [
+                    {"task_name": "sum", "a": 1, "b": 2},
+                    {"task_name": "file_hash", "content": "abc"},
+                    {"task_name": "sum", "a": 3, "b": 4},
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["index"] for r in results] == [0, 1, 2]
+        assert all(r["status"] == "accepted" for r in results)
+
+        names = [db_session.get(Task, UUID(r["task_uuid"])).task_name for r in results]
+        assert names == ["sum", "file_hash", "sum"]
+        mock_batch_dispatch.assert_called_once()
+
+    def test_run_tasks_keeps_each_priority(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_batch_dispatch: MagicMock,
+    ) -> None:
+        """Every task of a batch keeps its own priority, on the row and at dispatch."""
+        response = client.post(
+            "/run-tasks",
+            json={
+                "tasks": [
+                    {"task_name": "sum", "a": 1, "b": 2, "priority": "low"},
+                    {"task_name": "sum", "a": 3, "b": 4},
+                ]
+            },
+        )
+
+        results = response.json()["results"]
+        priorities = [db_session.get(Task, UUID(r["task_uuid"])).priority for r in results]
+        assert priorities == ["low", "normal"]
+        dispatched = mock_batch_dispatch.call_args.args[0]
+        assert [priority for *_, priority in dispatched] == ["low", "normal"]
+
+    def test_run_tasks_reports_partial_dispatch_failure(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_batch_dispatch: MagicMock,
+    ) -> None:
+        """Tasks that fail to publish are marked failed; the rest are accepted."""
+        mock_batch_dispatch.side_effect = lambda tasks: [None, ConnectionError("broker down")]
+
+        response = client.post(
+            "/run-tasks",
+            json={
+                "tasks": [
+                    {"task_name": "sum", "a": 1, "b": 2},
+                    {"task_name": "sum", "a": 3, "b": 4},
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        ok, failed = response.json()["results"]
+        assert ok["status"] == "accepted"
+        assert failed["status"] == "failed"
+        assert "broker down" in failed["error"]
+
+        task = db_session.get(Task, UUID(failed["task_uuid"]))
+        assert task.status == TaskStatus.FAILED
+
+    def test_run_tasks_empty_batch_returns_422(self, client: TestClient) -> None:
+        """Empty batch returns 422."""
+        response = client.post("/run-tasks", json={"tasks": []})
+
+        assert response.status_code == 422
+
+
 class TestGetTaskOutput:
     """Tests for GET /get-task-output endpoint."""
 
@@ -128,6 +732,79 @@ class TestGetTaskOutput:
         assert data["status"] == "completed"
         assert data["task_output"] == {"result": 3}
 
+    def test_get_task_output_completed_is_cached(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """Completed task output is written to the cache after a DB read."""
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.COMPLETED,
+            task_output={"result": 3},
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+
+        client.get(f"/get-task-output?taskuuid={task.id}")
+
+        mock_cache.set.assert_awaited_once()
+        cached = json.loads(mock_cache.set.await_args.args[1].body)
+        assert cached["task_uuid"] == str(task.id)
+        assert cached["task_output"] == {"result": 3}
+
+    def test_get_task_output_cache_hit_skips_db(
+        self,
+        client: TestClient,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """Cached response is served without the task existing in the DB."""
+        task_uuid = uuid4()
+        cached = CachedTaskOutput.from_payload(
+            {
+                "task_uuid": str(task_uuid),
+                "status": "completed",
+                "task_output": {"result": 3},
+                "error": None,
+                "created_at": "2025-01-01T12:00:00+00:00",
+                "completed_at": "2025-01-01T12:00:01+00:00",
+            }
+        )
+        mock_cache.get.return_value = cached
+
+        response = client.get(f"/get-task-output?taskuuid={task_uuid}")
+
+        assert response.status_code == 200
+        assert response.content == cached.body
+        assert response.headers["etag"] == cached.etag
+        assert response.json()["task_output"] == {"result": 3}
+
+    def test_get_task_output_completed_served_from_memory(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """A completed result is kept in process; repeat reads skip Redis."""
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.COMPLETED,
+            task_output={"result": 3},
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+
+        first = client.get(f"/get-task-output?taskuuid={task.id}")
+        second = client.get(f"/get-task-output?taskuuid={task.id}")
+
+        assert second.json() == first.json()
+        mock_cache.get.assert_awaited_once()
+
     def test_get_task_output_failed(
         self,
         client: TestClient,
@@ -159,6 +836,512 @@ class TestGetTaskOutput:
 
         assert response.status_code == 404
 
+    def test_get_task_output_not_found_is_cached(
+        self,
+        client: TestClient,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """Unknown task IDs are cached briefly so repeats skip the DB."""
+        fake_uuid = uuid4()
+
+        client.get(f"/get-task-output?taskuuid={fake_uuid}")
+
+        mock_cache.set.assert_awaited_once()
+        assert mock_cache.set.await_args.args == (str(fake_uuid), NOT_FOUND_ENTRY)
+        assert mock_cache.set.await_args.kwargs["nx"] is True
+
+    def test_get_task_output_cached_not_found_returns_404(
+        self,
+        client: TestClient,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """A cached not-found marker is answered without a DB read."""
+        mock_cache.get.return_value = NOT_FOUND_ENTRY
+
+        response = client.get(f"/get-task-output?taskuuid={uuid4()}")
+
+        assert response.status_code == 404
+        mock_cache.set.assert_not_awaited()
+
+
+class TestConditionalGetTaskOutput:
+    """Tests for ETag / If-None-Match on GET /get-task-output."""
+
+    def _completed_task(self, db_session: Session) -> Task:
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.COMPLETED,
+            task_output={"result": 3},
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+        return task
+
+    def test_completed_output_is_immutable(
+        self,
+        client: TestClient,
+        db_session: Session,
+    ) -> None:
+        """Completed results carry an ETag and an immutable Cache-Control."""
+        task = self._completed_task(db_session)
+
+        response = client.get(f"/get-task-output?taskuuid={task.id}")
+
+        assert response.headers["etag"]
+        assert "immutable" in response.headers["cache-control"]
+
+    def test_pending_output_must_revalidate(
+        self,
+        client: TestClient,
+        db_session: Session,
+    ) -> None:
+        """Non-terminal states may change, so caches must revalidate."""
+        task = Task(task_name="sum", task_parameters={"a": 1, "b": 2}, status=TaskStatus.PENDING)
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+
+        response = client.get(f"/get-task-output?taskuuid={task.id}")
+
+        assert response.headers["cache-control"] == "no-cache"
+
+    def test_matching_etag_returns_304(
+        self,
+        client: TestClient,
+        db_session: Session,
+    ) -> None:
+        """A client holding the current ETag gets 304 with no body."""
+        task = self._completed_task(db_session)
+        etag = client.get(f"/get-task-output?taskuuid={task.id}").headers["etag"]
+
+        response = client.get(
+            f"/get-task-output?taskuuid={task.id}",
+            headers={"If-None-Match": f'W/"stale", {etag}'},
+        )
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_matching_etag_uses_cached_marker_only(
+        self,
+        client: TestClient,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """The 304 is answered from the cached ETag/status without reading the body."""
+        mock_cache.get_marker.return_value = TaskCacheMarker(etag='"abc"', status="running")
+
+        response = client.get(
+            f"/get-task-output?taskuuid={uuid4()}",
+            headers={"If-None-Match": '"abc"'},
+        )
+
+        assert response.status_code == 304
+        assert response.headers["cache-control"] == "no-cache"
+        mock_cache.get.assert_not_awaited()
+
+    def test_changed_etag_returns_full_response(
+        self,
+        client: TestClient,
+        db_session: Session,
+    ) -> None:
+        """A stale ETag gets the current representation."""
+        task = self._completed_task(db_session)
+
+        response = client.get(
+            f"/get-task-output?taskuuid={task.id}",
+            headers={"If-None-Match": '"stale"'},
+        )
+
+        assert response.status_code == 200
+        assert response.json()["task_output"] == {"result": 3}
+
+
+class TestGetTaskOutputWait:
+    """Tests for long-polling GET /get-task-output?wait=..."""
+
+    def _pending_task(self, db_session: Session) -> Task:
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.PENDING,
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+        return task
+
+    def test_wait_returns_when_task_completes(
+        self,
+        client: TestClient,
+        db_session: Session,
+        event_hub: TaskEventHub,
+    ) -> None:
+        """A completion event releases the waiting request with the result."""
+        task = self._pending_task(db_session)
+
+        def complete() -> None:
+            time.sleep(0.2)
+            task.status = TaskStatus.COMPLETED
+            task.task_output = {"result": 3}
+            db_session.commit()
+            event = TaskEvent(task_uuid=str(task.id), status=TaskStatus.COMPLETED)
+            client.portal.call(event_hub.dispatch, event)
+
+        worker = threading.Thread(target=complete)
+        worker.start()
+        started = time.perf_counter()
+        response = client.get(f"/get-task-output?taskuuid={task.id}&wait=10s")
+        worker.join()
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "completed"
+        assert response.json()["task_output"] == {"result": 3}
+        assert time.perf_counter() - started < 5
+
+    def test_wait_releases_the_db_session(
+        self,
+        client: TestClient,
+        db_session: Session,
+        event_hub: TaskEventHub,
+    ) -> None:
+        """The session is closed after the first read, not held for the whole wait."""
+        task = self._pending_task(db_session)
+        closed = threading.Event()
+        close = AsyncSession.close
+
+        async def record_close(session: AsyncSession) -> None:
+            closed.set()
+            await close(session)
+
+        released_while_waiting: list[bool] = []
+
+        def complete() -> None:
+            released_while_waiting.append(closed.wait(timeout=5))
+            task.status = TaskStatus.COMPLETED
+            db_session.commit()
+            event = TaskEvent(task_uuid=str(task.id), status=TaskStatus.COMPLETED)
+            client.portal.call(event_hub.dispatch, event)
+
+        worker = threading.Thread(target=complete)
+        with patch.object(AsyncSession, "close", record_close):
+            worker.start()
+            response = client.get(f"/get-task-output?taskuuid={task.id}&wait=10s")
+            worker.join()
+
+        assert response.json()["status"] == "completed"
+        assert released_while_waiting == [True]
+
+    def test_wait_times_out_with_current_status(
+        self,
+        client: TestClient,
+        db_session: Session,
+    ) -> None:
+        """Without a completion event, the wait expires and returns current status."""
+        task = self._pending_task(db_session)
+
+        started = time.perf_counter()
+        response = client.get(f"/get-task-output?taskuuid={task.id}&wait=200ms")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "pending"
+        assert time.perf_counter() - started >= 0.2
+
+    def test_wait_invalid_duration_returns_422(self, client: TestClient) -> None:
+        """Malformed wait durations are rejected."""
+        response = client.get(f"/get-task-output?taskuuid={uuid4()}&wait=soon")
+
+        assert response.status_code == 422
+
+
+class TestGetTaskOutputs:
+    """Tests for POST /get-task-outputs endpoint."""
+
+    def test_get_task_outputs_mixes_cache_db_and_missing(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_cache: AsyncMock,
+    ) -> None:
+        """Cache hits, DB rows and unknown UUIDs are resolved in one call."""
+        cached_uuid = uuid4()
+        missing_uuid = uuid4()
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.COMPLETED,
+            task_output={"result": 3},
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+
+        mock_cache.get_many.side_effect = lambda task_uuids: [
+            CachedTaskOutput.from_payload(
+                {
+                    "task_uuid": str(cached_uuid),
+                    "status": "completed",
+                    "task_output": {"result": 7},
+                    "error": None,
+                    "created_at": "2025-01-01T12:00:00+00:00",
+                    "completed_at": "2025-01-01T12:00:01+00:00",
+                }
+            ),
+            None,
+            None,
+        ]
+
+        response = client.post(
+            "/get-task-outputs",
+            json={"task_uuids": [str(cached_uuid), str(task.id), str(missing_uuid)]},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["tasks"][str(cached_uuid)]["task_output"] == {"result": 7}
+        assert data["tasks"][str(task.id)]["task_output"] == {"result": 3}
+        assert data["not_found"] == [str(missing_uuid)]
+
+        # DB rows and unknown IDs are backfilled, without replacing newer entries
+        backfill = mock_cache.set_many.await_args.args[0]
+        assert list(backfill) == [str(task.id), str(missing_uuid)]
+        assert backfill[str(missing_uuid)][0] == NOT_FOUND_ENTRY
+        assert mock_cache.set_many.await_args.kwargs["nx"] is True
+
+    def test_get_task_outputs_too_many_returns_422(self, client: TestClient) -> None:
+        """Requests above the lookup limit return 422."""
+        response = client.post(
+            "/get-task-outputs",
+            json={"task_uuids": [str(uuid4()) for _ in range(501)]},
+        )
+
+        assert response.status_code == 422
+
+
+class TestStreamTasks:
+    """Tests for GET /tasks/stream endpoint."""
+
+    @staticmethod
+    def _events(body: str) -> list[TaskEvent]:
+        return [
+            TaskEvent.decode(line.removeprefix("data: "))
+            for line in body.splitlines()
+            if line.startswith("data: ")
+        ]
+
+    def test_stream_sends_snapshot_and_closes_when_terminal(
+        self,
+        client: TestClient,
+        db_session: Session,
+    ) -> None:
+        """Already-finished and unknown tasks produce a snapshot, then the stream ends."""
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.COMPLETED,
+            task_output={"result": 3},
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+        missing = uuid4()
+
+        response = client.get(f"/tasks/stream?ids={task.id}&ids={missing}")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert [(e.task_uuid, e.status) for e in self._events(response.text)] == [
+            (str(task.id), "completed"),
+            (str(missing), "not_found"),
+        ]
+
+    def test_stream_relays_transitions(
+        self,
+        client: TestClient,
+        db_session: Session,
+        event_hub: TaskEventHub,
+    ) -> None:
+        """Live transitions are relayed until the watched task finishes."""
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.PENDING,
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+
+        def work() -> None:
+            time.sleep(0.2)
+            for status in (TaskStatus.RUNNING, TaskStatus.RUNNING, TaskStatus.COMPLETED):
+                event = TaskEvent(task_uuid=str(task.id), status=status, task_name="sum")
+                client.portal.call(event_hub.dispatch, event)
+
+        worker = threading.Thread(target=work)
+        worker.start()
+        response = client.get(f"/tasks/stream?ids={task.id}")
+        worker.join()
+
+        # Duplicate transitions are collapsed
+        assert [e.status for e in self._events(response.text)] == [
+            "pending",
+            "running",
+            "completed",
+        ]
+
+    def test_heartbeat_recovers_missed_completion(
+        self,
+        client: TestClient,
+        db_session: Session,
+        mock_cache: AsyncMock,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """A completion whose event was lost is found on the next heartbeat."""
+        monkeypatch.setattr(get_settings(), "stream_heartbeat_seconds", 0.05)
+        task = Task(
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.PENDING,
+        )
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+        completed = CachedTaskOutput(body=b"{}", etag='"etag"', status=TaskStatus.COMPLETED)
+        mock_cache.get_many.side_effect = lambda task_uuids: [completed] * len(task_uuids)
+
+        response = client.get(f"/tasks/stream?ids={task.id}")
+
+        assert [(e.status, e.task_name) for e in self._events(response.text)] == [
+            ("pending", "sum"),
+            ("completed", "sum"),
+        ]
+        assert ": keep-alive" in response.text
+
+
+class TestStreamTaskOutput:
+    """Tests for GET /tasks/{task_uuid}/stream endpoint."""
+
+    @pytest.fixture
+    def streams(self) -> Generator[MagicMock, None, None]:
+        """Output stream reader with no stream for any task."""
+        streams = MagicMock()
+        streams.exists = AsyncMock(return_value=False)
+        streams.read = AsyncMock(return_value=[])
+        app.dependency_overrides[get_llm_streams] = lambda: streams
+        yield streams
+
+    @staticmethod
+    def _events(body: str) -> list[tuple[str, Any]]:
+        return [
+            (event.split("\n")[-2].removeprefix("event: "), json.loads(event.split("data: ")[1]))
+            for event in body.split("\n\n")
+            if "data: " in event
+        ]
+
+    def _add_task(self, db_session: Session, **fields: Any) -> Task:
+        task = Task(task_name="query_llm", task_parameters={"prompt": "What is 2+2?"}, **fields)
+        db_session.add(task)
+        db_session.commit()
+        db_session.refresh(task)
+        return task
+
+    def test_finished_task_is_streamed_whole(
+        self,
+        client: TestClient,
+        db_session: Session,
+        streams: MagicMock,
+    ) -> None:
+        """A task finished before the client connected gets its response as one delta."""
+        task = self._add_task(
+            db_session,
+            status=TaskStatus.COMPLETED,
+            task_output={"response": "2 + 2 is 4.", "model": "m", "usage": {}},
+        )
+
+        response = client.get(f"/tasks/{task.id}/stream")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert self._events(response.text) == [
+            ("start", {}),
+            ("delta", {"text": "2 + 2 is 4."}),
+            ("end", {"status": "completed"}),
+        ]
+        streams.read.assert_not_called()
+
+    def test_live_output_is_relayed(
+        self,
+        client: TestClient,
+        db_session: Session,
+        streams: MagicMock,
+    ) -> None:
+        """Entries are relayed with their IDs until the stream ends."""
+        task = self._add_task(db_session, status=TaskStatus.RUNNING)
+        streams.read.side_effect = [
+            [LLMStreamEntry("start", id="1-0"), LLMStreamEntry("delta", text="2 + 2", id="1-1")],
+            [],
+            [
+                LLMStreamEntry("delta", text=" is 4.", id="2-0"),
+                LLMStreamEntry("end", status="completed", id="3-0"),
+            ],
+        ]
+
+        response = client.get(f"/tasks/{task.id}/stream")
+
+        assert self._events(response.text) == [
+            ("start", {}),
+            ("delta", {"text": "2 + 2"}),
+            ("delta", {"text": " is 4."}),
+            ("end", {"status": "completed"}),
+        ]
+        assert ": keep-alive" in response.text
+        assert "id: 3-0" in response.text
+        # Each read continues after the last entry relayed
+        assert [call.args[1] for call in streams.read.call_args_list] == ["0", "1-1", "1-1"]
+
+    def test_last_event_id_resumes_the_stream(
+        self,
+        client: TestClient,
+        db_session: Session,
+        streams: MagicMock,
+    ) -> None:
+        """A reconnecting client only gets the entries after the last one it saw."""
+        task = self._add_task(db_session, status=TaskStatus.RUNNING)
+        streams.read.return_value = [LLMStreamEntry("end", status="completed", id="3-0")]
+
+        client.get(f"/tasks/{task.id}/stream", headers={"Last-Event-ID": "2-0"})
+
+        assert streams.read.call_args.args[1] == "2-0"
+
+    def test_task_finished_without_stream_ends_the_stream(
+        self,
+        client: TestClient,
+        db_session: Session,
+        streams: MagicMock,
+    ) -> None:
+        """If the task finishes with nothing streamed, its persisted response is sent."""
+        task = self._add_task(db_session, status=TaskStatus.RUNNING)
+
+        async def finish(*args: Any) -> list[LLMStreamEntry]:
+            task.status = TaskStatus.COMPLETED
+            task.task_output = {"response": "4", "model": "m", "usage": {}}
+            db_session.commit()
+            return []
+
+        streams.read.side_effect = finish
+
+        response = client.get(f"/tasks/{task.id}/stream")
+
+        assert [event for event, _ in self._events(response.text)] == ["start", "delta", "end"]
+
+    def test_unknown_task_returns_404(self, client: TestClient, streams: MagicMock) -> None:
+        """Unknown task UUIDs are rejected before the stream starts."""
+        response = client.get(f"/tasks/{uuid4()}/stream")
+
+        assert response.status_code == 404
+
 
 class TestHealthCheck:
     """Tests for GET /health endpoint."""
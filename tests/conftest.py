@@ -1,81 +1,125 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
+from pathlib import Path
 from typing import Any
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
-from api.dependencies import get_cache, get_db
+from api.dependencies import get_cache, get_db, get_event_hub, get_memory_cache
 from api.main import app
+from shared.cache import MemoryCache
 from shared.database import Base
+from shared.events import TaskEventHub
 
-# In-memory SQLite for tests
-TEST_DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(
-    TEST_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@pytest.fixture
+def database_url(tmp_path: Path) -> str:
+    """File-backed SQLite so the sync test session and async API session share data."""
+    return f"sqlite:///{tmp_path / 'test.db'}"
 
 
 @pytest.fixture(scope="function")
-def db_session() -> Generator[Session, None, None]:
+def db_session(database_url: str) -> Generator[Session, None, None]:
     """Create a fresh database session for each test."""
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
     Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
     try:
         yield session
     finally:
         session.close()
         Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def async_session_factory(database_url: str) -> async_sessionmaker[AsyncSession]:
+    """Async sessions bound to the test database."""
+    # NullPool: connections must not outlive the TestClient's event loop
+    engine = create_async_engine(
+        database_url.replace("sqlite://", "sqlite+aiosqlite://"),
+        poolclass=NullPool,
+    )
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 
 @pytest.fixture
-def mock_cache() -> MagicMock:
-    """Mock Redis cache."""
-    cache = MagicMock()
+def mock_cache() -> AsyncMock:
+    """Mock async Redis cache."""
+    cache = AsyncMock()
     cache.get.return_value = None
-    cache.get_raw.return_value = None
+    cache.get_marker.return_value = None
     cache.set.return_value = None
-    cache.set_raw.return_value = None
+    cache.get_many.side_effect = lambda task_uuids: [None] * len(task_uuids)
+    cache.set_many.return_value = None
     cache.ping.return_value = True
     return cache
 
 
 @pytest.fixture
-def mock_celery() -> Generator[MagicMock, None, None]:
+def memory_cache() -> MemoryCache:
+    """Fresh in-process result cache per test."""
+    return MemoryCache(max_entries=100, max_bytes=1024 * 1024)
+
+
+@pytest.fixture
+def event_hub() -> TaskEventHub:
+    """Task event hub that never connects to Redis; tests feed it via dispatch()."""
+    hub = TaskEventHub("redis://localhost:6379/0")
+    hub._ensure_started = AsyncMock()  # type: ignore[method-assign]
+    return hub
+
+
+@pytest.fixture
+def mock_celery() -> Generator[dict[str, Any], None, None]:
     """Mock Celery task dispatch."""
-    with patch("worker.tasks.sum_task.sum_task.delay") as mock_sum, \
-         patch("worker.tasks.llm_task.llm_task.delay") as mock_llm, \
-         patch("worker.tasks.hash_task.hash_task.delay") as mock_hash:
+    with patch("worker.tasks.sum_task.sum_task.apply_async") as mock_sum, \
+         patch("worker.tasks.llm_task.llm_task.apply_async") as mock_llm, \
+         patch("worker.tasks.hash_task.hash_task.apply_async") as mock_hash, \
+         patch("worker.tasks.vector_task.vector_task.apply_async") as mock_vector:
         yield {
             "sum": mock_sum,
             "llm": mock_llm,
             "hash": mock_hash,
+            "vector": mock_vector,
         }
 
 
+@pytest.fixture
+def mock_batch_dispatch() -> Generator[MagicMock, None, None]:
+    """Mock batched Celery dispatch; every task publishes successfully by default."""
+    with patch("worker.tasks.dispatch_tasks") as mock_dispatch:
+        mock_dispatch.side_effect = lambda tasks: [None] * len(tasks)
+        yield mock_dispatch
+
+
 @pytest.fixture
 def client(
     db_session: Session,
-    mock_cache: MagicMock,
+    async_session_factory: async_sessionmaker[AsyncSession],
+    mock_cache: AsyncMock,
+    memory_cache: MemoryCache,
     mock_celery: dict[str, Any],
+    event_hub: TaskEventHub,
 ) -> Generator[TestClient, None, None]:
     """Create test client with mocked dependencies."""
 
-    def override_get_db() -> Generator[Session, None, None]:
-        yield db_session
+    async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+        async with async_session_factory() as session:
+            yield session
 
-    def override_get_cache() -> MagicMock:
+    def override_get_cache() -> AsyncMock:
         return mock_cache
 
     app.dependency_overrides[get_db] = override_get_db
     app.dependency_overrides[get_cache] = override_get_cache
+    app.dependency_overrides[get_memory_cache] = lambda: memory_cache
+    app.dependency_overrides[get_event_hub] = lambda: event_hub
 
     with TestClient(app) as test_client:
         yield test_client
@@ -0,0 +1,52 @@
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+
+from shared.blobs import BlobStore, BlobTooLargeError
+
+
+async def stream(*chunks: bytes) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+class TestBlobStore:
+    """Tests for spooling uploads to disk and reading them back in chunks."""
+
+    async def test_write_then_read_in_chunks(self, tmp_path: Path) -> None:
+        """A blob is read back whole, never more than one chunk at a time."""
+        store = BlobStore(str(tmp_path), chunk_size=4)
+
+        blob = await store.write(stream(b"hello", b" ", b"world"), max_bytes=100)
+
+        assert blob.size == 11
+        chunks = list(store.read_chunks(blob.id))
+        assert b"".join(chunks) == b"hello world"
+        assert max(len(chunk) for chunk in chunks) <= 4
+
+    async def test_too_large_upload_leaves_nothing(self, tmp_path: Path) -> None:
+        """An upload past the limit is rejected and its partial file removed."""
+        store = BlobStore(str(tmp_path), chunk_size=4)
+
+        with pytest.raises(BlobTooLargeError):
+            await store.write(stream(b"12345", b"67890"), max_bytes=8)
+
+        assert list(tmp_path.iterdir()) == []
+
+    async def test_delete_is_idempotent(self, tmp_path: Path) -> None:
+        """Deleting a blob twice is not an error."""
+        store = BlobStore(str(tmp_path), chunk_size=4)
+        blob = await store.write(stream(b"data"), max_bytes=100)
+
+        store.delete(blob.id)
+        store.delete(blob.id)
+
+        assert not store.path(blob.id).exists()
+
+    def test_path_rejects_foreign_ids(self, tmp_path: Path) -> None:
+        """Only IDs the store generated map to a path."""
+        store = BlobStore(str(tmp_path), chunk_size=4)
+
+        with pytest.raises(ValueError):
+            store.path("../../etc/passwd")
@@ -0,0 +1,76 @@
+import json
+from uuid import uuid4
+
+from shared.cache import CachedTaskOutput, MemoryCache
+
+
+def _entry(status: str = "completed", output: str = "x") -> CachedTaskOutput:
+    return CachedTaskOutput.from_payload(
+        {
+            "task_uuid": str(uuid4()),
+            "status": status,
+            "task_output": {"result": output},
+            "error": None,
+            "created_at": "2025-01-01T00:00:00+00:00",
+            "completed_at": "2025-01-01T00:00:01+00:00",
+        }
+    )
+
+
+def _uuid(entry: CachedTaskOutput) -> str:
+    return str(json.loads(entry.body)["task_uuid"])
+
+
+class TestCachedTaskOutput:
+    """Tests for pre-encoded cache entries."""
+
+    def test_etag_changes_with_status_only_when_state_changes(self) -> None:
+        """The ETag is stable for a state and differs across transitions."""
+        payload = json.loads(_entry(status="running").body)
+
+        same = CachedTaskOutput.from_payload(payload)
+        completed = CachedTaskOutput.from_payload({**payload, "status": "completed"})
+
+        assert same.etag == CachedTaskOutput.from_payload(payload).etag
+        assert completed.etag != same.etag
+        assert same.etag.startswith('"') and same.etag.endswith('"')
+
+
+class TestMemoryCache:
+    """Tests for the in-process LRU result tier."""
+
+    def test_evicts_least_recently_used_entry(self) -> None:
+        """Past the entry limit, the least recently read entry goes first."""
+        cache = MemoryCache(max_entries=2, max_bytes=1024 * 1024)
+        first, second, third = _entry(), _entry(), _entry()
+        cache.set(_uuid(first), first)
+        cache.set(_uuid(second), second)
+
+        cache.get(_uuid(first))
+        cache.set(_uuid(third), third)
+
+        assert cache.get(_uuid(first)) is first
+        assert cache.get(_uuid(second)) is None
+        assert len(cache) == 2
+
+    def test_evicts_to_stay_under_byte_limit(self) -> None:
+        """Entries are evicted once their combined size exceeds max_bytes."""
+        small = _entry()
+        size = len(small.body)
+        cache = MemoryCache(max_entries=100, max_bytes=size * 2)
+        cache.set(_uuid(small), small)
+
+        large = _entry(output="y" * size)
+        cache.set(_uuid(large), large)
+
+        assert cache.get(_uuid(small)) is None
+        assert cache.get(_uuid(large)) is large
+
+    def test_only_completed_results_are_held(self) -> None:
+        """Non-terminal or retryable states are never cached in process."""
+        cache = MemoryCache(max_entries=10, max_bytes=1024 * 1024)
+        for status in ("pending", "running", "failed"):
+            entry = _entry(status=status)
+            cache.set(_uuid(entry), entry)
+
+        assert len(cache) == 0
@@ -0,0 +1,94 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import redis
+
+from shared.events import TASK_EVENTS_CHANNEL, TaskEvent, TaskEventHub, publish_task_event
+
+
+@pytest.fixture
+def hub() -> TaskEventHub:
+    """Hub with the Redis subscription stubbed out."""
+    hub = TaskEventHub("redis://localhost:6379/0")
+    hub._ensure_started = AsyncMock()  # type: ignore[method-assign]
+    return hub
+
+
+class TestTaskEventHub:
+    """Tests for in-process fan-out of task events."""
+
+    async def test_dispatch_routes_by_task_id(self, hub: TaskEventHub) -> None:
+        """Subscribers only receive events for their tasks."""
+        async with hub.subscribe({"a"}) as sub_a, hub.subscribe({"b"}) as sub_b:
+            hub.dispatch(TaskEvent(task_uuid="a", status="completed"))
+
+            assert (await sub_a.get()).status == "completed"
+            assert sub_b._queue.empty()
+
+    async def test_subscribe_all_receives_every_event(self, hub: TaskEventHub) -> None:
+        """A subscription without task IDs receives all events."""
+        async with hub.subscribe() as sub:
+            hub.dispatch(TaskEvent(task_uuid="a", status="running"))
+            hub.dispatch(TaskEvent(task_uuid="b", status="failed"))
+
+            assert [(await sub.get()).task_uuid for _ in range(2)] == ["a", "b"]
+
+    async def test_task_name_filter(self, hub: TaskEventHub) -> None:
+        """A task name filter drops events for other task types."""
+        async with hub.subscribe(task_names={"query_llm"}) as sub:
+            hub.dispatch(TaskEvent(task_uuid="a", status="running", task_name="sum"))
+            hub.dispatch(TaskEvent(task_uuid="b", status="running", task_name="query_llm"))
+
+            assert (await sub.get()).task_uuid == "b"
+            assert sub._queue.empty()
+
+    async def test_unsubscribe_on_exit(self, hub: TaskEventHub) -> None:
+        """Leaving the context removes the subscription from the index."""
+        async with hub.subscribe({"a"}):
+            pass
+
+        assert hub._by_task == {}
+
+    async def test_dead_reader_is_restarted(self) -> None:
+        """A reader that died on an unexpected error is replaced on the next subscribe."""
+        hub = TaskEventHub("redis://localhost:6379/0")
+
+        async def crash() -> None:
+            raise RuntimeError("boom")
+
+        hub._reader = asyncio.create_task(crash())
+        await asyncio.sleep(0)
+        client = MagicMock(aclose=AsyncMock())
+        client.pubsub.return_value = MagicMock(subscribe=AsyncMock(), aclose=AsyncMock())
+        hub._read_loop = AsyncMock()  # type: ignore[method-assign]
+
+        with patch("shared.events.aioredis.from_url", return_value=client):
+            async with hub.subscribe({"a"}):
+                pass
+
+        client.pubsub.return_value.subscribe.assert_awaited_once_with(TASK_EVENTS_CHANNEL)
+        assert hub._reader is not None
+        assert not hub._reader.cancelled()
+        await hub.close()
+
+
+class TestPublishTaskEvent:
+    """Tests for worker-side event publishing."""
+
+    def test_publish_encodes_event(self) -> None:
+        """Events are published as JSON on the task events channel."""
+        client = MagicMock()
+
+        publish_task_event(client, "abc", "completed", task_name="sum")
+
+        channel, data = client.publish.call_args.args
+        assert channel == TASK_EVENTS_CHANNEL
+        assert TaskEvent.decode(data) == TaskEvent("abc", "completed", "sum")
+
+    def test_publish_swallows_redis_errors(self) -> None:
+        """A Redis outage does not fail the task."""
+        client = MagicMock()
+        client.publish.side_effect = redis.ConnectionError("down")
+
+        publish_task_event(client, "abc", "failed")
@@ -0,0 +1,94 @@
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+
+from shared.llm_stream import AsyncLLMStreams, LLMStreamEntry, LLMStreamWriter
+
+
+def writer(flush_interval: float) -> tuple[LLMStreamWriter, list[dict[str, Any]]]:
+    """A writer on a mock Redis client, and the list of fields it appends."""
+    client = MagicMock()
+    appended: list[dict[str, Any]] = []
+    pipe = client.pipeline.return_value.__enter__.return_value
+    pipe.xadd.side_effect = lambda key, fields: appended.append(fields)
+    return LLMStreamWriter(client, "task-id", flush_interval, ttl=60), appended
+
+
+class TestLLMStreamWriter:
+    """Tests for appending partial LLM output to a task's stream."""
+
+    def test_text_is_buffered_between_flushes(self) -> None:
+        """Pieces written within one flush interval are appended as one delta."""
+        stream, appended = writer(flush_interval=60)
+
+        stream.start()
+        for text in ["2 + 2", " is", " 4."]:
+            stream.write(text)
+        stream.end("completed")
+
+        assert appended == [
+            {"kind": "start"},
+            {"kind": "delta", "text": "2 + 2 is 4."},
+            {"kind": "end", "status": "completed"},
+        ]
+
+    def test_text_is_appended_once_the_interval_passes(self) -> None:
+        """With no interval each piece is its own delta."""
+        stream, appended = writer(flush_interval=0)
+
+        stream.start()
+        stream.write("2 + 2")
+        stream.write(" is 4.")
+
+        assert appended[1:] == [
+            {"kind": "delta", "text": "2 + 2"},
+            {"kind": "delta", "text": " is 4."},
+        ]
+
+    def test_redis_error_drops_the_rest_of_the_stream(self) -> None:
+        """After one failed append, the writer stops trying and never raises."""
+        stream, _ = writer(flush_interval=0)
+        pipe = stream.client.pipeline.return_value.__enter__.return_value
+        pipe.execute.side_effect = redis.ConnectionError("down")
+
+        with patch("shared.llm_stream.logger") as logger:
+            stream.start()
+            stream.write("text")
+            stream.end("completed")
+
+        logger.warning.assert_called_once()
+
+
+class TestAsyncLLMStreams:
+    """Tests for reading task output streams."""
+
+    async def test_read_decodes_entries(self) -> None:
+        """Entries come back with their IDs, decoded."""
+        client = MagicMock()
+        client.xread = AsyncMock(
+            return_value=[
+                [
+                    b"llm-stream:task-id",
+                    [
+                        (b"1-0", {b"kind": b"start"}),
+                        (b"1-1", {b"kind": b"delta", b"text": b"2 + 2"}),
+                    ],
+                ]
+            ]
+        )
+
+        entries = await AsyncLLMStreams(client).read("task-id", "0", timeout=1)
+
+        assert entries == [
+            LLMStreamEntry("start", id="1-0"),
+            LLMStreamEntry("delta", text="2 + 2", id="1-1"),
+        ]
+        client.xread.assert_awaited_once_with({"llm-stream:task-id": "0"}, block=1000)
+
+    async def test_read_times_out_empty(self) -> None:
+        """A read with nothing new returns no entries."""
+        client = MagicMock()
+        client.xread = AsyncMock(return_value=[])
+
+        assert await AsyncLLMStreams(client).read("task-id", "1-1", timeout=1) == []
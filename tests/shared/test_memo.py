@@ -0,0 +1,43 @@
+from unittest.mock import AsyncMock, MagicMock
+
+from shared.memo import AsyncTaskMemo, memo_key
+
+
+class TestMemoKey:
+    """Tests for the canonical key of a task's parameters."""
+
+    def test_parameter_order_does_not_matter(self) -> None:
+        """Identical parameters share a key whatever their order."""
+        assert memo_key("sum", {"a": 1, "b": 2}) == memo_key("sum", {"b": 2, "a": 1})
+
+    def test_parameter_types_matter(self) -> None:
+        """1 and 1.0 produce different outputs, so they must not share a result."""
+        assert memo_key("sum", {"a": 1, "b": 2}) != memo_key("sum", {"a": 1.0, "b": 2})
+
+    def test_task_name_matters(self) -> None:
+        """Different task types never share a result."""
+        assert memo_key("sum", {"x": 1}) != memo_key("file_hash", {"x": 1})
+
+
+class TestAsyncTaskMemo:
+    """Tests for decoding singleflight claims."""
+
+    async def test_claim_hit_returns_stored_output(self) -> None:
+        """A result stored before the claim is returned instead of running."""
+        memo = AsyncTaskMemo(MagicMock())
+        memo._claim = AsyncMock(return_value=[b"hit", b'{"result":3}'])
+
+        claim = await memo.claim("sum", {"a": 1, "b": 2}, "task-id")
+
+        assert claim.outcome == "hit"
+        assert claim.output == {"result": 3}
+
+    async def test_claim_joined_has_no_output(self) -> None:
+        """A submission joining one in flight gets no output yet."""
+        memo = AsyncTaskMemo(MagicMock())
+        memo._claim = AsyncMock(return_value=[b"joined", b""])
+
+        claim = await memo.claim("sum", {"a": 1, "b": 2}, "task-id")
+
+        assert claim.outcome == "joined"
+        assert claim.output is None
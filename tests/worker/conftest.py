@@ -0,0 +1,24 @@
+import threading
+from collections.abc import Generator
+from http.server import ThreadingHTTPServer
+
+import anthropic
+import pytest
+
+from tests.worker.stubs import StubMessagesAPI
+
+
+@pytest.fixture
+def stub_api() -> Generator[anthropic.Anthropic, None, None]:
+    """Anthropic client pointed at a local stub of the Messages API."""
+    StubMessagesAPI.calls = []
+    StubMessagesAPI.batches = {}
+    StubMessagesAPI.retrievals = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMessagesAPI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield anthropic.Anthropic(
+        api_key="test", base_url=f"http://127.0.0.1:{server.server_port}", max_retries=0
+    )
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,163 @@
+import json
+from http.server import BaseHTTPRequestHandler
+from typing import Any
+
+# Text of every stub answer, streamed in these pieces
+ANSWER_CHUNKS = ["2 + 2", " is", " 4."]
+
+
+# Batch prompts the stub answers with an error
+FAILING_PROMPT = "fail"
+
+
+def stub_message(model: str, number: int) -> dict[str, Any]:
+    """A Messages API response answering with ANSWER_CHUNKS."""
+    return {
+        "id": f"msg_{number}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": "".join(ANSWER_CHUNKS)}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 2},
+    }
+
+
+class StubMessagesAPI(BaseHTTPRequestHandler):
+    """
+    Answers like the Anthropic Messages API, counting calls.
+
+    Serves POST /v1/messages (plain or streamed) and the Message Batches
+    endpoints. A batch reports `in_progress` on its first retrieval and has
+    ended from then on.
+    """
+
+    calls: list[dict[str, Any]] = []
+    batches: dict[str, list[dict[str, Any]]] = {}
+    retrievals: dict[str, int] = {}
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/v1/messages/batches":
+            batch_id = f"msgbatch_{len(self.batches) + 1}"
+            self.batches[batch_id] = body["requests"]
+            self.retrievals[batch_id] = 0
+            self._json(self._batch(batch_id, ended=False))
+            return
+        self.calls.append(body)
+        message = stub_message(body["model"], len(self.calls))
+        if body.get("stream"):
+            self._stream(message)
+            return
+        self._json(message)
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        batch_id = parts[3]
+        if parts[-1] == "results":
+            lines = [json.dumps(self._result(request)) for request in self.batches[batch_id]]
+            self._json_lines(lines)
+            return
+        self.retrievals[batch_id] += 1
+        self._json(self._batch(batch_id, ended=self.retrievals[batch_id] > 1))
+
+    def _batch(self, batch_id: str, ended: bool) -> dict[str, Any]:
+        """A Message Batch object."""
+        host, port = self.server.server_address[:2]
+        count = len(self.batches[batch_id])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended else 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": "2025-01-01T00:00:00Z",
+            "expires_at": "2025-01-02T00:00:00Z",
+            "ended_at": "2025-01-01T00:01:00Z" if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": (
+                f"http://{host!s}:{port}/v1/messages/batches/{batch_id}/results" if ended else None
+            ),
+        }
+
+    def _result(self, request: dict[str, Any]) -> dict[str, Any]:
+        """The result line of one batch request."""
+        params = request["params"]
+        if params["messages"][0]["content"] == FAILING_PROMPT:
+            result: dict[str, Any] = {
+                "type": "errored",
+                "error": {
+                    "type": "error",
+                    "error": {"type": "invalid_request_error", "message": "prompt rejected"},
+                },
+            }
+        else:
+            result = {"type": "succeeded", "message": stub_message(params["model"], 0)}
+        return {"custom_id": request["custom_id"], "result": result}
+
+    def _json(self, body: dict[str, Any]) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _json_lines(self, lines: list[str]) -> None:
+        payload = "".join(f"{line}\n" for line in lines).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, message: dict[str, Any]) -> None:
+        """Send the message as Server-Sent Events, one text delta per chunk."""
+        usage = message["usage"]
+        events: list[dict[str, Any]] = [
+            {
+                "type": "message_start",
+                "message": {
+                    **message,
+                    "content": [],
+                    "stop_reason": None,
+                    "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 0},
+                },
+            },
+            {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            },
+            *(
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": chunk},
+                }
+                for chunk in ANSWER_CHUNKS
+            ),
+            {"type": "content_block_stop", "index": 0},
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": usage["output_tokens"]},
+            },
+            {"type": "message_stop"},
+        ]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for event in events:
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
@@ -0,0 +1,102 @@
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import pytest
+from celery.exceptions import Retry
+
+from shared.config import BatchPolicy
+from shared.models.task import TaskStatus
+from worker.batch_consumer import BatchConsumer
+from worker.celery_app import celery_app
+
+SUM_TASK = "worker.tasks.sum_task.sum_task"
+
+
+def make_message(task_name: str, **kwargs: Any) -> tuple[Any, MagicMock]:
+    """A task message body and a mock kombu message carrying Celery's headers."""
+    message = MagicMock()
+    message.headers = {"task": task_name, "id": str(uuid4()), "retries": 0}
+    message.delivery_info = {"routing_key": "celery"}
+    return ([], kwargs, {}), message
+
+
+@pytest.fixture
+def write() -> Generator[MagicMock, None, None]:
+    """The batch's single state write."""
+    with patch("worker.batch_consumer.state_writer.write") as write:
+        yield write
+
+
+class TestBatchConsumer:
+    """Tests for the micro-batching consumer."""
+
+    def test_full_batch_runs_with_one_write_and_acks(self, write: MagicMock) -> None:
+        """Reaching max_size runs the batch, writes it once and acks every message."""
+        consumer = BatchConsumer(celery_app, {"sum": BatchPolicy(max_size=3, linger_ms=1000)})
+        messages = [make_message(SUM_TASK, task_id=str(uuid4()), a=i, b=1) for i in range(3)]
+
+        for body, message in messages[:2]:
+            consumer.on_message(body, message)
+        write.assert_not_called()
+        consumer.on_message(*messages[2])
+
+        write.assert_called_once()
+        transitions = write.call_args.args[0]
+        assert len(transitions) == 3
+        assert {t.status for t in transitions} == {TaskStatus.COMPLETED}
+        assert sorted(t.task_output["result"] for t in transitions) == [1, 2, 3]
+        assert all(t.started_at is not None for t in transitions)
+        for _, message in messages:
+            message.ack.assert_called_once()
+
+    def test_failed_write_requeues_batch(self, write: MagicMock) -> None:
+        """If the state write fails no message is acked; all go back to the queue."""
+        write.side_effect = RuntimeError("db down")
+        consumer = BatchConsumer(celery_app, {"sum": BatchPolicy(max_size=2, linger_ms=1000)})
+        messages = [make_message(SUM_TASK, task_id=str(uuid4()), a=1, b=2) for _ in range(2)]
+
+        for body, message in messages:
+            consumer.on_message(body, message)
+
+        for _, message in messages:
+            message.requeue.assert_called_once()
+            message.ack.assert_not_called()
+
+    def test_linger_runs_partial_batch(self, write: MagicMock) -> None:
+        """A batch that is not full runs once its oldest message has lingered."""
+        consumer = BatchConsumer(celery_app, {"sum": BatchPolicy(max_size=100, linger_ms=0)})
+        body, message = make_message(SUM_TASK, task_id=str(uuid4()), a=1, b=2)
+
+        with patch.object(consumer, "run_batch", wraps=consumer.run_batch) as run_batch:
+            consumer.on_message(body, message)
+            run_batch.assert_not_called()
+            consumer.run_due()
+
+        write.assert_called_once()
+        message.ack.assert_called_once()
+
+    def test_unknown_task_is_rejected(self, write: MagicMock) -> None:
+        """Messages for tasks this app does not know are dropped, not held."""
+        consumer = BatchConsumer(celery_app, {})
+        body, message = make_message("worker.tasks.nope")
+
+        consumer.on_message(body, message)
+
+        message.reject.assert_called_once_with(requeue=False)
+        write.assert_not_called()
+
+    def test_failing_task_is_retried_by_its_policy(self, write: MagicMock) -> None:
+        """A failing task publishes its Celery retry and its message is acked with the batch."""
+        consumer = BatchConsumer(celery_app, {})
+        body, message = make_message(SUM_TASK, task_id=str(uuid4()), a=1, b=2)
+
+        with patch("worker.tasks.sum_task.compute_sum", side_effect=ValueError("boom")), \
+             patch("worker.tasks.sum_task.sum_task.retry", side_effect=Retry()) as retry:
+            consumer.on_message(body, message)
+
+        retry.assert_called_once()
+        assert write.call_args.args[0][0].status == TaskStatus.FAILED
+        message.ack.assert_called_once()
+
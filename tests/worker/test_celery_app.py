@@ -0,0 +1,48 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from shared.config import get_settings
+from worker.celery_app import start_metrics_exporter
+
+
+class TestMetricsExporter:
+    """Tests for serving a Celery worker's metrics."""
+
+    def test_off_without_port(self) -> None:
+        """No exporter is started unless CELERY_METRICS_PORT is set."""
+        with patch("worker.celery_app.start_http_server") as serve:
+            start_metrics_exporter()
+
+        serve.assert_not_called()
+
+    def test_single_process_serves_default_registry(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """A gevent or solo worker serves its own registry."""
+        monkeypatch.setattr(get_settings(), "celery_metrics_port", 9104)
+        monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+        with patch("worker.celery_app.start_http_server") as serve:
+            start_metrics_exporter()
+
+        serve.assert_called_once_with(9104, registry=REGISTRY)
+
+    def test_prefork_serves_aggregate_of_fresh_directory(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """With a multiprocess directory, a previous run's files are removed first."""
+        monkeypatch.setattr(get_settings(), "celery_metrics_port", 9104)
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        (tmp_path / "counter_123.db").write_bytes(b"stale")
+
+        with patch("worker.celery_app.start_http_server") as serve:
+            start_metrics_exporter()
+
+        assert list(tmp_path.iterdir()) == []
+        assert serve.call_args.kwargs["registry"] is not REGISTRY
@@ -0,0 +1,266 @@
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import anthropic
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.task import Task, TaskStatus
+from tests.worker.stubs import FAILING_PROMPT, StubMessagesAPI
+from worker.llm_batch import (
+    PROCESSING_KEY,
+    QUEUE_KEY,
+    SUBMIT_LOCK_KEY,
+    SUBMITTED_KEY,
+    LLMBatcher,
+)
+
+
+class FakePipeline:
+    """Queues commands and runs them on execute, as one transaction."""
+
+    def __init__(self, client: "FakeRedis") -> None:
+        self.client = client
+        self.commands: list[tuple[str, tuple[Any, ...]]] = []
+
+    def __enter__(self) -> "FakePipeline":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        pass
+
+    def __getattr__(self, name: str) -> Any:
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self) -> list[Any]:
+        return [getattr(self.client, name)(*args) for name, args in self.commands]
+
+
+class FakeRedis:
+    """The string, list and set commands the batcher uses, in memory."""
+
+    def __init__(self) -> None:
+        self.strings: dict[str, str] = {}
+        self.lists: dict[str, list[str]] = {}
+        self.sets: dict[str, set[str]] = {}
+
+    def pipeline(self) -> FakePipeline:
+        return FakePipeline(self)
+
+    def set(self, key: str, value: str, nx: bool = False, ex: int | None = None) -> bool:
+        if nx and key in self.strings:
+            return False
+        self.strings[key] = value
+        return True
+
+    def delete(self, key: str) -> None:
+        self.strings.pop(key, None)
+        self.lists.pop(key, None)
+
+    def rpush(self, key: str, *values: str) -> None:
+        self.lists.setdefault(key, []).extend(values)
+
+    def llen(self, key: str) -> int:
+        return len(self.lists.get(key, []))
+
+    def lmove(self, source: str, destination: str, pop: str, push: str) -> str | None:
+        items = self.lists.get(source, [])
+        if not items:
+            return None
+        value = items.pop(0 if pop == "LEFT" else -1)
+        target = self.lists.setdefault(destination, [])
+        target.insert(0 if push == "LEFT" else len(target), value)
+        return value
+
+    def sadd(self, key: str, value: str) -> None:
+        self.sets.setdefault(key, set()).add(value)
+
+    def srem(self, key: str, value: str) -> int:
+        members = self.sets.get(key, set())
+        if value not in members:
+            return 0
+        members.remove(value)
+        return 1
+
+    def smembers(self, key: str) -> "set[str]":
+        return set(self.sets.get(key, set()))
+
+
+def add_task(db_session: Session, prompt: str) -> Task:
+    task = Task(
+        task_name="query_llm",
+        task_parameters={"prompt": prompt, "max_tokens": 16, "batch": True},
+        status=TaskStatus.PENDING,
+    )
+    db_session.add(task)
+    db_session.commit()
+    db_session.refresh(task)
+    return task
+
+
+@pytest.fixture
+def redis_client() -> FakeRedis:
+    return FakeRedis()
+
+
+@pytest.fixture
+def batcher(
+    database_url: str,
+    db_session: Session,
+    redis_client: FakeRedis,
+) -> Generator[LLMBatcher, None, None]:
+    """A batcher against the test database, with its Redis and the result cache faked."""
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    sessions = sessionmaker(bind=engine)
+    with patch("worker.llm_batch.SessionLocal", sessions), \
+         patch("worker.state_writer.SessionLocal", sessions), \
+         patch("worker.state_writer.state_writer.cache"):
+        yield LLMBatcher(redis_client, max_requests=2)  # type: ignore[arg-type]
+    engine.dispose()
+
+
+class TestLLMBatcher:
+    """Tests for running batch-mode prompts as Message Batches, against a stub API."""
+
+    def test_batch_is_submitted_polled_and_fanned_out(
+        self,
+        batcher: LLMBatcher,
+        db_session: Session,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """Queued prompts go out in one batch and its results land on each task."""
+        ok = add_task(db_session, "What is 2+2?")
+        failing = add_task(db_session, FAILING_PROMPT)
+        batcher.collect([str(ok.id), str(failing.id)])
+
+        assert batcher.submit(stub_api) == 2
+
+        [requests] = StubMessagesAPI.batches.values()
+        assert {request["custom_id"] for request in requests} == {str(ok.id), str(failing.id)}
+        db_session.refresh(ok)
+        assert ok.status == TaskStatus.RUNNING
+
+        # Still in progress on the first poll
+        assert batcher.poll(stub_api) == 0
+        assert batcher.poll(stub_api) == 2
+
+        db_session.refresh(ok)
+        db_session.refresh(failing)
+        assert ok.status == TaskStatus.COMPLETED
+        assert ok.task_output["response"] == "2 + 2 is 4."
+        assert failing.status == TaskStatus.FAILED
+        assert failing.error == "prompt rejected"
+        assert StubMessagesAPI.calls == []
+
+    def test_submission_is_capped_at_max_requests(
+        self,
+        batcher: LLMBatcher,
+        db_session: Session,
+        redis_client: FakeRedis,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """A batch takes at most `max_requests` prompts; the rest wait their turn."""
+        tasks = [add_task(db_session, f"prompt {i}") for i in range(3)]
+        batcher.collect([str(task.id) for task in tasks])
+
+        assert batcher.submit(stub_api) == 2
+        assert redis_client.lists[QUEUE_KEY] == [str(tasks[2].id)]
+        assert redis_client.llen(PROCESSING_KEY) == 0
+        assert SUBMIT_LOCK_KEY not in redis_client.strings
+
+    def test_failed_submission_requeues_in_order(
+        self,
+        batcher: LLMBatcher,
+        db_session: Session,
+        redis_client: FakeRedis,
+    ) -> None:
+        """Prompts of a batch that could not be created go back to the front of the queue."""
+        tasks = [add_task(db_session, f"prompt {i}") for i in range(2)]
+        task_ids = [str(task.id) for task in tasks]
+        batcher.collect(task_ids)
+        llm = MagicMock()
+        llm.messages.batches.create.side_effect = anthropic.APIConnectionError(
+            request=MagicMock()
+        )
+
+        with pytest.raises(anthropic.APIConnectionError):
+            batcher.submit(llm)
+
+        assert redis_client.lists[QUEUE_KEY] == task_ids
+        assert redis_client.llen(PROCESSING_KEY) == 0
+        assert SUBMITTED_KEY not in redis_client.sets
+
+    def test_abandoned_submission_is_requeued_first(
+        self,
+        batcher: LLMBatcher,
+        db_session: Session,
+        redis_client: FakeRedis,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """Prompts a crashed submission took are submitted again, ahead of newer ones."""
+        tasks = [add_task(db_session, f"prompt {i}") for i in range(3)]
+        redis_client.rpush(PROCESSING_KEY, str(tasks[0].id), str(tasks[1].id))
+        batcher.collect([str(tasks[2].id)])
+
+        assert batcher.submit(stub_api) == 2
+
+        [requests] = StubMessagesAPI.batches.values()
+        assert {request["custom_id"] for request in requests} == {
+            str(tasks[0].id),
+            str(tasks[1].id),
+        }
+        assert redis_client.lists[QUEUE_KEY] == [str(tasks[2].id)]
+        assert redis_client.llen(PROCESSING_KEY) == 0
+
+    def test_overlapping_submission_takes_nothing(
+        self,
+        batcher: LLMBatcher,
+        db_session: Session,
+        redis_client: FakeRedis,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """While a submission runs, its processing list is not mistaken for an abandoned one."""
+        task = add_task(db_session, "prompt")
+        batcher.collect([str(task.id)])
+        redis_client.set(SUBMIT_LOCK_KEY, "1")
+
+        assert batcher.submit(stub_api) == 0
+
+        assert redis_client.lists[QUEUE_KEY] == [str(task.id)]
+        assert StubMessagesAPI.batches == {}
+
+    def test_tasks_no_longer_pending_are_skipped(
+        self,
+        batcher: LLMBatcher,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """Unknown or already finished tasks never reach the API."""
+        batcher.collect([str(uuid4())])
+
+        assert batcher.submit(stub_api) == 1
+        assert StubMessagesAPI.batches == {}
+
+
+class TestDispatchBatched:
+    """Tests for routing batch-mode prompts at dispatch."""
+
+    def test_batched_prompts_are_queued_not_published(self) -> None:
+        """Only non-batch tasks become Celery messages."""
+        from worker.tasks import dispatch_tasks
+
+        tasks: list[tuple[str, str, dict[str, Any], str]] = [
+            ("1", "query_llm", {"prompt": "a", "max_tokens": 16, "batch": True}, "normal"),
+            ("2", "query_llm", {"prompt": "b", "max_tokens": 16}, "normal"),
+            ("3", "query_llm", {"prompt": "c", "max_tokens": 16, "batch": True}, "normal"),
+        ]
+        with patch("worker.llm_batch.llm_batcher.collect") as collect, \
+             patch("worker.tasks.llm_task.llm_task.apply_async") as apply_async:
+            errors = dispatch_tasks(tasks)
+
+        assert errors == [None, None, None]
+        collect.assert_called_once_with(["1", "3"])
+        apply_async.assert_called_once()
+        assert apply_async.call_args.kwargs["args"] == ("2",)
@@ -0,0 +1,170 @@
+import threading
+import time
+from typing import Any
+
+import anthropic
+import pytest
+from prometheus_client import REGISTRY
+
+from shared.memo import LOOKUP_SCRIPT
+from tests.worker.stubs import StubMessagesAPI
+from worker.llm_cache import LLMResponseCache, llm_cache_key
+from worker.tasks.llm_task import query_messages_api
+
+
+class FakeRedis:
+    """The few Redis commands the LLM cache uses, in memory."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, Any] = {}
+        self.renewed: list[str] = []
+
+    def register_script(self, script: str) -> Any:
+        return self._lookup if script == LOOKUP_SCRIPT else self._store
+
+    def _lookup(self, keys: list[str], args: list[Any]) -> Any:
+        return self.data.get(keys[0])
+
+    def _store(self, keys: list[str], args: list[Any]) -> list[Any]:
+        self.data[keys[0]] = args[0]
+        self.data.pop(keys[1], None)
+        return [[], 0]
+
+    def set(self, key: str, value: str, nx: bool = False, ex: int | None = None) -> bool | None:
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def exists(self, key: str) -> int:
+        return int(key in self.data)
+
+    def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        self.renewed.append(key)
+        return key in self.data
+
+
+@pytest.fixture
+def redis_client() -> FakeRedis:
+    return FakeRedis()
+
+
+@pytest.fixture
+def llm_cache(redis_client: FakeRedis) -> LLMResponseCache:
+    return LLMResponseCache(redis_client, ttl=60, max_entries=10, coalesce_timeout=2)  # type: ignore[arg-type]
+
+
+def ask(llm_cache: LLMResponseCache, client: anthropic.Anthropic, max_tokens: int = 16) -> Any:
+    return llm_cache.get_or_call(
+        "stub-model",
+        "What is 2+2?",
+        max_tokens,
+        lambda: query_messages_api(client, "stub-model", "What is 2+2?", max_tokens),
+    )
+
+
+class TestLLMResponseCache:
+    """Tests for caching and coalescing LLM calls, against a stub Messages API."""
+
+    def test_repeated_prompt_calls_upstream_once(
+        self,
+        llm_cache: LLMResponseCache,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """The second identical prompt is served from the cache, saving its tokens."""
+        saved_before = REGISTRY.get_sample_value(
+            "tasker_llm_tokens_saved_total", {"kind": "input"}
+        ) or 0.0
+
+        first = ask(llm_cache, stub_api)
+        second = ask(llm_cache, stub_api)
+
+        assert second == first
+        assert first["response"] == "2 + 2 is 4."
+        assert len(StubMessagesAPI.calls) == 1
+        saved = REGISTRY.get_sample_value("tasker_llm_tokens_saved_total", {"kind": "input"})
+        assert saved == saved_before + 10
+
+    def test_max_tokens_is_part_of_the_key(
+        self,
+        llm_cache: LLMResponseCache,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """The same prompt with another max_tokens is a separate call."""
+        ask(llm_cache, stub_api, max_tokens=16)
+        ask(llm_cache, stub_api, max_tokens=32)
+
+        assert len(StubMessagesAPI.calls) == 2
+
+    def test_identical_in_flight_prompt_is_coalesced(
+        self,
+        llm_cache: LLMResponseCache,
+        redis_client: FakeRedis,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """A prompt already being answered waits for that response instead of calling."""
+        key = llm_cache_key("stub-model", "What is 2+2?", 16)
+        redis_client.set(f"{key}:inflight", "1")
+        response = {"response": "4", "model": "stub-model", "usage": {}}
+
+        def answer() -> None:
+            time.sleep(0.1)
+            llm_cache.store(key, response)
+
+        threading.Thread(target=answer).start()
+
+        assert ask(llm_cache, stub_api) == response
+        assert StubMessagesAPI.calls == []
+
+    def test_failed_call_releases_its_claim(
+        self,
+        llm_cache: LLMResponseCache,
+        redis_client: FakeRedis,
+    ) -> None:
+        """A failed upstream call lets waiting workers take over at once."""
+
+        def fail() -> dict[str, Any]:
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            llm_cache.get_or_call("stub-model", "hi", 16, fail)
+
+        assert redis_client.data == {}
+
+    def test_claim_is_renewed_during_a_long_call(
+        self,
+        redis_client: FakeRedis,
+    ) -> None:
+        """A call outlasting the claim TTL keeps its claim, so no one else makes it."""
+        llm_cache = LLMResponseCache(
+            redis_client,  # type: ignore[arg-type]
+            ttl=60,
+            max_entries=10,
+            coalesce_timeout=0,
+        )
+        key = llm_cache_key("stub-model", "hi", 16)
+
+        def slow() -> dict[str, Any]:
+            time.sleep(0.7)
+            return {"response": "hello", "usage": {}}
+
+        llm_cache.get_or_call("stub-model", "hi", 16, slow)
+
+        assert redis_client.renewed == [f"{key}:inflight"]
+        assert f"{key}:inflight" not in redis_client.data
+
+    def test_disabled_cache_always_calls_upstream(
+        self,
+        redis_client: FakeRedis,
+        stub_api: anthropic.Anthropic,
+    ) -> None:
+        """With no TTL configured the cache is bypassed."""
+        disabled = LLMResponseCache(redis_client, ttl=0, max_entries=10, coalesce_timeout=2)  # type: ignore[arg-type]
+
+        ask(disabled, stub_api)
+        ask(disabled, stub_api)
+
+        assert len(StubMessagesAPI.calls) == 2
@@ -0,0 +1,39 @@
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+
+from worker import llm_client
+from worker.llm_client import close_llm_client, get_llm_client, reset_llm_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_client() -> Generator[None, None, None]:
+    reset_llm_client()
+    yield
+    close_llm_client()
+
+
+class TestLLMClient:
+    """Tests for the per-process pooled Anthropic client."""
+
+    def test_client_is_reused_across_tasks(self) -> None:
+        """Every task in a process shares one client and its connection pool."""
+        assert get_llm_client() is get_llm_client()
+
+    def test_forked_process_gets_its_own_client(self) -> None:
+        """A pool process never reuses the connections it inherited."""
+        parent = get_llm_client()
+
+        with patch.object(llm_client.os, "getpid", return_value=-1):
+            child = get_llm_client()
+
+        assert child is not parent
+
+    def test_process_init_drops_inherited_client(self) -> None:
+        """The worker_process_init handler forces a new client."""
+        before = get_llm_client()
+
+        reset_llm_client()
+
+        assert get_llm_client() is not before
@@ -0,0 +1,137 @@
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import anthropic
+import httpx
+import pytest
+import redis
+from prometheus_client import REGISTRY
+
+from worker.llm_limiter import LimiterTimeoutError, LLMRateLimiter, estimate_tokens
+
+RESPONSE = {
+    "response": "4",
+    "model": "stub-model",
+    "usage": {"input_tokens": 10, "output_tokens": 2},
+}
+
+
+@pytest.fixture
+def limiter() -> LLMRateLimiter:
+    """An enabled limiter whose Lua scripts are mocks."""
+    limiter = LLMRateLimiter(
+        MagicMock(),
+        enabled=True,
+        requests_per_minute=50,
+        tokens_per_minute=40_000,
+        max_concurrency=2,
+        max_wait=5.0,
+    )
+    limiter._acquire = MagicMock(return_value="0")
+    limiter._release = MagicMock()
+    limiter._observe = MagicMock()
+    return limiter
+
+
+def rate_limit_error() -> anthropic.RateLimitError:
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    return anthropic.RateLimitError(
+        "rate limited", response=httpx.Response(429, request=request), body=None
+    )
+
+
+class TestLLMRateLimiter:
+    """Tests for the shared LLM rate limiter, with its Redis scripts mocked."""
+
+    def test_acquire_waits_for_capacity(self, limiter: LLMRateLimiter) -> None:
+        """A call waits as long as the bucket asks, and the wait is recorded."""
+        limiter._acquire.side_effect = ["0.2", "0"]  # type: ignore[attr-defined]
+        count_before = REGISTRY.get_sample_value("tasker_llm_limiter_wait_seconds_count") or 0.0
+
+        with patch("worker.llm_limiter.time.sleep") as sleep:
+            lease = limiter.acquire(100)
+
+        assert lease is not None
+        sleep.assert_called_once()
+        assert 0.2 <= sleep.call_args.args[0] <= 0.22
+        count = REGISTRY.get_sample_value("tasker_llm_limiter_wait_seconds_count")
+        assert count == count_before + 1
+
+    def test_acquire_gives_up_after_max_wait(self, limiter: LLMRateLimiter) -> None:
+        """A wait longer than the maximum is handed back to Celery as an error."""
+        limiter._acquire.return_value = "30"  # type: ignore[attr-defined]
+
+        with pytest.raises(LimiterTimeoutError):
+            limiter.acquire(100)
+
+    def test_call_settles_actual_usage(self, limiter: LLMRateLimiter) -> None:
+        """Tokens reserved beyond the response's usage are given back."""
+        estimated = estimate_tokens("What is 2+2?", 16)
+
+        assert limiter.call(estimated, lambda: RESPONSE) == RESPONSE
+
+        args = limiter._release.call_args.kwargs["args"]  # type: ignore[attr-defined]
+        assert args[3] == estimated - 12
+
+    def test_rate_limited_call_is_retried_in_place(self, limiter: LLMRateLimiter) -> None:
+        """A 429 releases its lease and the call is made again once capacity is back."""
+        outcomes: list[Any] = [rate_limit_error(), RESPONSE]
+
+        def call() -> dict[str, Any]:
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome  # type: ignore[no-any-return]
+
+        assert limiter.call(100, call) == RESPONSE
+        assert limiter._acquire.call_count == 2  # type: ignore[attr-defined]
+        assert limiter._release.call_count == 2  # type: ignore[attr-defined]
+
+    def test_repeated_rate_limits_are_raised(self, limiter: LLMRateLimiter) -> None:
+        """After a few 429s in a row the error goes to Celery's retry."""
+
+        def call() -> dict[str, Any]:
+            raise rate_limit_error()
+
+        with pytest.raises(anthropic.RateLimitError):
+            limiter.call(100, call)
+
+        assert limiter._acquire.call_count == 3  # type: ignore[attr-defined]
+
+    def test_observe_learns_limits_from_headers(self, limiter: LLMRateLimiter) -> None:
+        """Rate-limit headers are passed on; retry-after only counts on a 429."""
+        request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+        headers = {
+            "anthropic-ratelimit-requests-limit": "1000",
+            "anthropic-ratelimit-tokens-remaining": "79000",
+            "retry-after": "7",
+        }
+
+        limiter.observe(httpx.Response(200, headers=headers, request=request))
+        limiter.observe(httpx.Response(429, headers=headers, request=request))
+
+        first, second = limiter._observe.call_args_list  # type: ignore[attr-defined]
+        assert first.kwargs["args"][2:] == ["1000.0", "", "", "79000.0", ""]
+        assert second.kwargs["args"][2:] == ["1000.0", "", "", "79000.0", "7.0"]
+
+    def test_observe_ignores_responses_without_headers(self, limiter: LLMRateLimiter) -> None:
+        """Responses that carry no rate-limit information cost no Redis round trip."""
+        request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+
+        limiter.observe(httpx.Response(200, request=request))
+
+        limiter._observe.assert_not_called()  # type: ignore[attr-defined]
+
+    def test_redis_failure_calls_without_limit(self, limiter: LLMRateLimiter) -> None:
+        """An unreachable Redis never blocks LLM calls."""
+        limiter._acquire.side_effect = redis.ConnectionError("down")  # type: ignore[attr-defined]
+
+        assert limiter.call(100, lambda: RESPONSE) == RESPONSE
+        limiter._release.assert_not_called()  # type: ignore[attr-defined]
+
+    def test_disabled_limiter_calls_straight_through(self, limiter: LLMRateLimiter) -> None:
+        """With rate limiting off, Redis is not touched."""
+        limiter.enabled = False
+
+        assert limiter.call(100, lambda: RESPONSE) == RESPONSE
+        limiter._acquire.assert_not_called()  # type: ignore[attr-defined]
@@ -0,0 +1,175 @@
+from collections.abc import Generator
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.config import MemoPolicy, get_settings
+from shared.models.task import Task, TaskStatus
+from worker.memo import recover_waiters, settle_memoized
+
+
+def add_task(db_session: Session, status: str, **columns: object) -> Task:
+    task = Task(task_name="sum", task_parameters={"a": 1, "b": 2}, status=status, **columns)
+    db_session.add(task)
+    db_session.commit()
+    db_session.refresh(task)
+    return task
+
+
+@pytest.fixture
+def task_memo(
+    database_url: str,
+    db_session: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Generator[MagicMock, None, None]:
+    """Memoize sum against the test database, with Redis mocked out."""
+    monkeypatch.setattr(get_settings(), "memo_policies", {"sum": MemoPolicy()})
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    with patch("worker.memo.SessionLocal", sessionmaker(bind=engine)), \
+         patch("worker.memo.cache"), \
+         patch("worker.memo.task_memo") as mock_memo:
+        yield mock_memo
+    engine.dispose()
+
+
+class TestSettleMemoized:
+    """Tests for handing a memoized task's outcome to identical waiting submissions."""
+
+    def test_completed_task_completes_its_waiters(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+    ) -> None:
+        """Waiters get the leader's output without running."""
+        leader = add_task(db_session, TaskStatus.COMPLETED, task_output={"result": 3})
+        waiter = add_task(db_session, TaskStatus.PENDING)
+        task_memo.complete.return_value = [str(waiter.id)]
+
+        settle_memoized([leader])
+
+        task_memo.complete.assert_called_once()
+        db_session.refresh(waiter)
+        assert waiter.status == TaskStatus.COMPLETED
+        assert waiter.task_output == {"result": 3}
+
+    def test_failed_leader_dispatches_its_waiters(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+    ) -> None:
+        """Waiters of a failed execution run on their own."""
+        leader = add_task(db_session, TaskStatus.FAILED, error="boom")
+        task_memo.release.return_value = ["waiter-id"]
+
+        with patch("worker.tasks.dispatch_tasks") as dispatch:
+            settle_memoized([leader])
+
+        dispatch.assert_called_once_with([("waiter-id", "sum", {"a": 1, "b": 2}, "normal")])
+
+    def test_failed_leader_hands_waiters_back_to_postgres_queue(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """With the Postgres backend, held waiters become claimable instead of being published."""
+        monkeypatch.setattr(get_settings(), "queue_backend", "postgres")
+        leader = add_task(db_session, TaskStatus.FAILED, error="boom")
+        waiter = add_task(db_session, TaskStatus.PENDING, held_at=datetime.now(UTC))
+        task_memo.release.return_value = [str(waiter.id)]
+
+        with patch("worker.tasks.dispatch_tasks") as dispatch:
+            settle_memoized([leader])
+
+        dispatch.assert_not_called()
+        db_session.refresh(waiter)
+        assert waiter.status == TaskStatus.PENDING
+        assert waiter.held_at is None
+
+    def test_failed_leader_dispatches_before_releasing(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+    ) -> None:
+        """A waiter whose publish failed stays held, for the recovery sweep to retry."""
+        leader = add_task(db_session, TaskStatus.FAILED, error="boom")
+        waiter = add_task(db_session, TaskStatus.PENDING, held_at=datetime.now(UTC))
+        task_memo.release.return_value = [str(waiter.id)]
+
+        with patch("worker.tasks.dispatch_tasks", return_value=[ConnectionError("down")]):
+            settle_memoized([leader])
+
+        db_session.refresh(waiter)
+        assert waiter.held_at is not None
+
+
+class TestRecoverWaiters:
+    """Tests for releasing held submissions whose execution was lost."""
+
+    def test_waiter_of_lost_execution_is_dispatched(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+    ) -> None:
+        """With no claimed execution left, a waiter runs on its own at its own priority."""
+        waiter = add_task(
+            db_session, TaskStatus.PENDING, held_at=datetime.now(UTC), priority="high"
+        )
+        task_memo.in_flight.return_value = [False]
+
+        with patch("worker.tasks.dispatch_tasks", return_value=[None]) as dispatch:
+            assert recover_waiters() == 1
+
+        dispatch.assert_called_once_with([(str(waiter.id), "sum", {"a": 1, "b": 2}, "high")])
+        db_session.refresh(waiter)
+        assert waiter.held_at is None
+
+    def test_waiter_of_running_execution_is_kept(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+    ) -> None:
+        """A waiter whose execution is still claimed keeps waiting."""
+        waiter = add_task(db_session, TaskStatus.PENDING, held_at=datetime.now(UTC))
+        task_memo.in_flight.return_value = [True]
+
+        with patch("worker.tasks.dispatch_tasks") as dispatch:
+            assert recover_waiters() == 0
+
+        dispatch.assert_not_called()
+        db_session.refresh(waiter)
+        assert waiter.held_at is not None
+
+    def test_waiter_held_past_inflight_ttl_is_released(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Past the in-flight TTL its waiters list has expired, even if a newer claim exists."""
+        monkeypatch.setattr(get_settings(), "queue_backend", "postgres")
+        waiter = add_task(
+            db_session, TaskStatus.PENDING, held_at=datetime.now(UTC) - timedelta(hours=1)
+        )
+        task_memo.in_flight.return_value = [True]
+
+        assert recover_waiters() == 1
+
+        db_session.refresh(waiter)
+        assert waiter.held_at is None
+
+    def test_unmemoized_task_is_ignored(
+        self,
+        task_memo: MagicMock,
+        db_session: Session,
+    ) -> None:
+        """Task types without a memo policy never touch Redis."""
+        task = add_task(db_session, TaskStatus.COMPLETED, task_output={"result": 3})
+        task.task_name = "file_hash"
+
+        settle_memoized([task])
+
+        task_memo.complete.assert_not_called()
@@ -0,0 +1,103 @@
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.task import Task, TaskOutbox, TaskStatus
+from worker.outbox_relay import OutboxRelay
+
+
+@pytest.fixture
+def outbox_tasks(db_session: Session) -> list[Task]:
+    """Two pending sum tasks, each committed with its outbox entry."""
+    tasks = [
+        Task(task_name="sum", task_parameters={"a": i, "b": 1}, status=TaskStatus.PENDING)
+        for i in range(2)
+    ]
+    db_session.add_all(tasks)
+    db_session.flush()
+    db_session.add_all([TaskOutbox(task_id=task.id) for task in tasks])
+    db_session.commit()
+    return tasks
+
+
+@pytest.fixture
+def relay(database_url: str) -> Generator[OutboxRelay, None, None]:
+    """Relay against the test database, with Redis side effects mocked."""
+    engine = create_engine(database_url)
+    with patch("worker.outbox_relay.SessionLocal", sessionmaker(bind=engine)), \
+         patch("worker.outbox_relay.cache_task_state"), \
+         patch("worker.outbox_relay.publish_task_event"), \
+         patch("worker.outbox_relay.settle_memoized"):
+        yield OutboxRelay(batch_size=100, poll_interval=0, max_attempts=2)
+    engine.dispose()
+
+
+def outbox(db_session: Session) -> list[TaskOutbox]:
+    """The entries currently in the outbox."""
+    db_session.expire_all()
+    return list(db_session.scalars(select(TaskOutbox)).all())
+
+
+class TestOutboxRelay:
+    """Tests for publishing outbox entries."""
+
+    def test_batch_is_published_and_removed(
+        self,
+        relay: OutboxRelay,
+        outbox_tasks: list[Task],
+        db_session: Session,
+    ) -> None:
+        """Entries are published in one dispatch call and removed once published."""
+        with patch("worker.outbox_relay.dispatch_tasks", return_value=[None, None]) as dispatch:
+            assert relay.relay_batch() == 2
+
+        dispatch.assert_called_once_with(
+            [(str(task.id), "sum", task.task_parameters, "normal") for task in outbox_tasks]
+        )
+        assert outbox(db_session) == []
+
+    def test_failed_publish_is_redelivered(
+        self,
+        relay: OutboxRelay,
+        outbox_tasks: list[Task],
+        db_session: Session,
+    ) -> None:
+        """An entry that fails to publish stays in the outbox for the next batch."""
+        with patch(
+            "worker.outbox_relay.dispatch_tasks", return_value=[None, ConnectionError("down")]
+        ):
+            relay.relay_batch()
+        with patch("worker.outbox_relay.dispatch_tasks", return_value=[None]) as dispatch:
+            relay.relay_batch()
+
+        assert dispatch.call_args.args[0][0][0] == str(outbox_tasks[1].id)
+        assert outbox(db_session) == []
+
+    def test_entry_is_abandoned_after_max_attempts(
+        self,
+        relay: OutboxRelay,
+        outbox_tasks: list[Task],
+        db_session: Session,
+    ) -> None:
+        """Past max_attempts, the entry is dropped and its task failed like a failed dispatch."""
+        failing = MagicMock(side_effect=lambda tasks: [ConnectionError("down")] * len(tasks))
+        with patch("worker.outbox_relay.dispatch_tasks", failing):
+            relay.relay_batch()
+            assert [entry.attempts for entry in outbox(db_session)] == [1, 1]
+            relay.relay_batch()
+
+        assert outbox(db_session) == []
+        for task in outbox_tasks:
+            db_session.refresh(task)
+            assert task.status == TaskStatus.FAILED
+            assert "Failed to dispatch task to worker: down" in (task.error or "")
+
+    def test_empty_outbox_publishes_nothing(self, relay: OutboxRelay, db_session: Session) -> None:
+        """Without entries, nothing reaches the broker."""
+        with patch("worker.outbox_relay.dispatch_tasks") as dispatch:
+            assert relay.relay_batch() == 0
+
+        dispatch.assert_not_called()
@@ -0,0 +1,156 @@
+import time
+from collections.abc import Generator
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.task import Task, TaskPriority, TaskStatus
+from worker.pg_consumer import PostgresQueueConsumer
+
+
+def add_task(db_session: Session, task_name: str = "sum", **columns: object) -> Task:
+    parameters = {"a": 1, "b": 2} if task_name == "sum" else {"prompt": "Hello"}
+    task = Task(task_name=task_name, **{"task_parameters": parameters, **columns})
+    db_session.add(task)
+    db_session.commit()
+    db_session.refresh(task)
+    return task
+
+
+@pytest.fixture
+def write() -> Generator[MagicMock, None, None]:
+    """The batch's single state write."""
+    with patch("worker.pg_consumer.state_writer.write") as write:
+        yield write
+
+
+@pytest.fixture
+def consumer(database_url: str) -> Generator[PostgresQueueConsumer, None, None]:
+    """Consumer claiming from the test database."""
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    with patch("worker.pg_consumer.SessionLocal", sessionmaker(bind=engine)):
+        yield PostgresQueueConsumer(batch_size=2, poll_interval=0, visibility_timeout=60)
+    engine.dispose()
+
+
+def status(db_session: Session, task: Task) -> str:
+    db_session.refresh(task)
+    return task.status
+
+
+class TestPostgresQueueConsumer:
+    """Tests for claiming tasks from the tasks table."""
+
+    def test_claim_runs_batch_with_one_write(
+        self,
+        consumer: PostgresQueueConsumer,
+        db_session: Session,
+        write: MagicMock,
+    ) -> None:
+        """Claiming marks the batch running; the tasks then finish in a single write."""
+        tasks = [add_task(db_session, task_parameters={"a": i, "b": 1}) for i in range(2)]
+
+        assert consumer.claim_batch() == 2
+
+        assert [status(db_session, task) for task in tasks] == [TaskStatus.RUNNING] * 2
+        write.assert_called_once()
+        transitions = write.call_args.args[0]
+        assert {t.status for t in transitions} == {TaskStatus.COMPLETED}
+        assert sorted(t.task_output["result"] for t in transitions) == [1, 2]
+
+    def test_claims_by_priority_then_age(
+        self,
+        consumer: PostgresQueueConsumer,
+        db_session: Session,
+        write: MagicMock,
+    ) -> None:
+        """High priority tasks are claimed first, older ones before newer."""
+        now = datetime.now(UTC)
+        low = add_task(db_session, priority=TaskPriority.LOW, created_at=now - timedelta(seconds=2))
+        newer = add_task(db_session, created_at=now)
+        older = add_task(db_session, created_at=now - timedelta(seconds=1))
+        high = add_task(db_session, priority=TaskPriority.HIGH, created_at=now)
+
+        consumer.claim_batch()
+
+        claimed = [t.task_id for t in write.call_args.args[0]]
+        assert claimed == [str(high.id), str(older.id)]
+        assert status(db_session, newer) == status(db_session, low) == TaskStatus.PENDING
+
+    def test_skips_held_and_celery_tasks(
+        self,
+        consumer: PostgresQueueConsumer,
+        db_session: Session,
+        write: MagicMock,
+    ) -> None:
+        """Submissions held for a memoized execution and query_llm tasks are never claimed."""
+        add_task(db_session, held_at=datetime.now(UTC))
+        add_task(db_session, "query_llm")
+
+        assert consumer.claim_batch() == 0
+
+        write.assert_not_called()
+
+    def test_failure_is_final(
+        self,
+        consumer: PostgresQueueConsumer,
+        db_session: Session,
+        write: MagicMock,
+    ) -> None:
+        """A failing task is failed in the batch's write, without a Celery retry."""
+        task = add_task(db_session)
+
+        with patch("worker.tasks.sum_task.compute_sum", side_effect=ValueError("boom")), \
+             patch("worker.tasks.sum_task.sum_task.apply_async") as publish:
+            consumer.claim_batch()
+
+        publish.assert_not_called()
+        [transition] = write.call_args.args[0]
+        assert transition.task_id == str(task.id)
+        assert transition.status == TaskStatus.FAILED
+        assert transition.error == "boom"
+
+    def test_stale_claims_are_requeued(
+        self,
+        consumer: PostgresQueueConsumer,
+        db_session: Session,
+    ) -> None:
+        """A task running past the visibility timeout goes back to pending."""
+        stale = add_task(
+            db_session,
+            status=TaskStatus.RUNNING,
+            started_at=datetime.now(UTC) - timedelta(minutes=5),
+        )
+        fresh = add_task(db_session, status=TaskStatus.RUNNING, started_at=datetime.now(UTC))
+
+        assert consumer.requeue_stale() == 1
+
+        assert status(db_session, stale) == TaskStatus.PENDING
+        assert stale.started_at is None
+        assert status(db_session, fresh) == TaskStatus.RUNNING
+
+    def test_long_batch_keeps_its_claims(
+        self,
+        consumer: PostgresQueueConsumer,
+        db_session: Session,
+        write: MagicMock,
+    ) -> None:
+        """A batch running past the visibility timeout is refreshed, not requeued."""
+        add_task(db_session)
+        consumer.visibility_timeout = 0.3
+        requeued: list[int] = []
+
+        def slow_sum(a: int, b: int) -> dict[str, int]:
+            time.sleep(0.6)
+            requeued.append(consumer.requeue_stale())
+            return {"result": a + b}
+
+        with patch("worker.tasks.sum_task.compute_sum", side_effect=slow_sum):
+            consumer.claim_batch()
+
+        assert requeued == [0]
+        [transition] = write.call_args.args[0]
+        assert transition.status == TaskStatus.COMPLETED
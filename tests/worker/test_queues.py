@@ -0,0 +1,107 @@
+import time
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import pytest
+from prometheus_client import REGISTRY
+
+from worker.celery_app import celery_app
+from worker.queues import (
+    PUBLISHED_AT_HEADER,
+    observe_queue_wait,
+    stamp_published_at,
+    update_queue_depths,
+)
+
+
+def waited(queue: str) -> float:
+    """Total seconds recorded by tasker_queue_wait_seconds for a queue so far."""
+    return REGISTRY.get_sample_value("tasker_queue_wait_seconds_sum", {"queue": queue}) or 0.0
+
+
+class TestRouting:
+    """Tests for the per-task-type queues."""
+
+    @pytest.mark.parametrize(
+        ("task_name", "queue"),
+        [
+            ("worker.tasks.sum_task.sum_task", "sum"),
+            ("worker.tasks.sum_task.sum_batch_task", "sum"),
+            ("worker.tasks.hash_task.hash_task", "file_hash"),
+            ("worker.tasks.vector_task.vector_task", "vector_op"),
+            ("worker.tasks.llm_task.llm_task", "query_llm"),
+            ("worker.tasks.llm_batch_task.poll_llm_batches", "query_llm"),
+            ("worker.tasks.memo_task.recover_memo_waiters", "sum"),
+        ],
+    )
+    def test_task_is_routed_to_its_type_queue(self, task_name: str, queue: str) -> None:
+        """Each task type has its own queue, so slow types never block fast ones."""
+        assert celery_app.amqp.router.route({}, task_name)["queue"].name == queue
+
+    def test_sums_are_batched_per_priority(self) -> None:
+        """With sum batching on, sums of different priorities never share a message."""
+        from worker.tasks import dispatch_tasks
+
+        sums = [
+            (str(uuid4()), "sum", {"a": i, "b": 1}, priority)
+            for i, priority in enumerate(["high", "low", "high", "low"])
+        ]
+        with patch("worker.tasks.settings.sum_batching", True), \
+             patch("worker.tasks.sum_task.sum_batch_task.apply_async") as mock_batch:
+            errors = dispatch_tasks(sums)
+
+        assert errors == [None] * 4
+        sent = {
+            call.kwargs["priority"]: [task_id for task_id, _, _ in call.kwargs["args"][0]]
+            for call in mock_batch.call_args_list
+        }
+        assert sent == {0: [sums[0][0], sums[2][0]], 6: [sums[1][0], sums[3][0]]}
+
+
+class TestQueueMetrics:
+    """Tests for queue depth and wait time."""
+
+    def test_published_message_is_stamped(self) -> None:
+        """Publishing records the time in a message header."""
+        headers: dict[str, object] = {}
+
+        stamp_published_at(headers=headers)
+
+        assert isinstance(headers[PUBLISHED_AT_HEADER], float)
+
+    def test_wait_is_observed_from_publish(self) -> None:
+        """The wait runs from the publish to the task's start, labelled by queue."""
+        task = MagicMock()
+        task.request.get.return_value = time.time() - 2
+        task.request.eta = None
+        task.request.delivery_info = {"routing_key": "file_hash"}
+        before = waited("file_hash")
+
+        observe_queue_wait(task=task)
+
+        assert 2 <= waited("file_hash") - before < 3
+
+    def test_retry_countdown_is_not_counted(self) -> None:
+        """A retry waits from its ETA, not from when it was republished."""
+        task = MagicMock()
+        task.request.get.return_value = time.time() - 10
+        task.request.eta = (datetime.now(UTC) - timedelta(seconds=1)).isoformat()
+        task.request.delivery_info = {"routing_key": "sum"}
+        before = waited("sum")
+
+        observe_queue_wait(task=task)
+
+        assert 1 <= waited("sum") - before < 2
+
+    def test_queue_depths_are_sampled(self) -> None:
+        """Each task queue's waiting messages are read from the broker into the gauge."""
+        connection = MagicMock()
+        connection.default_channel.queue_declare.side_effect = lambda queue: (queue, 7, 0)
+        app = MagicMock()
+        app.connection_for_read.return_value.__enter__.return_value = connection
+
+        update_queue_depths(app)
+
+        connection.ensure_connection.assert_called_once_with(max_retries=1)
+        assert REGISTRY.get_sample_value("tasker_queue_depth", {"queue": "query_llm"}) == 7
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections.abc import Generator
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from shared.models.task import Task, TaskStatus
+from worker.state_writer import TaskStateWriter, TaskTransition
+
+
+@pytest.fixture
+def pending_task(db_session: Session) -> Task:
+    task = Task(task_name="sum", task_parameters={"a": 1, "b": 2}, status=TaskStatus.PENDING)
+    db_session.add(task)
+    db_session.commit()
+    db_session.refresh(task)
+    return task
+
+
+@pytest.fixture
+def writer(database_url: str, db_session: Session) -> Generator[TaskStateWriter, None, None]:
+    """Writer against the test database with a mocked Redis cache."""
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    with patch("worker.state_writer.SessionLocal", sessionmaker(bind=engine)):
+        writer = TaskStateWriter(MagicMock(), batch_size=100, flush_interval=60)
+        yield writer
+        writer.close()
+    engine.dispose()
+
+
+class TestTaskTransition:
+    """Tests for folding transitions of one task."""
+
+    def test_later_transition_keeps_earlier_columns(self) -> None:
+        """Completing a running task keeps its start time."""
+        started = datetime(2025, 1, 1, tzinfo=UTC)
+        running = TaskTransition("t", TaskStatus.RUNNING, task_name="sum", started_at=started)
+
+        folded = running.then(TaskTransition("t", TaskStatus.COMPLETED, task_output={"r": 1}))
+
+        assert folded.status == TaskStatus.COMPLETED
+        assert folded.started_at == started
+        assert folded.task_output == {"r": 1}
+        assert folded.task_name == "sum"
+
+
+class TestTaskStateWriter:
+    """Tests for the batched worker state writer."""
+
+    def test_flush_writes_folded_transitions_once(
+        self,
+        writer: TaskStateWriter,
+        pending_task: Task,
+        db_session: Session,
+    ) -> None:
+        """Running and completed for one task become a single row update."""
+        task_id = str(pending_task.id)
+        writer.submit(
+            TaskTransition(task_id, TaskStatus.RUNNING, "sum", started_at=datetime.now(UTC))
+        )
+        writer.submit(
+            TaskTransition(
+                task_id,
+                TaskStatus.COMPLETED,
+                "sum",
+                completed_at=datetime.now(UTC),
+                task_output={"result": 3},
+            )
+        )
+
+        with patch.object(writer, "write", wraps=writer.write) as write:
+            writer.flush()
+
+        assert len(write.call_args.args[0]) == 1
+        db_session.expire_all()
+        task = db_session.get(Task, pending_task.id)
+        assert task is not None
+        assert task.status == TaskStatus.COMPLETED
+        assert task.task_output == {"result": 3}
+        assert task.started_at is not None
+        cached = writer.cache.set_many.call_args.args[0]
+        assert cached[task_id][0].status == TaskStatus.COMPLETED
+
+    def test_batch_size_triggers_flush(self, writer: TaskStateWriter, pending_task: Task) -> None:
+        """Reaching batch_size flushes without waiting for the interval."""
+        writer.batch_size = 1
+        with patch.object(writer, "write") as write:
+            writer.submit(TaskTransition(str(pending_task.id), TaskStatus.RUNNING))
+            deadline = time.monotonic() + 2
+            while not write.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        write.assert_called_once()
+
+    def test_failed_flush_keeps_transitions_buffered(
+        self,
+        writer: TaskStateWriter,
+        pending_task: Task,
+    ) -> None:
+        """A failed write is retried on the next flush instead of being dropped."""
+        writer.submit(TaskTransition(str(pending_task.id), TaskStatus.RUNNING))
+
+        with (
+            patch.object(writer, "write", side_effect=RuntimeError("db down")),
+            pytest.raises(RuntimeError),
+        ):
+            writer.flush()
+        with patch.object(writer, "write") as write:
+            writer.flush()
+
+        assert write.call_args.args[0][0].status == TaskStatus.RUNNING
+
+    def test_durable_transition_is_written_before_returning(
+        self,
+        writer: TaskStateWriter,
+        pending_task: Task,
+    ) -> None:
+        """A terminal transition lands, folded with the running one, before submit returns."""
+        task_id = str(pending_task.id)
+        writer.submit(TaskTransition(task_id, TaskStatus.RUNNING, started_at=datetime.now(UTC)))
+
+        with patch.object(writer, "write") as write:
+            writer.submit(
+                TaskTransition(task_id, TaskStatus.COMPLETED, task_output={"result": 3}),
+                durable=True,
+            )
+
+        [transition] = write.call_args.args[0]
+        assert transition.status == TaskStatus.COMPLETED
+        assert transition.started_at is not None
+
+    def test_failed_durable_write_raises_and_stays_buffered(
+        self,
+        writer: TaskStateWriter,
+        pending_task: Task,
+    ) -> None:
+        """The task sees the failure, and the transition is not lost."""
+        task_id = str(pending_task.id)
+
+        with (
+            patch.object(writer, "write", side_effect=RuntimeError("db down")),
+            pytest.raises(RuntimeError),
+        ):
+            writer.submit(TaskTransition(task_id, TaskStatus.FAILED, error="x"), durable=True)
+        with patch.object(writer, "write") as write:
+            writer.flush()
+
+        assert write.call_args.args[0][0].status == TaskStatus.FAILED
+
+    def test_durable_transition_waits_for_a_write_in_progress(
+        self,
+        writer: TaskStateWriter,
+        pending_task: Task,
+    ) -> None:
+        """A write already holding the running transition commits first, never after."""
+        task_id = str(pending_task.id)
+        committed: list[tuple[str, str]] = []
+        first_write_started = threading.Event()
+
+        def write(batch: list[TaskTransition]) -> None:
+            if not committed and not first_write_started.is_set():
+                first_write_started.set()
+                time.sleep(0.2)
+            committed.extend((t.task_id, t.status) for t in batch)
+
+        with patch.object(writer, "write", side_effect=write):
+            writer.submit(TaskTransition(task_id, TaskStatus.RUNNING))
+            flusher = threading.Thread(target=writer.flush)
+            flusher.start()
+            first_write_started.wait(timeout=2)
+            writer.submit(TaskTransition(task_id, TaskStatus.COMPLETED), durable=True)
+            # Returned only after both writes committed, in buffer order
+            assert committed == [(task_id, TaskStatus.RUNNING), (task_id, TaskStatus.COMPLETED)]
+            flusher.join()
+
+    def test_write_never_replaces_a_completed_task(
+        self,
+        writer: TaskStateWriter,
+        pending_task: Task,
+        db_session: Session,
+    ) -> None:
+        """A late failure from a duplicate run leaves the result in place."""
+        task_id = str(pending_task.id)
+        writer.write([TaskTransition(task_id, TaskStatus.COMPLETED, task_output={"result": 3})])
+
+        writer.write([TaskTransition(task_id, TaskStatus.FAILED, error="duplicate run")])
+
+        db_session.expire_all()
+        task = db_session.get(Task, pending_task.id)
+        assert task is not None
+        assert task.status == TaskStatus.COMPLETED
+        assert task.error is None
+        assert writer.cache.set_many.call_args.args[0] == {}
+
+    def test_close_writes_buffered_transitions(
+        self,
+        writer: TaskStateWriter,
+        pending_task: Task,
+    ) -> None:
+        """Shutdown flushes, and later transitions are written through."""
+        writer.submit(TaskTransition(str(pending_task.id), TaskStatus.RUNNING))
+
+        with patch.object(writer, "write") as write:
+            writer.close()
+            writer.submit(TaskTransition(str(pending_task.id), TaskStatus.FAILED, error="x"))
+
+        assert write.call_count == 2
+
+    def test_collect_folds_per_task_without_buffering(self, writer: TaskStateWriter) -> None:
+        """Collected transitions are folded per task and never reach the buffer."""
+        with writer.collect() as collected:
+            assert writer.collecting
+            writer.submit(TaskTransition("t", TaskStatus.RUNNING, task_name="sum"))
+            writer.submit(TaskTransition("t", TaskStatus.COMPLETED, task_output={"r": 1}))
+
+        assert not writer.collecting
+        assert list(collected) == ["t"]
+        assert collected["t"].status == TaskStatus.COMPLETED
+        assert collected["t"].task_name == "sum"
+        with patch.object(writer, "write") as write:
+            writer.flush()
+        write.assert_not_called()
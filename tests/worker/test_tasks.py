@@ -1,9 +1,20 @@
+import base64
 import hashlib
+import json
+import struct
+from collections.abc import AsyncIterator, Generator
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
 from unittest.mock import MagicMock, patch
 from uuid import uuid4
 
+import anthropic
 import pytest
 
+from shared.blobs import BlobStore
+from shared.models.task import Task, TaskStatus
+
 
 @pytest.fixture
 def mock_worker_deps():
@@ -13,6 +24,14 @@ def mock_worker_deps():
         # Setup mock session - SessionLocal() is called directly (not as context manager)
         mock_session = MagicMock()
         mock_session_local.return_value = mock_session
+        # Row returned by UPDATE ... RETURNING, encoded into the cache entry
+        mock_session.execute.return_value.scalar_one_or_none.return_value = Task(
+            id=uuid4(),
+            task_name="sum",
+            task_parameters={},
+            status=TaskStatus.RUNNING,
+            created_at=datetime(2025, 1, 1, tzinfo=UTC),
+        )
 
         yield {
             "session_local": mock_session_local,
@@ -55,8 +74,143 @@ class TestSumTask:
 
         sum_task(task_id=str(uuid4()), a=1, b=2)
 
-        # Verify session.query was called (status updates)
-        mock_worker_deps["session"].query.assert_called()
+        # Verify status updates were executed and committed
+        mock_worker_deps["session"].execute.assert_called()
+        mock_worker_deps["session"].commit.assert_called()
+
+    def test_sum_task_caches_running_state_with_short_ttl(self, mock_worker_deps: dict) -> None:
+        """The running transition overwrites the cached entry with a short TTL."""
+        from shared.config import get_settings
+        from worker.tasks.sum_task import sum_task
+
+        task_id = uuid4()
+        running = Task(
+            id=task_id,
+            task_name="sum",
+            task_parameters={"a": 1, "b": 2},
+            status=TaskStatus.RUNNING,
+            created_at=datetime(2025, 1, 1, tzinfo=UTC),
+        )
+        session = mock_worker_deps["session"]
+        session.execute.return_value.scalar_one_or_none.return_value = running
+
+        sum_task(task_id=str(task_id), a=1, b=2)
+
+        first_call = mock_worker_deps["cache"].set.call_args_list[0]
+        assert first_call.args[1].status == "running"
+        assert first_call.kwargs["ttl"] == get_settings().status_cache_ttl_seconds
+
+
+class TestSumBatchTask:
+    """Tests for sum_batch_task, the vectorized path for many sum tasks."""
+
+    def test_results_match_scalar_sums(self) -> None:
+        """Every task gets exactly what sum_task computes, in one bulk write."""
+        from worker.tasks.sum_task import sum_batch_task
+
+        pairs = [(5, 3), (2.5, 3.5), (-10, 5), (2**70, 1), (1, 0.1)]
+        tasks = [(str(uuid4()), a, b) for a, b in pairs]
+
+        with patch("worker.tasks.sum_task.state_writer") as writer:
+            assert sum_batch_task(tasks=tasks) == len(tasks)
+
+        (transitions,) = writer.write.call_args.args
+        assert [t.task_id for t in transitions] == [task_id for task_id, _, _ in tasks]
+        assert all(t.status == TaskStatus.COMPLETED for t in transitions)
+        outputs = [t.task_output["result"] for t in transitions]
+        assert outputs == [a + b for a, b in pairs]
+        assert [type(output) for output in outputs] == [type(a + b) for a, b in pairs]
+
+    def test_last_failed_attempt_fails_every_task(self) -> None:
+        """When retries run out, the whole batch is marked failed."""
+        from worker.tasks.sum_task import sum_batch_task
+
+        tasks = [(str(uuid4()), 1, 2), (str(uuid4()), 3, 4)]
+
+        with patch("worker.tasks.sum_task.state_writer") as writer, \
+             patch.object(sum_batch_task, "max_retries", 0):
+            writer.write.side_effect = [ConnectionError("db down"), None]
+            with pytest.raises(ConnectionError):
+                sum_batch_task(tasks=tasks)
+
+        (transitions,) = writer.write.call_args.args
+        assert [t.status for t in transitions] == [TaskStatus.FAILED] * 2
+        assert transitions[0].error == "db down"
+
+
+class TestVectorTask:
+    """Tests for vector_task worker."""
+
+    @pytest.mark.parametrize(
+        ("op", "b", "expected"),
+        [
+            ("sum", None, 10),
+            ("mean", None, 2.5),
+            ("min", None, 1),
+            ("max", None, 4),
+            ("dot", [1, 1, 1, 1], 10),
+            ("add", [1, 1, 1, 1], [2, 3, 4, 5]),
+            ("multiply", [2, 2, 2, 2], [2, 4, 6, 8]),
+        ],
+    )
+    def test_vector_ops(self, mock_worker_deps: dict, op: str, b: Any, expected: Any) -> None:
+        """Reductions, dot and element-wise operations match plain Python."""
+        from worker.tasks.vector_task import vector_task
+
+        result = vector_task(task_id=str(uuid4()), op=op, a=[1, 2, 3, 4], b=b)
+
+        assert result == {"result": expected}
+
+    def test_columnar_base64_operands(self, mock_worker_deps: dict) -> None:
+        """Base64 payloads are read as little-endian float64 columns."""
+        from worker.tasks.vector_task import vector_task
+
+        a = base64.b64encode(struct.pack("<3d", 1.5, 2.5, 3.0)).decode()
+
+        result = vector_task(task_id=str(uuid4()), op="dot", a=a, b=[2, 2, 2])
+
+        assert result == {"result": 14.0}
+
+    @pytest.mark.parametrize(
+        ("op", "a", "b"),
+        [
+            ("sum", [2**62, 2**62], None),
+            ("dot", [2**32, 2**32], [2**32, 2**32]),
+            ("add", [2**63 - 1], [1]),
+            ("multiply", [-(2**40)], [2**40]),
+            ("sum", [2**70, 1], None),
+        ],
+    )
+    def test_integer_results_are_exact(
+        self, mock_worker_deps: dict, op: str, a: list[int], b: list[int] | None
+    ) -> None:
+        """Integer operations that would wrap in int64 match Python's exact arithmetic."""
+        from worker.tasks.vector_task import vector_task
+
+        expected = {
+            "sum": lambda: sum(a),
+            "dot": lambda: sum(x * y for x, y in zip(a, b or [], strict=True)),
+            "add": lambda: [x + y for x, y in zip(a, b or [], strict=True)],
+            "multiply": lambda: [x * y for x, y in zip(a, b or [], strict=True)],
+        }[op]()
+
+        result = vector_task(task_id=str(uuid4()), op=op, a=a, b=b)
+
+        assert result == {"result": expected}
+
+    def test_overflow_fails_without_retry(self, mock_worker_deps: dict) -> None:
+        """A result past float64 fails the task at once; JSONB could not store it."""
+        from shared.compute import NonFiniteResultError
+        from worker.tasks.vector_task import vector_task
+
+        with patch.object(vector_task, "retry") as retry, \
+             patch("worker.tasks.vector_task.update_task_failed") as failed, \
+             pytest.raises(NonFiniteResultError):
+            vector_task(task_id=str(uuid4()), op="sum", a=[1e308, 1e308])
+
+        retry.assert_not_called()
+        failed.assert_called_once()
+        assert "not finite" in failed.call_args.args[1]
 
 
 class TestHashTask:
@@ -111,6 +265,50 @@ class TestHashTask:
         assert result["hash"] == expected_hash
         assert result["content_length"] == 0
 
+    @pytest.mark.parametrize("algorithm", ["sha512", "sha3_256", "sha3_512", "blake2b", "blake2s"])
+    def test_hash_task_modern_algorithms(self, mock_worker_deps: dict, algorithm: str) -> None:
+        """Hash task supports the wider hashlib algorithm set."""
+        from worker.tasks.hash_task import hash_task
+
+        result = hash_task(task_id=str(uuid4()), content="modern", algorithm=algorithm)
+
+        assert result["hash"] == hashlib.new(algorithm, b"modern").hexdigest()
+        assert result["algorithm"] == algorithm
+
+    def test_hash_task_several_algorithms(self, mock_worker_deps: dict) -> None:
+        """With a list of algorithms, every digest comes back from the one task."""
+        from worker.tasks.hash_task import hash_task
+
+        algorithms = ["md5", "sha256", "blake2b"]
+
+        result = hash_task(task_id=str(uuid4()), content="hello", algorithms=algorithms)
+
+        assert result == {
+            "hashes": {name: hashlib.new(name, b"hello").hexdigest() for name in algorithms},
+            "content_length": 5,
+        }
+
+    async def test_hash_task_hashes_blob_in_chunks(
+        self, mock_worker_deps: dict, tmp_path: Path
+    ) -> None:
+        """An uploaded blob is hashed chunk by chunk and deleted afterwards."""
+        from worker.tasks.hash_task import hash_task
+
+        data = bytes(range(256)) * 10
+        store = BlobStore(str(tmp_path), chunk_size=64)
+
+        async def upload() -> AsyncIterator[bytes]:
+            yield data
+
+        blob = await store.write(upload(), max_bytes=len(data))
+
+        with patch("worker.tasks.hash_task.blob_store", store):
+            result = hash_task(task_id=str(uuid4()), algorithm="sha256", blob=blob.id)
+
+        assert result["hash"] == hashlib.sha256(data).hexdigest()
+        assert result["content_length"] == len(data)
+        assert not store.path(blob.id).exists()
+
     def test_hash_task_caches_result(self, mock_worker_deps: dict) -> None:
         """Hash task caches result after completion."""
         from worker.tasks.hash_task import hash_task
@@ -119,3 +317,159 @@ class TestHashTask:
 
         # Verify cache.set was called
         mock_worker_deps["cache"].set.assert_called()
+
+    def test_hash_task_caches_full_response(self, mock_worker_deps: dict) -> None:
+        """The cached value is the full API response under the task's own key."""
+        from worker.tasks.hash_task import hash_task
+
+        task_id = uuid4()
+        completed = Task(
+            id=task_id,
+            task_name="file_hash",
+            task_parameters={},
+            status=TaskStatus.COMPLETED,
+            task_output={"hash": "abc"},
+            created_at=datetime(2025, 1, 1, tzinfo=UTC),
+            completed_at=datetime(2025, 1, 1, 0, 0, 1, tzinfo=UTC),
+        )
+        session = mock_worker_deps["session"]
+        session.execute.return_value.scalar_one_or_none.return_value = completed
+
+        hash_task(task_id=str(task_id), content="test", algorithm="sha256")
+
+        cached_id, entry = mock_worker_deps["cache"].set.call_args.args
+        payload = json.loads(entry.body)
+        assert cached_id == str(task_id)
+        assert payload["task_uuid"] == str(task_id)
+        assert payload["status"] == "completed"
+        assert payload["created_at"] == "2025-01-01T00:00:00+00:00"
+
+
+class TestDispatchTasks:
+    """Tests for batched dispatch."""
+
+    def test_dispatch_tasks_reports_per_task_errors(self) -> None:
+        """A failed publish is reported for that task only."""
+        from worker.tasks import dispatch_tasks
+
+        with patch("worker.tasks.sum_task.sum_task.apply_async") as mock_apply:
+            mock_apply.side_effect = [None, ConnectionError("broker down"), None]
+
+            errors = dispatch_tasks(
+                [(str(uuid4()), "sum", {"a": i, "b": 1}, "normal") for i in range(3)]
+            )
+
+        assert errors[0] is None
+        assert isinstance(errors[1], ConnectionError)
+        assert errors[2] is None
+        assert mock_apply.call_args.kwargs["kwargs"] == {"a": 2, "b": 1}
+
+    def test_sum_batching_groups_sum_tasks(self) -> None:
+        """With sum batching on, sums share sum_batch messages; other tasks go alone."""
+        from worker.tasks import dispatch_tasks
+
+        sums = [(str(uuid4()), "sum", {"a": i, "b": 1}, "normal") for i in range(5)]
+        file_hash = (str(uuid4()), "file_hash", {"content": "x", "algorithm": "md5"}, "normal")
+
+        with patch("worker.tasks.settings.sum_batching", True), \
+             patch("worker.tasks.settings.sum_batch_max_size", 3), \
+             patch("worker.tasks.sum_task.sum_batch_task.apply_async") as mock_batch, \
+             patch("worker.tasks.sum_task.sum_task.apply_async") as mock_sum, \
+             patch("worker.tasks.hash_task.hash_task.apply_async") as mock_hash:
+            mock_batch.side_effect = [None, ConnectionError("broker down")]
+
+            errors = dispatch_tasks([*sums, file_hash])
+
+        assert errors[:3] == [None] * 3
+        assert all(isinstance(error, ConnectionError) for error in errors[3:5])
+        assert errors[5] is None
+        first = mock_batch.call_args_list[0].kwargs["args"][0]
+        assert first == [(task_id, params["a"], 1) for task_id, _, params, _ in sums[:3]]
+        mock_sum.assert_not_called()
+        mock_hash.assert_called_once()
+
+
+class TestLLMTask:
+    """Tests for llm_task, against a stub of the Messages API."""
+
+    @pytest.fixture
+    def streamed(
+        self, stub_api: anthropic.Anthropic
+    ) -> Generator[list[dict[str, Any]], None, None]:
+        """Fields appended to the task's output stream, one delta per generated piece."""
+        appended: list[dict[str, Any]] = []
+        with patch("worker.tasks.llm_task.cache") as mock_cache, \
+             patch("worker.tasks.llm_task.get_llm_client", return_value=stub_api), \
+             patch("worker.tasks.llm_task.update_task_running"), \
+             patch("worker.tasks.llm_task.update_task_completed"), \
+             patch("worker.tasks.llm_task.update_task_failed"), \
+             patch("worker.tasks.llm_task.settings.llm_stream_flush_interval_ms", 0):
+            pipe = mock_cache.client.pipeline.return_value.__enter__.return_value
+            pipe.xadd.side_effect = lambda key, fields: appended.append(fields)
+            yield appended
+
+    def test_output_is_streamed_as_generated(self, streamed: list[dict[str, Any]]) -> None:
+        """Text is appended piece by piece, then the stream ends after the result is stored."""
+        from worker.tasks.llm_task import llm_task
+
+        result = llm_task(task_id=str(uuid4()), prompt="What is 2+2?", max_tokens=16)
+
+        assert result["response"] == "2 + 2 is 4."
+        assert result["usage"] == {"input_tokens": 10, "output_tokens": 2}
+        assert streamed == [
+            {"kind": "start"},
+            {"kind": "delta", "text": "2 + 2"},
+            {"kind": "delta", "text": " is"},
+            {"kind": "delta", "text": " 4."},
+            {"kind": "end", "status": "completed"},
+        ]
+
+    def test_cached_response_is_streamed_whole(self, streamed: list[dict[str, Any]]) -> None:
+        """A response that needed no upstream call is streamed as one delta."""
+        from worker.tasks.llm_task import llm_task
+
+        cached = {"response": "4", "model": "stub-model", "usage": {}}
+        with patch("worker.tasks.llm_task.llm_cache.get_or_call", return_value=cached):
+            llm_task(task_id=str(uuid4()), prompt="What is 2+2?", max_tokens=16)
+
+        assert streamed == [
+            {"kind": "start"},
+            {"kind": "delta", "text": "4"},
+            {"kind": "end", "status": "completed"},
+        ]
+
+    def test_failure_ends_the_stream(self, streamed: list[dict[str, Any]]) -> None:
+        """A failed call closes the stream with the failed status."""
+        from worker.tasks.llm_task import llm_task
+
+        with patch(
+            "worker.tasks.llm_task.llm_cache.get_or_call", side_effect=RuntimeError("boom")
+        ), pytest.raises(RuntimeError):
+            llm_task(task_id=str(uuid4()), prompt="What is 2+2?", max_tokens=16)
+
+        assert streamed == [{"kind": "end", "status": "failed"}]
+
+    def test_retried_failure_leaves_the_stream_open(
+        self, streamed: list[dict[str, Any]]
+    ) -> None:
+        """A failure Celery will retry writes no end entry; the next attempt starts afresh."""
+        from worker.tasks.llm_task import llm_task
+
+        error = anthropic.APIConnectionError(request=MagicMock())
+        with patch("worker.tasks.llm_task.llm_cache.get_or_call", side_effect=error), \
+             pytest.raises(anthropic.APIConnectionError):
+            llm_task(task_id=str(uuid4()), prompt="What is 2+2?", max_tokens=16)
+
+        assert streamed == []
+
+    def test_last_retry_ends_the_stream(self, streamed: list[dict[str, Any]]) -> None:
+        """Once retries run out, the stream ends with the failed status."""
+        from worker.tasks.llm_task import llm_task
+
+        error = anthropic.APIConnectionError(request=MagicMock())
+        with patch("worker.tasks.llm_task.llm_cache.get_or_call", side_effect=error), \
+             patch.object(llm_task, "max_retries", 0), \
+             pytest.raises(anthropic.APIConnectionError):
+            llm_task(task_id=str(uuid4()), prompt="What is 2+2?", max_tokens=16)
+
+        assert streamed == [{"kind": "end", "status": "failed"}]